@@ -1,13 +1,21 @@
 from dotenv import load_dotenv
 import os
+import logging
 load_dotenv(dotenv_path="../.env")
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, Response
 from services.analysis.routes import analysis_bp
 from services.extract.routes import extract_bp
 from services.merge.routes import merge_bp
 from services.image.routes import image_bp
 from services.stt.routes import stt_bp
+from services.common import model_registry
+from services.extract.extract_service import embedding_cache
+from services.common.clients import pool_stats
+from services.common.response_cache import response_cache
+from services.image import image_cache
+from services.common import metrics, admission, deadline, uploads
 
 # api ex) http://localhost:5001/{feature_group}/{feature_name}
 app = Flask(__name__)
@@ -16,6 +24,17 @@ app.register_blueprint(extract_bp)
 app.register_blueprint(merge_bp)
 app.register_blueprint(image_bp)
 app.register_blueprint(stt_bp)
+metrics.init_app(app)
+# the deadline starts before the request waits for admission
+deadline.init_app(app)
+# oversized uploads are refused before they take an admission slot
+uploads.init_app(app)
+admission.init_app(app)
+
+# PRELOAD_MODELS=1 loads local models at import time. With gunicorn --preload this runs
+# once in the master and the forked workers share the weights copy-on-write.
+if os.getenv("PRELOAD_MODELS") == "1":
+    model_registry.warm_up()
 
 # test: GET http://localhost:5001/
 @app.route('/', methods=['GET'])
@@ -25,9 +44,34 @@ def health_check():
         "message": f"Flask AI server listening on port {os.getenv('AI_SERVER_PORT')}."
     }), 200
 
+# readiness: GET http://localhost:5001/ready (503 until local models are loaded)
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    if not model_registry.is_ready():
+        # without PRELOAD_MODELS nothing else may load them: no traffic reaches a worker that is not ready
+        model_registry.start_warm_up()
+        return jsonify({"ready": False}), 503
+    return jsonify({"ready": True}), 200
+
+# stats: GET http://localhost:5001/stats (cache hit/miss counters, for sizing)
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "embedding_cache": embedding_cache.stats(),
+        "http_pool": pool_stats(),
+        "response_cache": response_cache.stats(),
+        "image_cache": image_cache.stats()
+    }), 200
+
+# metrics: GET http://localhost:5001/metrics (Prometheus text format, per worker process)
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype=metrics.CONTENT_TYPE)
+
 
 if __name__ == '__main__':
     print("--- Flask AI Server Starting ---")
+    model_registry.start_warm_up()
     # # test python only
     # app.run(debug=True, port=os.getenv('AI_SERVER_PORT'))
     # with node.js
@@ -0,0 +1,126 @@
+""" Async serving mode: $ uvicorn asgi:app --workers 2 --port 5001
+
+The LLM-bound routes (/merge/*, /analysis/diary, /analysis/week, JSON /extract/style) run
+as coroutines on AsyncOpenAI, so a slow stream waits on the event loop instead of holding
+a worker thread. Everything else (image, stt, multipart uploads, /stats, /metrics, ...)
+is the unchanged Flask app behind a2wsgi with ASGI_WSGI_WORKERS threads.
+The sync server (gunicorn app:app) keeps working as before.
+"""
+import asyncio
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from app import app as flask_app
+from services.analysis import async_routes as analysis_async
+from services.extract import async_routes as extract_async
+from services.merge import async_routes as merge_async
+from services.common import admission, deadline, metrics, model_registry
+
+WSGI_WORKERS = int(os.getenv("ASGI_WSGI_WORKERS", "16"))
+
+ROUTES = merge_async.routes + analysis_async.routes + extract_async.routes
+CONTENT_TYPES = {**extract_async.content_types}
+
+wsgi_app = WSGIMiddleware(flask_app, workers=WSGI_WORKERS)
+
+
+def _content_type(scope) -> str:
+    return (_header(scope, b"content-type") or "").split(";")[0].strip().lower()
+
+def match_route(scope):
+    """ The async route serving this request, or None to hand it to Flask """
+    if scope["type"] != "http":
+        return None, {}
+    for route in ROUTES:
+        match, child_scope = route.matches(scope)
+        if match != Match.FULL:
+            continue
+        required = CONTENT_TYPES.get(route.path)
+        if required and _content_type(scope) != required:
+            return None, {}
+        return route, child_scope
+    return None, {}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # same switch as app.py, but off the event loop (model loads take seconds);
+            # otherwise the models load in the background and /ready answers 503 until they are in
+            if os.getenv("PRELOAD_MODELS") == "1":
+                await asyncio.get_running_loop().run_in_executor(None, model_registry.warm_up)
+            else:
+                model_registry.start_warm_up()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+def _header(scope, name: bytes):
+    for key, value in scope.get("headers", []):
+        if key == name and value:
+            return value.decode("latin-1")
+    return None
+
+def _user_key(scope):
+    # the same key as the Flask hook (admission._user_key)
+    return admission.user_key(_header(scope, b"x-user-id"))
+
+async def _serve_async(route, scope, receive, send):
+    """ Run an async route with the same admission control and request metrics as Flask's hooks """
+    path, method = route.path, scope["method"]
+    start = time.perf_counter()
+    status = {"code": 500}
+    finished = False
+    ticket = None
+    metrics.http_in_flight.inc(route=path)
+    deadline.set_budget(_header(scope, deadline.DEADLINE_HEADER.lower().encode()))
+
+    def finish():
+        nonlocal finished
+        if not finished:
+            finished = True
+            if ticket is not None:
+                ticket.release()
+            metrics.http_in_flight.dec(route=path)
+            metrics.http_duration.observe(time.perf_counter() - start, route=path, method=method)
+            metrics.http_requests.inc(route=path, method=method, status=status["code"])
+
+    async def send_with_metrics(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        await send(message)
+        # a streamed body is done with its last chunk, not when the handler returns
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            finish()
+
+    try:
+        upstreams = admission.upstreams_for(path) if admission.ENABLED else ()
+        if upstreams:
+            try:
+                ticket = await admission.acquire_async(upstreams, _user_key(scope))
+            except admission.AdmissionRejected as e:
+                response = JSONResponse({"error": str(e)}, status_code=e.status,
+                                        headers={"Retry-After": str(e.retry_after)})
+                return await response(scope, receive, send_with_metrics)
+        await route.handle(scope, receive, send_with_metrics)
+    except Exception as e:
+        metrics.record_error(e, route=path)
+        raise
+    finally:
+        finish()
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+
+    route, child_scope = match_route(scope)
+    if route is None:
+        return await wsgi_app(scope, receive, send)
+    scope.update(child_scope)
+    await _serve_async(route, scope, receive, send)
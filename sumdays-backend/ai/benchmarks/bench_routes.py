@@ -0,0 +1,51 @@
+""" Per-route microbenchmarks (pytest-benchmark) through the Flask test client.
+
+The fake upstream answers with ~zero latency, so these measure the server's own work
+per request: parsing, prompt building, pipelines, (de)serialization, local embeddings.
+
+$ pytest benchmarks/bench_routes.py --benchmark-json=benchmarks/results/routes.json
+$ pytest benchmarks/bench_routes.py --benchmark-compare   (against the last --benchmark-autosave run)
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.fake_upstream import serve_in_thread, FakeConfig
+from benchmarks.workloads import STREAMING_ROUTES, build_requests, peak_rss_mb, use_stub_embeddings
+
+_upstream, _upstream_url = serve_in_thread(FakeConfig(
+    latency=0, jitter=0, ttft=0, tokens_per_sec=1e9, ocr_latency=0, stt_latency=0
+))
+os.environ["OPENAI_BASE_URL"] = f"{_upstream_url}/v1"
+os.environ["VISION_API_ENDPOINT"] = _upstream_url
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "")
+use_stub_embeddings()
+
+from app import app
+
+REQUESTS = build_requests(bypass_cache=True)
+
+
+@pytest.fixture(scope="module")
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize("name", list(REQUESTS))
+def test_route(benchmark, client, name):
+    bench_request = REQUESTS[name]
+
+    def call():
+        response = client.post(bench_request.path, **bench_request.test_client_kwargs())
+        # streaming routes are only done once the body is consumed
+        body = response.get_data()
+        assert response.status_code == 200, body[:200]
+
+    benchmark.extra_info["streaming"] = name in STREAMING_ROUTES
+    benchmark(call)
+    benchmark.extra_info["peak_rss_mb"] = peak_rss_mb()
@@ -0,0 +1,324 @@
+""" Local stand-in for the upstream APIs the AI server calls, for load tests and offline test runs.
+
+Speaks just enough of:
+- OpenAI  POST /v1/chat/completions       (plain, streaming, json_object, json_schema, tool calls)
+- OpenAI  POST /v1/audio/transcriptions   (verbose_json)
+- Vision  POST /v1/images:annotate        (DOCUMENT_TEXT_DETECTION over REST)
+
+Answers are generated from the request itself (JSON schema / tool parameters / the keys listed
+in the prompt), so every service can parse them. Timing and failures are configurable:
+
+    latency      seconds before a non-streaming answer starts (mean)
+    jitter       spread of latency; distribution is fixed | normal | lognormal
+    ttft         time to first token of a streaming answer
+    tokens_per_sec  generation speed (streaming chunks and non-streaming completion time)
+    error_rate   fraction of requests answered with error_status (429 / 500 / ...)
+    ocr_latency / stt_latency   per-request latency of the Vision / audio endpoints
+
+Point the AI server at it:
+$ python benchmarks/fake_upstream.py --port 8089 --latency 0.3 --ttft 0.4 --tokens-per-sec 60
+$ OPENAI_BASE_URL=http://127.0.0.1:8089/v1 VISION_API_ENDPOINT=http://127.0.0.1:8089 python app.py
+
+GET /_fake/stats returns request counts; POST /_fake/config changes any setting at runtime.
+"""
+import argparse
+import base64
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+
+class FakeConfig:
+    def __init__(self, **overrides):
+        env = lambda name, default: float(os.getenv(f"FAKE_{name.upper()}", default))
+        self.latency = env("latency", "0.2")
+        self.jitter = env("jitter", "0.05")
+        self.distribution = os.getenv("FAKE_DISTRIBUTION", "lognormal")
+        self.ttft = env("ttft", "0.3")
+        self.tokens_per_sec = env("tokens_per_sec", "80")
+        self.error_rate = env("error_rate", "0")
+        self.error_status = int(env("error_status", "500"))
+        self.ocr_latency = env("ocr_latency", "0.3")
+        self.stt_latency = env("stt_latency", "0.5")
+        self.completion_tokens = int(env("completion_tokens", "120"))
+        self.update(overrides)
+
+    def update(self, values: dict):
+        for name, value in values.items():
+            if not hasattr(self, name):
+                raise ValueError(f"Unknown fake upstream setting: {name}")
+            setattr(self, name, type(getattr(self, name))(value))
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def sample_delay(mean: float, jitter: float, distribution: str) -> float:
+    """ One latency sample in seconds; lognormal keeps the long right tail real APIs have """
+    if mean <= 0:
+        return 0.0
+    if distribution == "fixed" or jitter <= 0:
+        return mean
+    if distribution == "normal":
+        return max(0.0, random.gauss(mean, jitter))
+    sigma2 = math.log(1 + (jitter / mean) ** 2)
+    return random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+
+
+def estimate_tokens(text: str) -> int:
+    # same rough ratio merge_service uses for Korean text
+    return max(1, int(len(text) * 0.35))
+
+
+FILLER = "오늘은 조용한 하루였다. 친구와 짧게 이야기를 나누고 산책을 했다. 저녁에는 일기를 쓰며 하루를 돌아봤다. "
+
+def filler_text(tokens: int) -> str:
+    chars = int(tokens / 0.35)
+    return (FILLER * (chars // len(FILLER) + 1))[:chars].strip()
+
+
+def value_for(schema: dict, name: str = "", defs: dict = None):
+    """ A value that validates against a (simple) JSON schema """
+    defs = defs or {}
+    if "$ref" in schema:
+        return value_for(defs.get(schema["$ref"].split("/")[-1], {}), name, defs)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return value_for(options[0], name, defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "string")
+    if kind == "object":
+        return {k: value_for(v, k, defs) for k, v in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [value_for(schema.get("items", {}), name, defs) for _ in range(max(2, schema.get("minItems", 0)))]
+    if kind in ("number", "integer"):
+        return 0.4 if kind == "number" else 1
+    if kind == "boolean":
+        return True
+    return value_for_key(name)
+
+
+def value_for_key(name: str):
+    name = name.lower()
+    if "emoji" in name or name == "icon":
+        return "🙂"
+    if "date" in name:
+        return "2025-10-25"
+    return "평온한 하루"
+
+
+def json_object_for_prompt(messages: list) -> dict:
+    """ json_object mode has no schema; use the keys the prompt lists ("keywords": ..., "emoji": ...) """
+    prompt = "\n".join(m["content"] for m in messages if isinstance(m.get("content"), str))
+    result = {}
+    for key in dict.fromkeys(re.findall(r'"(\w+)"\s*:', prompt)):
+        if "score" in key:
+            result[key] = 0.4
+        elif key.endswith("s"):
+            result[key] = ["산책", "친구"]
+        else:
+            result[key] = value_for_key(key)
+    return result
+
+
+def prompt_tokens(messages: list) -> int:
+    text = ""
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        text += content or ""
+    return estimate_tokens(text)
+
+
+def completion_for(body: dict, config: FakeConfig):
+    """ (content, tool_calls) answering the chat request """
+    tools = body.get("tools") or []
+    if tools:
+        choice = body.get("tool_choice")
+        wanted = choice.get("function", {}).get("name") if isinstance(choice, dict) else None
+        tool = next((t for t in tools if t["function"]["name"] == wanted), tools[0])
+        parameters = tool["function"].get("parameters", {})
+        arguments = value_for(parameters, defs=parameters.get("$defs") or parameters.get("definitions"))
+        return None, [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": tool["function"]["name"], "arguments": json.dumps(arguments, ensure_ascii=False)},
+        }]
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        return json.dumps(value_for(schema, defs=schema.get("$defs")), ensure_ascii=False), None
+    if response_format.get("type") == "json_object":
+        return json.dumps(json_object_for_prompt(body.get("messages", [])), ensure_ascii=False), None
+
+    max_tokens = body.get("max_tokens") or body.get("max_completion_tokens") or config.completion_tokens
+    return filler_text(min(max_tokens, config.completion_tokens)), None
+
+
+def create_app(config: FakeConfig = None) -> Flask:
+    config = config or FakeConfig()
+    stats = {"chat": 0, "chat_stream": 0, "transcriptions": 0, "annotate": 0, "errors": 0}
+    lock = threading.Lock()
+    app = Flask(__name__)
+    app.config["fake"] = config
+
+    def count(name):
+        with lock:
+            stats[name] += 1
+
+    def injected_error():
+        if config.error_rate > 0 and random.random() < config.error_rate:
+            count("errors")
+            body = {"error": {"message": "Injected upstream failure", "type": "server_error", "code": config.error_status}}
+            headers = {"Retry-After": "1"} if config.error_status == 429 else {}
+            return jsonify(body), config.error_status, headers
+        return None
+
+    def latency():
+        return sample_delay(config.latency, config.jitter, config.distribution)
+
+    @app.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions():
+        error = injected_error()
+        if error:
+            return error
+        body = request.get_json()
+        model = body.get("model", "fake")
+        content, tool_calls = completion_for(body, config)
+        n_prompt = prompt_tokens(body.get("messages", []))
+        n_completion = estimate_tokens(content or json.dumps(tool_calls, ensure_ascii=False))
+        usage = {"prompt_tokens": n_prompt, "completion_tokens": n_completion, "total_tokens": n_prompt + n_completion}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+        if not body.get("stream"):
+            count("chat")
+            time.sleep(latency() + n_completion / config.tokens_per_sec)
+            message = {"role": "assistant", "content": content}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return jsonify({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+                "usage": usage,
+            })
+
+        count("chat_stream")
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        def chunk(delta, finish_reason=None, **extra):
+            return "data: " + json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                **extra,
+            }, ensure_ascii=False) + "\n\n"
+
+        def events():
+            time.sleep(sample_delay(config.ttft, config.jitter, config.distribution))
+            yield chunk({"role": "assistant", "content": ""})
+            # ~2 characters per chunk, paced at tokens_per_sec
+            text = content if content is not None else json.dumps(tool_calls, ensure_ascii=False)
+            pieces = [text[i:i + 2] for i in range(0, len(text), 2)]
+            per_piece = n_completion / max(1, len(pieces)) / config.tokens_per_sec
+            for piece in pieces:
+                time.sleep(per_piece)
+                yield chunk({"content": piece})
+            yield chunk({}, "stop")
+            if include_usage:
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return Response(events(), mimetype="text/event-stream")
+
+    @app.route("/v1/audio/transcriptions", methods=["POST"])
+    def transcriptions():
+        error = injected_error()
+        if error:
+            return error
+        count("transcriptions")
+        audio = request.files.get("file")
+        size = len(audio.read()) if audio else 0
+        time.sleep(sample_delay(config.stt_latency, config.jitter, config.distribution))
+        text = "오늘 산책하면서 본 하늘이 정말 맑았다."
+        duration = max(1.0, size / 32000)
+        return jsonify({
+            "task": "transcribe", "language": request.form.get("language", "ko"), "duration": duration, "text": text,
+            "segments": [{
+                "id": 0, "seek": 0, "start": 0.0, "end": duration, "text": text, "tokens": [1, 2, 3],
+                "temperature": 0.0, "avg_logprob": -0.2, "compression_ratio": 1.1, "no_speech_prob": 0.05,
+            }],
+        })
+
+    @app.route("/v1/images:annotate", methods=["POST"])
+    def annotate():
+        error = injected_error()
+        if error:
+            return error
+        count("annotate")
+        time.sleep(sample_delay(config.ocr_latency, config.jitter, config.distribution))
+        responses = []
+        for item in request.get_json().get("requests", []):
+            size = len(base64.b64decode(item.get("image", {}).get("content", "") or b""))
+            text = f"2025년 10월 25일\n{filler_text(40)}\n({size} bytes)"
+            responses.append({"fullTextAnnotation": {"text": text, "pages": []}})
+        return jsonify({"responses": responses})
+
+    @app.route("/_fake/stats", methods=["GET"])
+    def fake_stats():
+        with lock:
+            return jsonify({**stats, "config": config.as_dict()})
+
+    @app.route("/_fake/config", methods=["POST"])
+    def fake_config():
+        try:
+            config.update(request.get_json() or {})
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(config.as_dict())
+
+    return app
+
+
+def serve_in_thread(config: FakeConfig = None, host: str = "127.0.0.1", port: int = 0):
+    """ Start the fake upstream on a background thread; returns (server, base_url). server.shutdown() stops it """
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(host, port, create_app(config), threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name="fake-upstream", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    defaults = FakeConfig()
+    for name, value in defaults.as_dict().items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = vars(parser.parse_args())
+    host, port = args.pop("host"), args.pop("port")
+
+    from werkzeug.serving import make_server
+    print(f"fake upstream on http://{host}:{port}  (OPENAI_BASE_URL=http://{host}:{port}/v1)")
+    make_server(host, port, create_app(FakeConfig(**args)), threaded=True).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
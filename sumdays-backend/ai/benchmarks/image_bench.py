@@ -0,0 +1,83 @@
+""" Image upload benchmark: bytes sent upstream, preprocessing time and description tokens.
+
+Synthesizes a phone-sized JPEG (textured so it compresses like a photo, EXIF-rotated) and
+compares sending it as uploaded (the old behaviour) with preprocess.prepare for OCR and for
+the description. Upload time is bytes over --mbps; description tokens follow OpenAI's image
+pricing (detail "low": 85; otherwise 85 + 170 per 512px tile after fitting 2048 and then
+768 on the short side).
+
+$ python benchmarks/image_bench.py --width 4032 --height 3024 --mbps 20
+"""
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.image import preprocess
+
+
+def synth_photo(width: int, height: int) -> bytes:
+    """ JPEG (q=95) of smooth gradients plus sensor-like noise, with EXIF orientation 6 """
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([x / width * 200, y / height * 180, (x + y) / (width + height) * 160], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    exif = Image.Exif()
+    exif[preprocess.ORIENTATION_TAG] = 6
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=95, exif=exif)
+    return out.getvalue()
+
+
+def description_tokens(size: tuple, detail: str) -> int:
+    if detail == "low":
+        return 85
+    width, height = size
+    scale = min(1, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def run(photo: bytes, long_edge: int, mbps: float) -> dict:
+    start = time.perf_counter()
+    prepared = preprocess.prepare(io.BytesIO(photo), long_edge)
+    seconds = time.perf_counter() - start
+    return {"bytes": len(prepared.data), "size": prepared.size, "prepare_s": round(seconds, 3),
+            "upload_s": round(len(prepared.data) * 8 / (mbps * 1e6), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--mbps", type=float, default=20, help="upload bandwidth to the upstreams")
+    args = parser.parse_args()
+
+    photo = synth_photo(args.width, args.height)
+    original = {"bytes": len(photo), "size": (args.width, args.height),
+                "upload_s": round(len(photo) * 8 / (args.mbps * 1e6), 3)}
+    ocr = run(photo, preprocess.OCR_LONG_EDGE, args.mbps)
+    describe = run(photo, preprocess.DESCRIBE_LONG_EDGE, args.mbps)
+    print(json.dumps({
+        "original": original,
+        "ocr": {**ocr, "long_edge": preprocess.OCR_LONG_EDGE, "bytes_saved": f"{1 - ocr['bytes'] / len(photo):.1%}"},
+        "describe": {**describe, "long_edge": preprocess.DESCRIBE_LONG_EDGE, "detail": preprocess.DESCRIBE_DETAIL,
+                     "bytes_saved": f"{1 - describe['bytes'] / len(photo):.1%}"},
+        # the old request: the full photo as a base64 data URI at the default detail
+        "describe_tokens": {"before": description_tokens(original["size"], "auto"),
+                            "after": description_tokens(describe["size"], preprocess.DESCRIBE_DETAIL)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
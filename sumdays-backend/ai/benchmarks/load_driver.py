@@ -0,0 +1,198 @@
+""" Concurrent load driver for the AI server against the fake upstream.
+
+Starts benchmarks/fake_upstream.py in this process and the Flask app in a child process
+pointed at it (or hits --url), then replays the sample payloads route by route with
+--concurrency closed-loop clients. Reports per route: requests/sec, latency p50/p95/p99,
+time to first byte (streaming routes) and the server's peak RSS; saved as JSON.
+
+$ python benchmarks/load_driver.py --requests 100 --concurrency 16 --latency 0.3 --ttft 0.4
+$ python benchmarks/load_driver.py --routes merge_stream,merge --out before.json
+$ python benchmarks/load_driver.py --routes merge_stream,merge --asgi --out after.json
+$ python benchmarks/load_driver.py compare before.json after.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from benchmarks.fake_upstream import serve_in_thread, FakeConfig
+from benchmarks.workloads import (
+    AI_DIR, STREAMING_ROUTES, build_requests, percentiles, peak_rss_mb, save_results
+)
+
+SERVER = r"""
+import os, sys, warnings
+# langchain's structured output trips a harmless pydantic serializer warning on every call
+warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
+from werkzeug.serving import make_server, WSGIRequestHandler
+sys.path.insert(0, os.getcwd())
+from benchmarks.workloads import use_stub_embeddings
+stubbed = use_stub_embeddings(os.getenv("BENCH_STUB_EMBEDDINGS") == "1")
+from app import app
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+if os.getenv("BENCH_ASGI") == "1":
+    import socket, uvicorn
+    from asgi import app as asgi_app
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    print(f"READY {sock.getsockname()[1]} {int(stubbed)}", flush=True)
+    uvicorn.Server(uvicorn.Config(asgi_app, log_level="warning")).run(sockets=[sock])
+else:
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    print(f"READY {server.server_port} {int(stubbed)}", flush=True)
+    server.serve_forever()
+"""
+
+
+def start_server(upstream_url: str, stub_embeddings: bool, use_asgi: bool = False):
+    env = {
+        **os.environ,
+        "OPENAI_BASE_URL": f"{upstream_url}/v1",
+        "VISION_API_ENDPOINT": upstream_url,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-bench"),
+        "GOOGLE_APPLICATION_CREDENTIALS": os.getenv("GOOGLE_APPLICATION_CREDENTIALS", ""),
+        "BENCH_STUB_EMBEDDINGS": "1" if stub_embeddings else "0",
+        "BENCH_ASGI": "1" if use_asgi else "0",
+        "LOG_LEVEL": "WARNING",
+    }
+    proc = subprocess.Popen([sys.executable, "-c", SERVER], cwd=AI_DIR, env=env, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline().split()
+    if not line or line[0] != "READY":
+        proc.kill()
+        raise RuntimeError("AI server failed to start")
+    return proc, f"http://127.0.0.1:{line[1]}", line[2] == "1"
+
+
+def one_request(client: httpx.Client, url: str, bench_request) -> dict:
+    start = time.perf_counter()
+    ttfb = None
+    with client.stream("POST", url + bench_request.path, **bench_request.httpx_kwargs()) as response:
+        for chunk in response.iter_bytes():
+            if ttfb is None and chunk:
+                ttfb = time.perf_counter() - start
+    return {"seconds": time.perf_counter() - start, "ttfb": ttfb, "ok": response.status_code < 400}
+
+
+def run_route(url: str, name: str, bench_request, n: int, concurrency: int) -> dict:
+    client = httpx.Client(timeout=120, limits=httpx.Limits(max_connections=concurrency))
+    samples = []
+    lock = threading.Lock()
+
+    def worker(_):
+        try:
+            sample = one_request(client, url, bench_request)
+        except httpx.HTTPError:
+            sample = {"seconds": 0.0, "ttfb": None, "ok": False}
+        with lock:
+            samples.append(sample)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(n)))
+    wall = time.perf_counter() - start
+    client.close()
+
+    ok = [s for s in samples if s["ok"]]
+    result = {
+        "requests": n,
+        "errors": n - len(ok),
+        "rps": round(len(ok) / wall, 2),
+        "latency_ms": percentiles([s["seconds"] for s in ok]),
+    }
+    if name in STREAMING_ROUTES:
+        result["ttfb_ms"] = percentiles([s["ttfb"] for s in ok if s["ttfb"] is not None])
+    return result
+
+
+def compare(before_path: str, after_path: str):
+    """ Print rps / p50 / p95 changes per route between two saved runs """
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['commit']} -> {after['commit']}")
+    print(f"{'route':<18}{'rps':>18}{'p50 ms':>22}{'p95 ms':>22}")
+    for name, new in after["routes"].items():
+        old = before["routes"].get(name)
+        if old is None:
+            continue
+        cell = lambda a, b: f"{a}→{b}" if a is None or b is None else f"{a}→{b} ({(b - a) / a * 100 if a else 0:+.0f}%)"
+        print(f"{name:<18}{cell(old['rps'], new['rps']):>18}"
+              f"{cell(old['latency_ms']['p50'], new['latency_ms']['p50']):>22}"
+              f"{cell(old['latency_ms']['p95'], new['latency_ms']['p95']):>22}")
+    print(f"peak RSS: {before.get('server_peak_rss_mb')} MB -> {after.get('server_peak_rss_mb')} MB")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        return compare(*sys.argv[2:4])
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="benchmark a running server instead of starting one (needs its own upstream setup)")
+    parser.add_argument("--routes", help="comma separated subset, default all")
+    parser.add_argument("--requests", type=int, default=50, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--use-cache", action="store_true", help="do not send X-Cache-Bypass")
+    parser.add_argument("--stub-embeddings", action="store_true", help="hashing encoder even if torch is installed")
+    parser.add_argument("--asgi", action="store_true", help="serve asgi.py with uvicorn instead of the threaded Flask server")
+    parser.add_argument("--out", help="result JSON path (default benchmarks/results/<time>-<commit>.json)")
+    for name, value in FakeConfig().as_dict().items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    config = FakeConfig(**{name: getattr(args, name) for name in FakeConfig().as_dict()})
+    requests = build_requests(bypass_cache=not args.use_cache)
+    names = args.routes.split(",") if args.routes else list(requests)
+
+    upstream, upstream_url = serve_in_thread(config)
+    proc, stubbed = None, None
+    try:
+        if args.url:
+            url = args.url
+        else:
+            proc, url, stubbed = start_server(upstream_url, args.stub_embeddings, args.asgi)
+
+        routes = {}
+        for name in names:
+            # one warm-up request so lazy model loads and connection setup are not measured
+            run_route(url, name, requests[name], 1, 1)
+            routes[name] = run_route(url, name, requests[name], args.requests, args.concurrency)
+            r = routes[name]
+            ttfb = f"  ttfb p50 {r['ttfb_ms']['p50']} ms" if "ttfb_ms" in r else ""
+            print(f"{name:<16} {r['rps']:>8} rps  p50 {r['latency_ms']['p50']} p95 {r['latency_ms']['p95']} "
+                  f"p99 {r['latency_ms']['p99']} ms  errors {r['errors']}{ttfb}")
+
+        server_rss = peak_rss_mb(proc.pid) if proc else None
+        print(f"server peak RSS: {server_rss} MB")
+        out = save_results({
+            "kind": "load",
+            "concurrency": args.concurrency,
+            "requests_per_route": args.requests,
+            "stub_embeddings": stubbed,
+            "server": "asgi" if args.asgi else "flask",
+            "upstream": config.as_dict(),
+            "server_peak_rss_mb": server_rss,
+            "driver_peak_rss_mb": peak_rss_mb(),
+            "routes": routes,
+        }, args.out)
+        print(f"saved {out}")
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+        upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
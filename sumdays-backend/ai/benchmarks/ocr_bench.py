@@ -0,0 +1,68 @@
+""" OCR fan-out benchmark against a stub Vision client with injected latency.
+
+Compares the old one-image-at-a-time behaviour (ocr_max_workers=1) with the
+thread-pooled ImageService.extract_text_from_image.
+
+$ python benchmarks/ocr_bench.py --pages 10 --latency 0.4
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "")
+
+from services.image.image_service import ImageService
+
+
+class StubVisionClient:
+    """ Mimics ImageAnnotatorClient.document_text_detection with a sleep """
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+
+    def document_text_detection(self, image):
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        return SimpleNamespace(
+            error=SimpleNamespace(message=""),
+            full_text_annotation=SimpleNamespace(text=f"{len(image.content)} bytes of diary text"),
+        )
+
+
+def run(workers: int, pages: int, latency: float, jitter: float) -> float:
+    service = ImageService(ocr_client=StubVisionClient(latency, jitter), ocr_max_workers=workers)
+    files = [io.BytesIO(b"x" * (1000 + i)) for i in range(pages)]
+    start = time.perf_counter()
+    texts = service.extract_text_from_image(files, use_cache=False)
+    elapsed = time.perf_counter() - start
+    assert [t.text for t in texts] == [f"{1000 + i} bytes of diary text" for i in range(pages)]
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.4, help="mean seconds per Vision call")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    serial = run(1, args.pages, args.latency, args.jitter)
+    parallel = run(args.workers, args.pages, args.latency, args.jitter)
+    print(json.dumps({
+        "pages": args.pages,
+        "latency_s": args.latency,
+        "serial_s": round(serial, 3),
+        "parallel_s": round(parallel, 3),
+        "speedup": round(serial / parallel, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
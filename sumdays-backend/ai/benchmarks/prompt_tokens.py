@@ -0,0 +1,55 @@
+""" Prompt-token savings of the compact diary renderer on the summarize_week_* fixtures.
+
+Compares the diaries block as it used to be sent (Python repr of the request's list)
+with render_diaries(), with and without a token budget, and the whole week prompt
+(before: indented template + repr, after: dedented template + budgeted lines).
+
+$ python benchmarks/prompt_tokens.py
+$ python benchmarks/prompt_tokens.py --budget 150 --show
+"""
+import argparse
+import glob
+import os
+import sys
+import textwrap
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from benchmarks.workloads import TESTCASE_DIR, load_testcase
+from services.analysis import diary_render
+from services.analysis.diary_render import count_tokens, render_diaries
+from services.analysis.summary_service import SummaryService, WEEK_DIARY_TOKEN_BUDGET
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=WEEK_DIARY_TOKEN_BUDGET, help="token budget for the diaries block")
+    parser.add_argument("--show", action="store_true", help="print the rendered diaries")
+    args = parser.parse_args()
+
+    service = SummaryService()
+    count_tokens("")
+    counter = "tiktoken" if diary_render._encoding else "estimate (utf-8 bytes / 4)"
+    print(f"token counter: {counter}")
+    print(f"{'fixture':<20}{'repr':>8}{'compact':>10}{f'budget {args.budget}':>14}{'prompt before':>16}{'prompt after':>15}{'saved':>8}")
+
+    totals = [0, 0]
+    for path in sorted(glob.glob(os.path.join(TESTCASE_DIR, "summarize_week_*"))):
+        diaries = load_testcase(os.path.basename(path))["diaries"]
+        prompt = service._week_chain(diaries).first
+        compact = render_diaries(diaries)
+        budgeted = render_diaries(diaries, args.budget)
+        before = count_tokens(textwrap.indent(prompt.template, " " * 12).format(diaries=diaries, **prompt.partial_variables))
+        after = count_tokens(prompt.format(diaries=budgeted))
+        totals[0] += before
+        totals[1] += after
+        print(f"{os.path.basename(path):<20}{count_tokens(str(diaries)):>8}{count_tokens(compact):>10}"
+              f"{count_tokens(budgeted):>14}{before:>16}{after:>15}{(before - after) / before:>8.0%}")
+        if args.show:
+            print(budgeted, end="\n\n")
+    print(f"{'total':<20}{'':>32}{totals[0]:>16}{totals[1]:>15}{(totals[0] - totals[1]) / totals[0]:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+""" Cold-start benchmark for the AI server.
+
+Each run starts a fresh interpreter, imports app.py and answers GET / (liveness),
+then GET /ready, then loads the embedding model. Compares lazy loading with
+PRELOAD_MODELS=1 (what gunicorn --preload does in the master).
+
+$ python benchmarks/startup_bench.py --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+AI_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+from app import app
+t_import = time.perf_counter() - t0
+client = app.test_client()
+status = client.get("/").status_code
+t_live = time.perf_counter() - t0
+ready = client.get("/ready").status_code
+from services.common import model_registry
+model_registry.warm_up()
+t_model = time.perf_counter() - t0
+print(json.dumps({"import_s": t_import, "first_health_s": t_live, "health_status": status,
+                  "ready_status_before_load": ready, "model_loaded_s": t_model}))
+"""
+
+def run_once(preload: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+    env["PRELOAD_MODELS"] = "1" if preload else "0"
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=AI_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {}
+    for mode, preload in (("lazy", False), ("preload", True)):
+        runs = [run_once(preload) for _ in range(args.runs)]
+        report[mode] = {
+            key: statistics.median(r[key] for r in runs)
+            for key in ("import_s", "first_health_s", "model_loaded_s")
+        }
+        report[mode]["ready_status_before_load"] = runs[0]["ready_status_before_load"]
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+""" Voice memo benchmark: upload size and Whisper latency with and without audio preprocessing.
+
+Synthesizes a 44.1 kHz stereo 16-bit WAV memo (tone bursts between pauses, silent lead-in
+and tail) and transcribes it through a stub Whisper client whose latency grows with the
+upload size (upload over --mbps plus --per-second of processing per second of audio).
+"raw" sends the upload as is in one request (the old behaviour), "preprocessed" goes
+through SpeechToTextService (16 kHz mono, trimmed, chunked and transcribed in parallel), and
+"stream" through transcribe_stream (/stt/memo/stream), timing the first segment as well.
+
+$ python benchmarks/stt_bench.py --seconds 180 --mbps 20
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import time
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from services.stt import audio
+from services.stt.stt_service import SpeechToTextService
+
+
+def synth_memo(seconds: float, rate: int = 44100, lead: float = 3.0) -> bytes:
+    """ Stereo WAV: lead seconds of silence, then 2 s "phrases" with 0.6 s pauses, then silence again """
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    voiced = ((t % 2.6) < 2.0) & (t > lead) & (t < seconds - lead)
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * voiced + 0.001 * rng.standard_normal(len(t))
+    stereo = np.stack([signal, 0.8 * signal], axis=1)
+    out = io.BytesIO()
+    with wave.open(out, "wb") as writer:
+        writer.setnchannels(2)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes((np.clip(stereo, -1, 1) * 32767).astype("<i2").tobytes())
+    return out.getvalue()
+
+
+class StubTranscriptions:
+    """ Mimics client.audio.transcriptions.create: sleeps for upload + processing time """
+    def __init__(self, mbps: float, per_second: float):
+        self.mbps = mbps
+        self.per_second = per_second
+        self.uploaded = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, file, language, response_format):
+        name, data = file
+        data = data.read()
+        with self._lock:
+            self.uploaded += len(data)
+            self.requests += 1
+        seconds = audio_seconds(data, name)
+        time.sleep(len(data) * 8 / (self.mbps * 1e6) + seconds * self.per_second)
+        text = f"{seconds:.0f}초 분량의 메모"
+        return SimpleNamespace(text=text, segments=[SimpleNamespace(text=text, no_speech_prob=0.05)])
+
+def audio_seconds(data: bytes, name: str) -> float:
+    if name.endswith(".wav"):
+        with wave.open(io.BytesIO(data)) as reader:
+            return reader.getnframes() / reader.getframerate()
+    import soundfile
+    return soundfile.info(io.BytesIO(data)).duration
+
+
+def run(memo: bytes, mode: str, mbps: float, per_second: float) -> dict:
+    stub = StubTranscriptions(mbps, per_second)
+    upload = SimpleNamespace(read=lambda: memo, filename="memo.wav")
+    service = SpeechToTextService()
+    service.client = SimpleNamespace(audio=SimpleNamespace(transcriptions=stub))
+    first_text = None
+    start = time.perf_counter()
+    if mode == "stream":
+        _, segments = service.transcribe_stream(upload)
+        for _, text in segments:
+            if first_text is None and text:
+                first_text = round(time.perf_counter() - start, 3)
+    elif mode == "preprocessed":
+        service.transcribe(upload)
+    else:
+        stub.create(model="whisper-1", file=("memo.wav", io.BytesIO(memo)), language="ko", response_format="verbose_json")
+    seconds = round(time.perf_counter() - start, 3)
+    return {"seconds": seconds, "first_text_seconds": first_text or seconds,
+            "uploaded_bytes": stub.uploaded, "requests": stub.requests}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=180, help="length of the synthetic memo")
+    parser.add_argument("--mbps", type=float, default=20, help="upload bandwidth to the Whisper API")
+    parser.add_argument("--per-second", type=float, default=0.02, help="Whisper processing seconds per audio second")
+    args = parser.parse_args()
+
+    memo = synth_memo(args.seconds)
+    raw = run(memo, "raw", args.mbps, args.per_second)
+    preprocessed = run(memo, "preprocessed", args.mbps, args.per_second)
+    stream = run(memo, "stream", args.mbps, args.per_second)
+    print(json.dumps({
+        "memo_seconds": args.seconds,
+        "encoding": "flac" if audio.soundfile is not None and audio.ENCODING == "flac" else "wav",
+        "chunk_seconds": audio.CHUNK_SECONDS,
+        "stream_chunk_seconds": SpeechToTextService().stream_chunk_seconds,
+        "raw": raw,
+        "preprocessed": preprocessed,
+        "stream": stream,
+        "bytes_saved": f"{1 - preprocessed['uploaded_bytes'] / raw['uploaded_bytes']:.0%}",
+        "speedup": round(raw["seconds"] / preprocessed["seconds"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
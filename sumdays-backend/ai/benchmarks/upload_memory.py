@@ -0,0 +1,81 @@
+""" Peak Python memory per upload request (tracemalloc), against the fake upstream.
+
+Each request's WSGI environ is built first, so only what the server allocates while
+parsing and handling the upload is counted, not the client's copy of the body.
+
+    image_diary   --pages JPEG-sized pages to /image/diary (OCR fan-out)
+    image_memo    one page to /image/memo type=describe (base64 data URI for the vision model)
+    stt_m4a       a compressed memo to /stt/memo (passed through to Whisper)
+    stt_wav       a 44.1 kHz stereo WAV memo to /stt/memo (decoded and resampled)
+
+$ python benchmarks/upload_memory.py --page-mb 4 --pages 6 --audio-seconds 120
+$ UPLOAD_SPOOL_BYTES=1000000000 python benchmarks/upload_memory.py   (everything kept in memory)
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fake_upstream import serve_in_thread, FakeConfig
+
+_upstream, _upstream_url = serve_in_thread(FakeConfig(latency=0, jitter=0, ttft=0, ocr_latency=0, stt_latency=0))
+os.environ["OPENAI_BASE_URL"] = f"{_upstream_url}/v1"
+os.environ["VISION_API_ENDPOINT"] = _upstream_url
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "")
+
+from werkzeug.test import EnvironBuilder
+
+from app import app
+from benchmarks.stt_bench import synth_memo
+from services.common import uploads
+
+
+def peak_mb(path: str, data: dict) -> dict:
+    environ = EnvironBuilder(path=path, method="POST", data=data, content_type="multipart/form-data",
+                             headers={"X-Cache-Bypass": "1"}).get_environ()
+    status = {}
+
+    def start_response(code, headers, exc_info=None):
+        status["code"] = int(code.split()[0])
+
+    tracemalloc.start()
+    try:
+        body = b"".join(app.wsgi_app(environ, start_response))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert status["code"] == 200, body[:200]
+    return {"peak_mb": round(peak / 2 ** 20, 2)}
+
+
+def main():
+    import io
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-mb", type=float, default=4, help="size of each uploaded image")
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--audio-seconds", type=float, default=120)
+    args = parser.parse_args()
+
+    page = os.urandom(int(args.page_mb * 2 ** 20))
+    m4a = os.urandom(int(args.audio_seconds * 16000))  # ~128 kbps
+    wav = synth_memo(args.audio_seconds)
+    cases = {
+        "image_diary": ("/image/diary", lambda: {"image": [(io.BytesIO(page), f"page{i}.jpg") for i in range(args.pages)]}),
+        "image_memo": ("/image/memo", lambda: {"type": "describe", "image": (io.BytesIO(page), "page.jpg")}),
+        "stt_m4a": ("/stt/memo", lambda: {"audio": (io.BytesIO(m4a), "memo.m4a")}),
+        "stt_wav": ("/stt/memo", lambda: {"audio": (io.BytesIO(wav), "memo.wav")}),
+    }
+    sizes = {"image_diary": len(page) * args.pages, "image_memo": len(page), "stt_m4a": len(m4a), "stt_wav": len(wav)}
+
+    results = {}
+    for name, (path, data) in cases.items():
+        results[name] = {"upload_mb": round(sizes[name] / 2 ** 20, 2), **peak_mb(path, data())}
+    print(json.dumps({"spool_bytes": uploads.SPOOL_BYTES, "routes": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
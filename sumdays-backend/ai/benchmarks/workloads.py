@@ -0,0 +1,157 @@
+""" Shared pieces of the benchmark harness: real request payloads, stubs and stats.
+
+Payloads come from sumdays-backend/testcase and sumdays-backend/payload.json, so the
+numbers reflect what the Node server actually sends.
+"""
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+AI_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BACKEND_DIR = os.path.dirname(AI_DIR)
+TESTCASE_DIR = os.path.join(BACKEND_DIR, "testcase")
+
+# routes answered as a stream; their time to first byte is what the user feels
+STREAMING_ROUTES = {"merge_stream", "merge_paragraph"}
+
+
+def load_testcase(name: str) -> dict:
+    """ testcase files are JSON with leading '#' comment lines """
+    with open(os.path.join(TESTCASE_DIR, name), encoding="utf-8") as f:
+        return json.loads("".join(line for line in f if not line.lstrip().startswith("#")))
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class BenchRequest:
+    """ One HTTP request, replayable through the Flask test client or httpx """
+    def __init__(self, path, json_body=None, form=None, files=(), headers=None):
+        self.path = path
+        self.json_body = json_body
+        self.form = form or {}
+        self.files = list(files)  # (field, filename, bytes, mime)
+        self.headers = headers or {}
+
+    def test_client_kwargs(self) -> dict:
+        import io
+        if self.json_body is not None:
+            return {"json": self.json_body, "headers": self.headers}
+        data = dict(self.form)
+        for field, filename, content, _ in self.files:
+            data.setdefault(field, []).append((io.BytesIO(content), filename))
+        return {"data": data, "content_type": "multipart/form-data", "headers": self.headers}
+
+    def httpx_kwargs(self) -> dict:
+        if self.json_body is not None:
+            return {"json": self.json_body, "headers": self.headers}
+        return {
+            "data": self.form,
+            "files": [(field, (filename, content, mime)) for field, filename, content, mime in self.files],
+            "headers": self.headers,
+        }
+
+
+def build_requests(bypass_cache: bool = True) -> dict:
+    """ route name -> BenchRequest, built from the repo's sample payloads """
+    headers = {"X-Cache-Bypass": "1"} if bypass_cache else {}
+    week = load_testcase("summarize_week_1")
+    with open(os.path.join(BACKEND_DIR, "payload.json"), encoding="utf-8") as f:
+        merge = json.load(f)
+    merge_body = {k: merge[k] for k in ("memos", "style_prompt", "style_examples")}
+    diary_page = read_bytes(os.path.join(TESTCASE_DIR, "일기 예시.jpg"))
+    diary_page2 = read_bytes(os.path.join(TESTCASE_DIR, "일기 예시2.jpg"))
+
+    return {
+        "analysis_diary": BenchRequest("/analysis/diary", {"diary": week["diaries"][0]["diary"]}, headers=headers),
+        "analysis_week": BenchRequest("/analysis/week", week, headers=headers),
+        "merge": BenchRequest("/merge/", merge_body, headers=headers),
+        "merge_stream": BenchRequest("/merge/stream", merge_body, headers=headers),
+        "merge_paragraph": BenchRequest("/merge/paragraph", {**merge_body, "memos": merge["memos"][:2], "length_level": 1}, headers=headers),
+        "merge_mood": BenchRequest("/merge/mood", {
+            "diary": "\n\n".join(m["content"] for m in merge["memos"]),
+            "style_prompt": merge["style_prompt"],
+            "style_examples": merge["style_examples"],
+        }, headers=headers),
+        "extract_style": BenchRequest("/extract/style", {"diaries": [d["diary"] for d in week["diaries"]]}, headers=headers),
+        "image_memo": BenchRequest("/image/memo", form={"type": "extract"}, files=[
+            ("image", "ocr_test.jpg", read_bytes(os.path.join(TESTCASE_DIR, "ocr_test_한국어.jpg")), "image/jpeg"),
+        ], headers=headers),
+        "image_diary": BenchRequest("/image/diary", files=[
+            ("image", "page1.jpg", diary_page, "image/jpeg"),
+            ("image", "page2.jpg", diary_page2, "image/jpeg"),
+        ], headers=headers),
+        "stt_memo": BenchRequest("/stt/memo", files=[
+            ("audio", "sample_audio.wav", read_bytes(os.path.join(TESTCASE_DIR, "sample_audio.wav")), "audio/wav"),
+        ], headers=headers),
+    }
+
+
+class HashingEncoder:
+    """ Stand-in for the sentence-transformers model: deterministic vectors, ~no compute.
+    Used when torch is not installed, so /extract/style measures the server, not the model.
+    """
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    def encode(self, sentences, convert_to_numpy=True, batch_size=64):
+        import numpy as np
+        rows = []
+        for s in sentences:
+            seed = int.from_bytes(hashlib.sha256(s.encode("utf-8")).digest()[:8], "little")
+            rows.append(np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32))
+        return np.stack(rows) if rows else np.zeros((0, self.dim), dtype=np.float32)
+
+def use_stub_embeddings(force: bool = False) -> bool:
+    """ Swap in HashingEncoder if forced or sentence-transformers is missing; True if stubbed """
+    if not force:
+        try:
+            import sentence_transformers  # noqa: F401
+            return False
+        except ImportError:
+            pass
+    from services.common import model_registry
+    model_registry._load_sentence_transformer = lambda name: HashingEncoder()
+    return True
+
+
+def percentiles(samples, points=(50, 95, 99)) -> dict:
+    """ Nearest-rank percentiles in milliseconds of samples given in seconds """
+    if not samples:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(samples)
+    return {f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 2) for p in points}
+
+def peak_rss_mb(pid: int = None):
+    """ Peak resident set size (VmHWM) of pid, or of this process """
+    if pid is None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=AI_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def save_results(results: dict, out: str = None) -> str:
+    """ Write results (plus commit and timestamp) as JSON; default benchmarks/results/<time>-<commit>.json """
+    results = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0], **results}
+    if out is None:
+        out = os.path.join(os.path.dirname(__file__), "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return out
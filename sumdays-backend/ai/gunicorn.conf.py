@@ -0,0 +1,12 @@
+# gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = f"0.0.0.0:{os.getenv('AI_SERVER_PORT', '5001')}"
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = 120
+
+# import the app (and load the embedding model) once in the master, then fork workers;
+# the Vision gRPC channel and HTTP connections are opened on first use, in each worker
+preload_app = True
+os.environ.setdefault("PRELOAD_MODELS", "1")
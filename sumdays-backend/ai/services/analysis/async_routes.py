@@ -0,0 +1,36 @@
+""" /analysis routes for the async server (asgi.py) """
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from .routes import analyzer, summary_service, diary_response, week_response
+from ..common.metrics import record_error
+from ..common.deadline import error_status
+from ..common.response_cache import is_bypass
+
+async def analyze_diary(request: Request):
+    """ async POST /analysis/diary """
+    try:
+        data = await request.json()
+        diary = data.get("diary", "")
+        result = await analyzer.aanalyze(diary, use_cache=not is_bypass(request.headers))
+        return JSONResponse(diary_response(data, diary, result))
+
+    except Exception as e:
+        record_error(e, route="/analysis/diary")
+        return JSONResponse({"error": str(e)}, status_code=error_status(e))
+
+async def analyze_week(request: Request):
+    """ async POST /analysis/week """
+    try:
+        data = await request.json()
+        result = await summary_service.asummarize_week(data.get("diaries", ""), use_cache=not is_bypass(request.headers))
+        return JSONResponse(week_response(result))
+
+    except Exception as e:
+        record_error(e, route="/analysis/week")
+        return JSONResponse({"error": str(e)}, status_code=error_status(e))
+
+routes = [
+    Route("/analysis/diary", analyze_diary, methods=["POST"]),
+    Route("/analysis/week", analyze_week, methods=["POST"]),
+]
@@ -0,0 +1,118 @@
+""" Compact prompt text for a list of diaries (weekly / monthly summaries).
+
+One line per day instead of the Python repr of the request's dicts:
+
+    2025-10-13 | -0.8 | 오늘은 아침부터 지하철이 지연되어 지각했다. 팀장님께 혼나서 ...
+
+Whitespace is collapsed, a sentence already written on an earlier day is dropped (the day
+keeps its line, so its date and score still count), and fields the prompt does not use (emoji, ids, ...) are left out. With a token budget the
+least informative sentences go first: those made of character bigrams that are common
+across the week ("평범한 하루였다."), never a day's last sentence.
+Week summaries for the monthly prompt get the same treatment (render_weeks).
+"""
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+LINE_FORMAT = "날짜 | 감정 점수(-1.0~1.0) | 일기"
+WEEK_LINE_FORMAT = "기간 | 평균 감정 점수 | 이모지 | 제목 | 요약 | 키워드"
+_SENTENCE_END = re.compile(r"(?<=[.!?。…~])\s+|\n+")
+_WHITESPACE = re.compile(r"\s+")
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """ Tokens of text for GPT_MODEL; a UTF-8 byte estimate if tiktoken cannot load its encoding """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(os.getenv("GPT_MODEL", "gpt-4.1-nano"))
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # tiktoken downloads encodings on first use; offline we estimate instead
+            logger.warning("tiktoken unavailable (%s), estimating tokens", e)
+            _encoding = False
+    if _encoding is False:
+        return math.ceil(len(text.encode("utf-8")) / 4)
+    return len(_encoding.encode(text))
+
+
+def split_sentences(text: str) -> list:
+    return [s for s in (_WHITESPACE.sub(" ", part).strip() for part in _SENTENCE_END.split(text or "")) if s]
+
+def _bigrams(sentence: str) -> set:
+    compact = sentence.replace(" ", "")
+    return {compact[i:i + 2] for i in range(len(compact) - 1)} or {compact}
+
+def _informativeness(sentences: list) -> list:
+    """ Mean IDF of each sentence's character bigrams across all sentences """
+    grams = [_bigrams(s) for s in sentences]
+    df = Counter(g for gs in grams for g in gs)
+    n = len(sentences)
+    return [sum(math.log((n + 1) / df[g]) for g in gs) / len(gs) for gs in grams]
+
+def _score(value) -> str:
+    try:
+        return f"{float(value):+.1f}"
+    except (TypeError, ValueError):
+        return "?"
+
+
+def render_diaries(diaries: list, token_budget: int = None) -> str:
+    """ diaries: [{"date", "diary", "emotion_score", ...}] -> one line per day, within token_budget if given """
+    days = []
+    seen = set()
+    for entry in diaries:
+        sentences = []
+        for sentence in split_sentences(entry.get("diary", "")):
+            if sentence not in seen:
+                seen.add(sentence)
+                sentences.append(sentence)
+        days.append((f"{entry.get('date') or '?'} | {_score(entry.get('emotion_score'))} | ", sentences))
+
+    if token_budget:
+        _trim(days, token_budget)
+    return "\n".join((prefix + " ".join(sentences)).rstrip() for prefix, sentences in days)
+
+
+def _trim(days: list, token_budget: int):
+    """ Drop the least informative sentences (in place) until the rendered text fits """
+    flat = [(d, s) for d, (_, sentences) in enumerate(days) for s in sentences]
+    tokens = {s: count_tokens(" " + s) for _, s in flat}
+    total = sum(count_tokens(prefix) + 1 for prefix, _ in days) + sum(tokens.values())
+    if total <= token_budget:
+        return
+
+    ranked = sorted(zip(_informativeness([s for _, s in flat]), range(len(flat))))
+    left = Counter(d for d, _ in flat)
+    for _, idx in ranked:
+        if total <= token_budget:
+            break
+        day, sentence = flat[idx]
+        if left[day] == 1:
+            continue
+        days[day][1].remove(sentence)
+        left[day] -= 1
+        total -= tokens[sentence]
+    if total > token_budget:
+        logger.info("diary text is %d tokens after trimming, over the %d budget", total, token_budget)
+
+
+def render_weeks(weeks: list) -> str:
+    """ weeks: [{"week_range", "average_emotion", "dominant_emoji", "title", "overview", "keywords"}] -> one line per week """
+    lines = []
+    for week in weeks:
+        overview = " ".join(split_sentences(week.get("overview", "")))
+        keywords = ", ".join(week.get("keywords") or [])
+        lines.append(" | ".join([
+            week.get("week_range") or "?", _score(week.get("average_emotion")), week.get("dominant_emoji") or "",
+            _WHITESPACE.sub(" ", week.get("title") or "").strip(), overview, keywords,
+        ]))
+    return "\n".join(lines)
@@ -1,18 +1,194 @@
 import os
 import json
-from typing import Dict, Any
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+from ..common.clients import get_openai_client, get_async_openai_client
+from ..common.usage import add_usage
+from ..common.response_cache import response_cache
+from ..common.metrics import upstream_timer, observe_tokens
+from ..common import deadline
+from ..common.pipeline import map_in_context
 
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+# retries are left to deadline.call, which knows how much time the request has left
+client = get_openai_client().with_options(max_retries=0)
+# bump when the analysis prompt or output format changes, so cached results are not reused
+ANALYZE_PROMPT_VERSION = "1"
+# batch analysis: diaries per GPT call, character cap per call, packs in flight per request
+BATCH_PACK_SIZE = int(os.getenv("ANALYZE_BATCH_PACK_SIZE", "8"))
+BATCH_PACK_CHARS = int(os.getenv("ANALYZE_BATCH_PACK_CHARS", "8000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_MAX_CONCURRENCY", "4"))
+# packs of all batch requests run here
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ANALYZE_BATCH_MAX_WORKERS", "16")), thread_name_prefix="analyze-batch"
+)
+
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "diary_analysis_batch",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string"},
+                            "keywords": {"type": "array", "items": {"type": "string"}},
+                            "emoji": {"type": "string"},
+                            "emotion_score": {"type": "number"},
+                        },
+                        "required": ["id", "keywords", "emoji", "emotion_score"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["results"],
+            "additionalProperties": False,
+        },
+    },
+}
 
 class DiaryAnalyzer:
     def __init__(self):
         self.model = os.getenv("GPT_MODEL", "gpt-4.1-nano")
 
-    def analyze(self, diary: str) -> Dict[str, Any]:
+    def _cache_key(self, diary: str) -> str:
+        return response_cache.make_key("analyze", self.model, ANALYZE_PROMPT_VERSION, diary)
+
+    def analyze(self, diary: str, usage: dict = None, use_cache: bool = True) -> Dict[str, Any]:
+        """ Analyze a diary; identical (normalized) diaries are answered from response_cache """
+        if not diary.strip():
+            raise ValueError("Diary text is required.")
+
+        return response_cache.get_or_compute(self._cache_key(diary), lambda: self._analyze(diary, usage), use_cache=use_cache)
+
+    async def aanalyze(self, diary: str, usage: dict = None, use_cache: bool = True) -> Dict[str, Any]:
+        """ analyze() on AsyncOpenAI, same cache """
         if not diary.strip():
             raise ValueError("Diary text is required.")
 
+        key = self._cache_key(diary)
+        result = response_cache.get(key) if use_cache else None
+        if result is None:
+            params = self._analyze_request(diary)
+            async_client = get_async_openai_client().with_options(max_retries=0)
+            with upstream_timer("openai_chat", "analyze"):
+                response = await deadline.acall(
+                    "analyze", lambda timeout: async_client.chat.completions.create(**params, timeout=timeout)
+                )
+            result = self._analyze_result(response, usage)
+            response_cache.set(key, result)
+        return result
+
+    def analyze_batch(self, diaries: List[str], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """ Analyze many diaries with few GPT calls.
+        Uncached diaries are packed several per structured-output call and the packs run concurrently;
+        a diary repeated in the batch (same cache key) is sent once.
+        Returns one entry per input, in order: the analyze() result or {"error": "..."}.
+        """
+        results = [None] * len(diaries)
+        copies = {}  # cache key -> indices of that diary in the batch
+        for idx, diary in enumerate(diaries):
+            if not isinstance(diary, str) or not diary.strip():
+                results[idx] = {"error": "Diary text is required."}
+                continue
+            key = self._cache_key(diary)
+            if key in copies:
+                copies[key].append(idx)
+                continue
+            cached = response_cache.get(key) if use_cache else None
+            if cached is not None:
+                results[idx] = cached
+            else:
+                copies[key] = [idx]
+        same = {indices[0]: indices for indices in copies.values()}
+        pending = list(same)
+
+        packs, pack, pack_chars = [], [], 0
+        for idx in pending:
+            if pack and (len(pack) >= BATCH_PACK_SIZE or pack_chars + len(diaries[idx]) > BATCH_PACK_CHARS):
+                packs.append(pack)
+                pack, pack_chars = [], 0
+            pack.append(idx)
+            pack_chars += len(diaries[idx])
+        if pack:
+            packs.append(pack)
+
+        def run_pack(pack):
+            try:
+                return self._analyze_pack([diaries[idx] for idx in pack])
+            except deadline.DeadlineExceeded:
+                # the caller has stopped waiting: the whole batch is late, not one pack
+                raise
+            except Exception as e:
+                return [{"error": str(e)}] * len(pack)
+
+        pack_results = map_in_context(batch_executor, run_pack, packs, max_in_flight=BATCH_MAX_CONCURRENCY)
+        for pack, answers in zip(packs, pack_results):
+            for idx, result in zip(pack, answers):
+                if result is None:
+                    # the model skipped this item; fall back to a single call
+                    try:
+                        result = self.analyze(diaries[idx], use_cache=False)
+                    except deadline.DeadlineExceeded:
+                        raise
+                    except Exception as e:
+                        result = {"error": str(e)}
+                elif "error" not in result:
+                    response_cache.set(self._cache_key(diaries[idx]), result)
+                for copy in same[idx]:
+                    results[copy] = result
+
+        return results
+
+    def _analyze_pack(self, diaries: List[str]) -> List[Dict[str, Any]]:
+        """ One structured-output call for several diaries; None for any id the model left out """
+        developer_msg = """
+You are helping an app service that analyzes diary entries.
+The user message is a JSON list of {"id", "diary"} objects. Analyze every diary independently.
+Return {"results": [...]} with exactly one object per input id:
+- "id": the input id, unchanged
+- "keywords": list of 1–5 Korean strings summarizing that diary
+- "emoji": a single emoji representing that diary
+- "emotion_score": a float from -1.0 (very negative) to 1.0 (very positive)
+
+Respond in the same language as each diary.
+"""
+        items = [{"id": f"d{i}", "diary": diary} for i, diary in enumerate(diaries)]
+        with upstream_timer("openai_chat", "analyze_batch"):
+            response = deadline.call("analyze_batch", lambda timeout: client.chat.completions.create(
+                timeout=timeout,
+                model=self.model,
+                messages=[
+                    {"role": "developer", "content": developer_msg},
+                    {"role": "user", "content": json.dumps(items, ensure_ascii=False)},
+                ],
+                response_format=BATCH_RESPONSE_FORMAT,
+                temperature=0.5,
+            ))
+        observe_tokens(self.model, response.usage)
+
+        by_id = {r["id"]: r for r in json.loads(response.choices[0].message.content)["results"]}
+        results = []
+        for item in items:
+            r = by_id.get(item["id"])
+            results.append(None if r is None else {
+                "keywords": r["keywords"],
+                "emoji": r["emoji"],
+                "emotion_score": float(r["emotion_score"]),
+            })
+        return results
+
+    def _analyze(self, diary: str, usage: dict = None) -> Dict[str, Any]:
+        params = self._analyze_request(diary)
+        with upstream_timer("openai_chat", "analyze"):
+            response = deadline.call("analyze", lambda timeout: client.chat.completions.create(**params, timeout=timeout))
+        return self._analyze_result(response, usage)
+
+    def _analyze_request(self, diary: str) -> dict:
         developer_msg = """
 You are helping an app service that analyzes a diary entry.
 Return a JSON object with exactly these keys:
@@ -22,7 +198,7 @@ Return a JSON object with exactly these keys:
 
 Respond in the same language as the user's input.
 """
-        response = client.chat.completions.create(
+        return dict(
             model=self.model,
             messages=[
                 {"role": "developer", "content": developer_msg},
@@ -32,6 +208,9 @@ Respond in the same language as the user's input.
             temperature=0.5,
         )
 
+    def _analyze_result(self, response, usage: dict = None) -> Dict[str, Any]:
+        add_usage(usage, response.usage)
+        observe_tokens(self.model, response.usage)
         result = json.loads(response.choices[0].message.content)
         return {
             "keywords": result["keywords"],
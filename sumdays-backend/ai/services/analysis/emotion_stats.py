@@ -0,0 +1,80 @@
+""" Emotion statistics of a set of diaries, computed from their per-day analysis results.
+
+Every diary already carries the emotion_score (-1.0~1.0) and emoji from /analysis/diary,
+so the distribution, mean score, trend and dominant emoji are counted here instead of
+being guessed by the summary model.
+"""
+from collections import Counter
+from datetime import date
+from typing import Dict, Any
+
+import numpy as np
+
+# same cut-offs as the Node server's calculateEmotionDistribution_week
+POSITIVE_THRESHOLD = 0.2
+NEGATIVE_THRESHOLD = -0.2
+# score change per day below which the week counts as stable
+TREND_THRESHOLD = 0.05
+# used when no diary has an emoji
+FALLBACK_EMOJI = {"positive": "🙂", "neutral": "😌", "negative": "😔"}
+
+
+def _scores(diaries: list[Dict]) -> np.ndarray:
+    """ emotion_score per diary, NaN where it is missing or not a number """
+    values = []
+    for diary in diaries:
+        try:
+            values.append(float(diary.get("emotion_score")))
+        except (TypeError, ValueError):
+            values.append(np.nan)
+    return np.array(values, dtype=float)
+
+def _days(diaries: list[Dict]) -> np.ndarray:
+    """ x axis for the trend: days since the first diary, or the diary order without dates """
+    try:
+        ordinals = np.array([date.fromisoformat(str(d.get("date"))[:10]).toordinal() for d in diaries], dtype=float)
+    except ValueError:
+        return np.arange(len(diaries), dtype=float)
+    return ordinals - ordinals.min() if ordinals.size else ordinals
+
+def _tone(score: float) -> str:
+    if score > POSITIVE_THRESHOLD:
+        return "positive"
+    if score < NEGATIVE_THRESHOLD:
+        return "negative"
+    return "neutral"
+
+
+def week_statistics(diaries: list[Dict]) -> Dict[str, Any]:
+    """ {"distribution", "emotion_score", "trend", "dominant_emoji"} of the diaries """
+    scores = _scores(diaries)
+    known = ~np.isnan(scores)
+    valid = scores[known]
+
+    distribution = {
+        "positive": int(np.count_nonzero(valid > POSITIVE_THRESHOLD)),
+        "neutral": int(np.count_nonzero((valid >= NEGATIVE_THRESHOLD) & (valid <= POSITIVE_THRESHOLD))),
+        "negative": int(np.count_nonzero(valid < NEGATIVE_THRESHOLD)),
+    }
+    mean = float(valid.mean()) if valid.size else 0.0
+
+    trend = "stable"
+    x = _days(diaries)[known]
+    # a slope needs two distinct days
+    if np.unique(x).size >= 2:
+        slope = np.polyfit(x, valid, 1)[0]
+        if slope > TREND_THRESHOLD:
+            trend = "increasing"
+        elif slope < -TREND_THRESHOLD:
+            trend = "decreasing"
+
+    emojis = Counter(d["emoji"] for d in diaries if d.get("emoji"))
+    # ties go to the emoji written first
+    dominant_emoji = emojis.most_common(1)[0][0] if emojis else FALLBACK_EMOJI[_tone(mean)]
+
+    return {
+        "distribution": distribution,
+        "emotion_score": round(mean, 2),
+        "trend": trend,
+        "dominant_emoji": dominant_emoji,
+    }
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from .diary_service import DiaryAnalyzer
 from .summary_service import SummaryService
+from ..common.response_cache import is_bypass
+from ..common.metrics import record_error
+from ..common.deadline import error_status
 
 analyzer = DiaryAnalyzer()
 summary_service = SummaryService()
@@ -17,6 +20,7 @@ def analyze_diary():
             ...
         }
     \}
+    header X-Cache-Bypass: 1 skips the cached analysis for this diary
     """
     try:
         data = request.get_json()
@@ -25,22 +29,58 @@ def analyze_diary():
         # if not persona:
         #     return jsonify({"error": "Persona information is required for feedback."}), 400
 
-        result = analyzer.analyze(diary)
+        result = analyzer.analyze(diary, use_cache=not is_bypass(request.headers))
+        return jsonify(diary_response(data, diary, result)), 200
 
-        response = {
-            "entry_date": data.get("entry_date"),
-            "user_id": data.get("user_id"),
-            "diary": diary,
-            "icon": result["emoji"],
-            "analysis": {
-                "keywords": result["keywords"],
-                "emotion_score": result["emotion_score"]
-            }
-        }
-        return jsonify(response), 200
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), error_status(e)
+
+@analysis_bp.route("/diary/batch", methods=["POST"])
+def analyze_diary_batch():
+    """ POST http://localhost:5001/analysis/diary/batch
+    \{
+        "diaries": [
+            { "id": 11, "diary": "오늘은 친구들과 카페에 가서 이야기를 많이 나눴다." },
+            { "id": 12, "diary": "비가 와서 하루 종일 집에 있었다." }
+        ]
+    \}
+    -> { "results": [ { "id": 11, "icon": "☕", "analysis": {...} }, { "id": 12, "error": "..." } ] }
+    results keep the request order; one failed diary does not fail the others,
+    and an entry that is not an object gets { "id": null, "error": "..." }.
+    header X-Cache-Bypass: 1 skips the cached analyses
+    """
+    try:
+        data = request.get_json()
+        items = data.get("diaries", [])
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "diaries must be a non-empty list."}), 400
+
+        results = analyzer.analyze_batch(
+            [item.get("diary", "") if isinstance(item, dict) else None for item in items],
+            use_cache=not is_bypass(request.headers)
+        )
+
+        response = []
+        for item, result in zip(items, results):
+            if not isinstance(item, dict):
+                response.append({"id": None, "error": "Each diary must be an object with a \"diary\" field."})
+            elif "error" in result:
+                response.append({"id": item.get("id"), "error": result["error"]})
+            else:
+                response.append({
+                    "id": item.get("id"),
+                    "icon": result["emoji"],
+                    "analysis": {
+                        "keywords": result["keywords"],
+                        "emotion_score": result["emotion_score"]
+                    }
+                })
+        return jsonify({"results": response}), 200
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        record_error(e)
+        return jsonify({"error": str(e)}), error_status(e)
     
 @analysis_bp.route("/week", methods=["POST"])
 def analyze_week():
@@ -50,57 +90,86 @@ def analyze_week():
     try:
         data = request.get_json()
         diaries = data.get("diaries", "")
-        result = summary_service.summarize_week(diaries)
+        result = summary_service.summarize_week(diaries, use_cache=not is_bypass(request.headers))
+        return jsonify(week_response(result)), 200
 
-        response = {
-            "summary": {
-                "title": result["title"],
-                "overview": result["overview"],
-                "emerging_topics": result["emerging_topics"]
-            },
-            "emotion_analysis": {
-                "trend": result["trend"],
-                "dominant_emoji": result["dominant_emoji"],
-                "distribution": { "positive": 0, "neutral": 0, "negative": 0 },
-                "emotion_score": 0
-            },
-            "highlights": result["highlights"],
-            "insights": {
-                "emotion_cycle": result["emotion_cycle"],
-                "advice": result["advice"]
-            }
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), error_status(e)
+
+def diary_response(data, diary, result):
+    """ /analysis/diary response body (shared with the async server) """
+    return {
+        "entry_date": data.get("entry_date"),
+        "user_id": data.get("user_id"),
+        "diary": diary,
+        "icon": result["emoji"],
+        "analysis": {
+            "keywords": result["keywords"],
+            "emotion_score": result["emotion_score"]
         }
-        return jsonify(response), 200
+    }
 
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
+def week_response(result):
+    """ /analysis/week response body (shared with the async server) """
+    return {
+        "summary": {
+            "title": result["title"],
+            "overview": result["overview"],
+            "emerging_topics": result["emerging_topics"]
+        },
+        "emotion_analysis": {
+            "trend": result["trend"],
+            "dominant_emoji": result["dominant_emoji"],
+            "distribution": result["distribution"],
+            "emotion_score": result["emotion_score"]
+        },
+        "highlights": result["highlights"],
+        "insights": {
+            "emotion_cycle": result["emotion_cycle"],
+            "advice": result["advice"]
+        }
+    }
 
-# @analysis_bp.route("/month", methods=["POST"])
-# def analyze_month():
-#     """POST http://localhost:5001/analysis/month
-#     testcase/summarize_month_{number} 참고
-#     """
-#     try:
-#         data = request.get_json()
-#         weeks = data.get("weeks", "")
-#         result = summary_service.summarize_month(weeks)
+@analysis_bp.route("/month", methods=["POST"])
+def analyze_month():
+    """POST http://localhost:5001/analysis/month
+    \{
+        "diaries": [{"date": "2025-10-01", "diary": "...", "emoji": "😔", "emotion_score": -0.5}, ...]
+    \}
+    every diary of the month: each calendar week is summarized (and cached by its content),
+    then the month is summarized from the week summaries.
+    or, with week summaries already at hand: testcase/summarize_month_{number} 참고
+    header X-Cache-Bypass: 1 recomputes the week and month summaries
+    """
+    try:
+        data = request.get_json()
+        use_cache = not is_bypass(request.headers)
+        if data.get("diaries"):
+            result = summary_service.summarize_month(data["diaries"], use_cache=use_cache)
+            month, weeks = result["month"], result["weeks"]
+        else:
+            weeks = data.get("weeks", [])
+            month = summary_service.reduce_month(weeks, use_cache=use_cache)
+        return jsonify(month_response(month, weeks)), 200
 
-#         response = {
-#             "summary": {
-#                 "title": result["title"],
-#                 "overview": result["overview"],
-#                 "dominant_emoji": result["dominant_emoji"],
-#                 "emerging_topics": result["emerging_topics"],
-#                 "emotion_statistics": { "positive": 0, "neutral": 0, "negative": 0 },
-#                 "emotion_score": 0
-#             },
-#             "insights": {
-#                 "emotion_cycle": result["emotion_cycle"],
-#                 "advice": result["advice"]
-#             },
-#             "weeks": data.get("weeks")
-#         }
-#         return jsonify(response), 200
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), error_status(e)
 
-#     except Exception as e:
-#         return jsonify({"error": str(e)}), 400
\ No newline at end of file
+def month_response(result, weeks):
+    return {
+        "summary": {
+            "title": result["title"],
+            "overview": result["overview"],
+            "dominant_emoji": result["dominant_emoji"],
+            "emerging_topics": result["emerging_topics"],
+            "emotion_statistics": { "positive": 0, "neutral": 0, "negative": 0 },
+            "emotion_score": 0
+        },
+        "insights": {
+            "emotion_cycle": result["emotion_cycle"],
+            "advice": result["advice"]
+        },
+        "weeks": weeks
+    }
@@ -1,11 +1,23 @@
 from typing import Dict, Any
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
+from ..common.clients import get_chat_model
+from ..common import deadline
+from ..common.pipeline import Pipeline
+from ..common.response_cache import response_cache
+from .emotion_stats import week_statistics
+from .diary_render import LINE_FORMAT, WEEK_LINE_FORMAT, render_diaries, render_weeks
+from datetime import date, timedelta
 import os
+import textwrap
 
 MIN_DIARY_NUM = 3
 MIN_WEEKSUMMARY_NUM = 2
+# prompt tokens spent on the week's diaries; the least informative sentences are cut beyond this
+WEEK_DIARY_TOKEN_BUDGET = int(os.getenv("WEEK_DIARY_TOKEN_BUDGET", "1500"))
+# bump when a prompt or its result schema changes, so cached summaries are not reused
+WEEK_PROMPT_VERSION = "2"
+MONTH_PROMPT_VERSION = "1"
 
 class Highlight(BaseModel):
     """ Represents a significant day within the week. """
@@ -17,8 +29,6 @@ class SummaryWeekResult(BaseModel):
     title           : str               = Field(description= "A concise title summarizing the week's emotional or thematic essence.")
     overview        : str               = Field(description= "A paragraph of 2-3 sentences summarizing the emotional and behavioral trend of the week, capturing how the user's mood evolved.")
     emerging_topics : list[str]         = Field(description= "A list of 2–5 recurring or emerging themes or keywords observed throughout the week.")
-    trend           : str               = Field(description= "Sentiment score trend (increasing, stable, decreasing)")
-    dominant_emoji  : str               = Field(description= "An emoji that best represents the overall emotional tone of the week (e.g., 😌, 😊, 😔).")
     highlights      : list[Highlight]   = Field(description= "A list (1–3 items) of significant daily highlights that capture key emotional or thematic moments of the week.")
     emotion_cycle   : str               = Field(description= "A short description summarizing the emotional flow across the week (e.g., 'Early stress → Mid adaptation → Late recovery'). Maximum 3 stages.")
     advice          : str               = Field(description= "Personalized advice or reflection derived from the emotional trends of the week, focusing on well-being or growth.")
@@ -36,62 +46,155 @@ class SummaryService:
     """ Service that summarize diaries weekly/monthly """
     def __init__(self):
         """ Initialize the summary service. """
-        self.model = ChatOpenAI(
-            model=os.getenv("GPT_MODEL", "gpt-4.1-nano"),
-            temperature=0.5
+        # retries are left to deadline.call, which knows how much time the request has left
+        self.model = get_chat_model(os.getenv("GPT_MODEL", "gpt-4.1-nano"), 0.5, max_retries=0)
+
+    def summarize_week(self, diaries: list[Dict], use_cache: bool = True) -> Dict[str, Any]:
+        """ Summarize diaries of the week; cached by the content of the rendered week.
+        The emotion statistics (distribution, emotion_score, trend, dominant_emoji) are counted locally.
+        """
+        _require_diaries(diaries)
+        return {**self._summarize_week(diaries, use_cache), **week_statistics(diaries)}
+
+    def _summarize_week(self, diaries: list[Dict], use_cache: bool) -> Dict[str, Any]:
+        chain = self._week_chain(diaries)
+        diary_text = render_diaries(diaries, WEEK_DIARY_TOKEN_BUDGET)
+        return response_cache.get_or_compute(
+            self._cache_key("summary_week", WEEK_PROMPT_VERSION, diary_text),
+            lambda: deadline.call("summarize_week", lambda timeout: _invoke(
+                chain, {"diaries": diary_text}, "summarize_week", timeout
+            )).model_dump(),
+            use_cache=use_cache,
         )
 
-    def summarize_week(self, diaries: list[Dict]) -> Dict[str, Any]:
-        """ Summarize diaries of the week """
-        if len(diaries) < MIN_DIARY_NUM:
-            raise ValueError("At least 3 diaries are required for weekly summary.")
-        else: 
-            promt_text = """
-            당신은 감정 일기 분석에 특화된 AI 요약 도우미입니다.
-
-            사용자가 일주일 동안 작성한 다음 일기를 분석합니다.
-            감정적 및 주제별 트렌드를 요약하고, 새롭게 떠오르는 주제를 식별합니다.
-            1~3개의 주요 하이라이트를 추출합니다(의미 있는 날).
-
-            'SummaryWeekResult' 스키마와 정확히 일치하는 JSON 객체만 반환합니다.
-            추가 텍스트나 설명은 포함하지 마세요. 사용자의 입력과 동일한 언어로 응답하세요. 
-            한국어의 경우 '-다'체로 응답하세요. advice는 친한 사람이 조언이나 응원해주듯이 말하고, 확신에 차서 대답하기보다는 조금 부드럽게 대답하세요.
-            
-            ---
-            일기:
-            {diaries}
-            """
-
-            prompt = PromptTemplate.from_template(promt_text)
-            llm = self.model.with_structured_output(SummaryWeekResult)
-
-            chain = prompt | llm
-            result = chain.invoke({"diaries": diaries})
-            return result.model_dump()
+    async def asummarize_week(self, diaries: list[Dict], use_cache: bool = True) -> Dict[str, Any]:
+        _require_diaries(diaries)
+        chain = self._week_chain(diaries)
+        diary_text = render_diaries(diaries, WEEK_DIARY_TOKEN_BUDGET)
+        key = self._cache_key("summary_week", WEEK_PROMPT_VERSION, diary_text)
+        result = response_cache.get(key) if use_cache else None
+        if result is None:
+            result = (await deadline.acall("summarize_week", lambda timeout: _ainvoke(
+                chain, {"diaries": diary_text}, "summarize_week", timeout
+            ))).model_dump()
+            response_cache.set(key, result)
+        return {**result, **week_statistics(diaries)}
+
+    def _cache_key(self, namespace: str, prompt_version: str, text: str) -> str:
+        return response_cache.make_key(namespace, self.model.model_name, prompt_version, text)
+
+    def _week_chain(self, diaries: list[Dict]) -> tuple:
+        """ (prompt, structured model) of the weekly summary; see _invoke """
+        promt_text = """
+        당신은 감정 일기 분석에 특화된 AI 요약 도우미입니다.
+
+        사용자가 일주일 동안 작성한 다음 일기를 분석합니다.
+        감정적 및 주제별 트렌드를 요약하고, 새롭게 떠오르는 주제를 식별합니다.
+        1~3개의 주요 하이라이트를 추출합니다(의미 있는 날).
+
+        'SummaryWeekResult' 스키마와 정확히 일치하는 JSON 객체만 반환합니다.
+        추가 텍스트나 설명은 포함하지 마세요. 사용자의 입력과 동일한 언어로 응답하세요. 
+        한국어의 경우 '-다'체로 응답하세요. advice는 친한 사람이 조언이나 응원해주듯이 말하고, 확신에 차서 대답하기보다는 조금 부드럽게 대답하세요.
         
-    # def summarize_month(self, weeks: list[Dict]) -> Dict[str, Any]:
-    #     """ Summarize diaries of the month """
-    #     if len(weeks) < MIN_WEEKSUMMARY_NUM:
-    #         raise ValueError("At least 2 week-summary are required for monthly summary.")
-    #     else: 
-    #         promt_text = """
-    #         You are an AI summarization assistant specialized in emotional pattern tracking.
-
-    #         Based on the provided week summaries, generate a single monthly overview that
-    #         captures the emotional and behavioral trends of the entire month.
-    #         Extract emerging topics, summarize emotional cycles, and offer reflective advice.
-
-    #         Return ONLY a JSON object strictly matching the `SummaryMonthResult` schema.
-    #         Do not include extra text or explanations. Respond **in the same language** as the user's input.
-            
-    #         ---
-    #         Week summaries:
-    #         {weeks}
-    #         """
-
-    #         prompt = PromptTemplate.from_template(promt_text)
-    #         llm = self.model.with_structured_output(SummaryMonthResult)
-
-    #         chain = prompt | llm
-    #         result = chain.invoke({"weeks": weeks})
-    #         return result.model_dump()
+        ---
+        일기 (한 줄에 하루, {line_format}):
+        {diaries}
+        """
+
+        # dedented: the method's indentation would otherwise be sent on every line
+        prompt = PromptTemplate.from_template(textwrap.dedent(promt_text)).partial(line_format=LINE_FORMAT)
+        llm = self.model.with_structured_output(SummaryWeekResult)
+
+        return prompt, llm
+
+    def summarize_month(self, diaries: list[Dict], use_cache: bool = True) -> Dict[str, Any]:
+        """ Map-reduce: summarize each calendar week (cached), then the month from the week summaries.
+        After one diary edit only that week and the month step call the model again.
+        Returns {"month": SummaryMonthResult, "weeks": [week summaries]}.
+        """
+        # checked before the week summaries are paid for; reduce_month would refuse them anyway
+        if len(group_by_week(diaries)) < MIN_WEEKSUMMARY_NUM:
+            raise ValueError("Diaries must span at least 2 weeks for monthly summary.")
+        weeks = self.summarize_weeks(diaries, use_cache=use_cache)
+        return {"month": self.reduce_month(weeks, use_cache=use_cache), "weeks": weeks}
+
+    def summarize_weeks(self, diaries: list[Dict], use_cache: bool = True) -> list[Dict]:
+        """ Week summaries (Monday to Sunday) of a month of diaries, computed concurrently """
+        pipeline = Pipeline()
+        groups = group_by_week(diaries)
+        for start, week_diaries in groups.items():
+            # a month starts and ends with partial weeks, so no minimum here
+            pipeline.add(start.isoformat(), lambda d=week_diaries: self._week_for_month(d, use_cache))
+        results, _ = pipeline.run()
+        return [results[start.isoformat()] for start in groups]
+
+    def _week_for_month(self, diaries: list[Dict], use_cache: bool) -> Dict[str, Any]:
+        result = self._summarize_week(diaries, use_cache)
+        stats = week_statistics(diaries)
+        return {
+            "week_range": f"{diaries[0]['date']}~{diaries[-1]['date']}",
+            "title": result["title"],
+            "overview": result["overview"],
+            "average_emotion": stats["emotion_score"],
+            "dominant_emoji": stats["dominant_emoji"],
+            "keywords": result["emerging_topics"],
+        }
+
+    def reduce_month(self, weeks: list[Dict], use_cache: bool = True) -> Dict[str, Any]:
+        """ Monthly summary from week summaries ({"week_range", "title", "overview", ...}) """
+        if len(weeks) < MIN_WEEKSUMMARY_NUM:
+            raise ValueError("At least 2 week-summary are required for monthly summary.")
+        promt_text = """
+        You are an AI summarization assistant specialized in emotional pattern tracking.
+
+        Based on the provided week summaries, generate a single monthly overview that
+        captures the emotional and behavioral trends of the entire month.
+        Extract emerging topics, summarize emotional cycles, and offer reflective advice.
+
+        Return ONLY a JSON object strictly matching the `SummaryMonthResult` schema.
+        Do not include extra text or explanations. Respond **in the same language** as the user's input.
+
+        ---
+        Week summaries (one line per week, {line_format}):
+        {weeks}
+        """
+        prompt = PromptTemplate.from_template(textwrap.dedent(promt_text)).partial(line_format=WEEK_LINE_FORMAT)
+        chain = (prompt, self.model.with_structured_output(SummaryMonthResult))
+        week_text = render_weeks(weeks)
+
+        return response_cache.get_or_compute(
+            self._cache_key("summary_month", MONTH_PROMPT_VERSION, week_text),
+            lambda: deadline.call("summarize_month", lambda timeout: _invoke(
+                chain, {"weeks": week_text}, "summarize_month", timeout
+            )).model_dump(),
+            use_cache=use_cache,
+        )
+
+
+def _invoke(chain: tuple, inputs: Dict, operation: str, timeout: float):
+    """ One attempt of a (prompt, structured model) chain.
+    The prompt is rendered first because a sequence only passes call kwargs to its first step;
+    this way the attempt's timeout reaches the model's HTTP request.
+    """
+    prompt, llm = chain
+    return llm.invoke(prompt.invoke(inputs), config={"metadata": {"operation": operation}}, timeout=timeout)
+
+async def _ainvoke(chain: tuple, inputs: Dict, operation: str, timeout: float):
+    prompt, llm = chain
+    return await llm.ainvoke(prompt.invoke(inputs), config={"metadata": {"operation": operation}}, timeout=timeout)
+
+
+def _require_diaries(diaries: list[Dict]):
+    if len(diaries) < MIN_DIARY_NUM:
+        raise ValueError("At least 3 diaries are required for weekly summary.")
+
+def group_by_week(diaries: list[Dict]) -> Dict[date, list]:
+    """ {monday: diaries of that week in date order}, weeks in date order """
+    weeks = {}
+    for diary in sorted(diaries, key=lambda d: str(d.get("date") or "")):
+        try:
+            day = date.fromisoformat(str(diary.get("date"))[:10])
+        except ValueError:
+            raise ValueError("Every diary needs a date (YYYY-MM-DD) for monthly summary.")
+        weeks.setdefault(day - timedelta(days=day.weekday()), []).append(diary)
+    return weeks
@@ -0,0 +1,289 @@
+""" Admission control: per-upstream concurrency limits with a bounded, per-user fair queue.
+
+Each route declares the upstreams it calls (upstreams_for). A request takes a slot on each
+of them before its handler runs and gives it back when the response body is finished.
+With every slot busy it waits in that upstream's queue, which is served round-robin across
+users so one user's burst cannot starve everyone else. Instead of piling up until the Node
+server's axios call times out, a request is refused right away with 429 + Retry-After when
+the queue is full (or the user already has ADMISSION_MAX_QUEUED_PER_USER waiting), and with
+503 when it waited ADMISSION_QUEUE_TIMEOUT seconds without a slot.
+
+Users are told apart by the X-User-Id header (set by the Node controllers for a logged-in user).
+An anonymous request counts as a user of its own: every request comes from the Node server's
+address, so keying them by address would put all anonymous users in one bucket and refuse them
+with user_queue_full while the queue is nearly empty. ADMISSION_CONTROL=0 turns all of this off.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from . import metrics
+
+ENABLED = os.getenv("ADMISSION_CONTROL", "1") != "0"
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+MAX_QUEUED_PER_USER = int(os.getenv("ADMISSION_MAX_QUEUED_PER_USER", "4"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+# slots per upstream; acquired in this order so multi-upstream routes cannot deadlock
+LIMITS = {
+    "embedding": int(os.getenv("ADMISSION_LIMIT_EMBEDDING", "2")),
+    "vision": int(os.getenv("ADMISSION_LIMIT_VISION", "16")),
+    "whisper": int(os.getenv("ADMISSION_LIMIT_WHISPER", "8")),
+    "image_model": int(os.getenv("ADMISSION_LIMIT_IMAGE_MODEL", "8")),
+    "chat": int(os.getenv("ADMISSION_LIMIT_CHAT", "32")),
+}
+
+ROUTE_UPSTREAMS = {
+    "/analysis/diary": ("chat",),
+    "/analysis/diary/batch": ("chat",),
+    "/analysis/week": ("chat",),
+    "/analysis/month": ("chat",),
+    "/merge/": ("chat",),
+    "/merge/stream": ("chat",),
+    "/merge/paragraph": ("chat",),
+    "/merge/mood": ("chat",),
+    "/extract/style": ("embedding", "chat"),
+    "/image/diary": ("vision", "chat"),
+    "/stt/memo": ("whisper",),
+    "/stt/memo/stream": ("whisper",),
+}
+
+
+class AdmissionRejected(Exception):
+    """ No slot for this request: status 429 (queue full) or 503 (waited too long) """
+    def __init__(self, upstream: str, status: int, retry_after: int, reason: str):
+        super().__init__(f"{upstream} is busy, retry in {retry_after}s")
+        self.upstream = upstream
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Waiter:
+    """ One queued request; woken from whichever thread frees a slot """
+    def __init__(self, loop=None):
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class UpstreamLimiter:
+    """ Counting semaphore whose waiters are served round-robin by user """
+    def __init__(self, name: str, limit: int, queue_size: int = QUEUE_SIZE,
+                 max_queued_per_user: int = MAX_QUEUED_PER_USER, timeout: float = QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_queued_per_user = max_queued_per_user
+        self.timeout = timeout
+        self.in_use = 0
+        self.queued = 0
+        # slot hold time (EWMA), used to tell rejected clients when to come back
+        self.avg_hold = 1.0
+        self._queues = OrderedDict()  # user -> deque of _Waiter
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.avg_hold * (self.queued + 1) / self.limit))
+
+    def _reject(self, status: int, reason: str):
+        metrics.admission_rejected.inc(upstream=self.name, reason=reason)
+        return AdmissionRejected(self.name, status, self.retry_after(), reason)
+
+    def _enter(self, user, loop=None):
+        """ Take a free slot (None) or join the queue (the _Waiter to wait on) """
+        with self._lock:
+            if self.in_use < self.limit and not self.queued:
+                self.in_use += 1
+                self._export()
+                return None
+            if self.queued >= self.queue_size:
+                raise self._reject(429, "queue_full")
+            queue = self._queues.get(user)
+            if queue is not None and len(queue) >= self.max_queued_per_user:
+                raise self._reject(429, "user_queue_full")
+            waiter = _Waiter(loop)
+            self._queues.setdefault(user, deque()).append(waiter)
+            self.queued += 1
+            self._export()
+            return waiter
+
+    def _leave(self, user, waiter) -> bool:
+        """ Stop waiting; True if the slot was handed over meanwhile (the caller now owns it) """
+        with self._lock:
+            if waiter.granted:
+                return True
+            queue = self._queues.get(user)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del self._queues[user]
+                self.queued -= 1
+                self._export()
+            return False
+
+    def acquire(self, user):
+        start = time.perf_counter()
+        waiter = self._enter(user)
+        if waiter is not None:
+            waiter.event.wait(self.timeout)
+            if not self._leave(user, waiter):
+                raise self._reject(503, "timeout")
+        metrics.admission_wait.observe(time.perf_counter() - start, upstream=self.name)
+
+    async def acquire_async(self, user):
+        start = time.perf_counter()
+        waiter = self._enter(user, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                # client went away while queued; a slot handed over meanwhile goes to the next waiter
+                if self._leave(user, waiter):
+                    self.release(0.0)
+                raise
+            if not self._leave(user, waiter):
+                raise self._reject(503, "timeout")
+        metrics.admission_wait.observe(time.perf_counter() - start, upstream=self.name)
+
+    def release(self, held_seconds: float):
+        with self._lock:
+            if held_seconds:
+                self.avg_hold = 0.8 * self.avg_hold + 0.2 * held_seconds
+            waiter = self._next_waiter()
+            if waiter is None:
+                self.in_use -= 1
+            else:
+                # hand the slot straight over, in_use stays the same
+                waiter.wake()
+            self._export()
+
+    def _next_waiter(self):
+        if not self._queues:
+            return None
+        user, queue = self._queues.popitem(last=False)
+        waiter = queue.popleft()
+        if queue:
+            # this user goes to the back of the line
+            self._queues[user] = queue
+        self.queued -= 1
+        return waiter
+
+    def _export(self):
+        metrics.admission_queue_depth.set(self.queued, upstream=self.name)
+        metrics.admission_in_use.set(self.in_use, upstream=self.name)
+
+
+limiters = {name: UpstreamLimiter(name, limit) for name, limit in LIMITS.items()}
+
+
+class Ticket:
+    """ Slots held by one request; release() is safe to call more than once """
+    def __init__(self):
+        self.held = []
+        self.start = time.perf_counter()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        held_seconds = time.perf_counter() - self.start
+        for limiter in reversed(self.held):
+            limiter.release(held_seconds)
+
+
+def upstreams_for(route: str, analysis_type: str = None) -> tuple:
+    if route == "/image/memo":
+        return ("image_model",) if analysis_type == "describe" else ("vision", "chat")
+    return ROUTE_UPSTREAMS.get(route, ())
+
+def _ordered(upstreams):
+    return [limiters[name] for name in LIMITS if name in upstreams]
+
+def acquire(upstreams, user) -> Ticket:
+    ticket = Ticket()
+    try:
+        for limiter in _ordered(upstreams):
+            limiter.acquire(user)
+            ticket.held.append(limiter)
+    except BaseException:
+        ticket.release()
+        raise
+    ticket.start = time.perf_counter()
+    return ticket
+
+async def acquire_async(upstreams, user) -> Ticket:
+    ticket = Ticket()
+    try:
+        for limiter in _ordered(upstreams):
+            await limiter.acquire_async(user)
+            ticket.held.append(limiter)
+    except BaseException:
+        ticket.release()
+        raise
+    ticket.start = time.perf_counter()
+    return ticket
+
+
+def init_app(app):
+    """ Admit before the view runs, release when the response body is done """
+    from flask import g, request, jsonify
+
+    @app.before_request
+    def _admit():
+        if not ENABLED or request.url_rule is None:
+            return None
+        route = request.url_rule.rule
+        analysis_type = request.form.get("type", "").lower() if route == "/image/memo" else None
+        upstreams = upstreams_for(route, analysis_type)
+        if not upstreams:
+            return None
+        try:
+            g.admission_ticket = acquire(upstreams, _user_key(request))
+        except AdmissionRejected as e:
+            response = jsonify({"error": str(e)})
+            response.status_code = e.status
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
+
+    @app.after_request
+    def _release_with_body(response):
+        ticket = g.get("admission_ticket")
+        # a streamed body is still being generated; hold the slots until the server closes it
+        if ticket is not None and response.is_streamed:
+            response.call_on_close(ticket.release)
+            g.admission_deferred = True
+        return response
+
+    @app.teardown_request
+    def _release(exc):
+        ticket = g.get("admission_ticket")
+        if ticket is not None and not g.get("admission_deferred"):
+            ticket.release()
+
+def user_key(user_id):
+    """ Fairness key for a request's X-User-Id; without one, a key of its own (see the module docstring) """
+    return user_id if user_id else object()
+
+def _user_key(request):
+    return user_key(request.headers.get("X-User-Id"))
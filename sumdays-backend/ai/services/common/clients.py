@@ -0,0 +1,290 @@
+""" Shared upstream clients, one set per worker process.
+
+Every service gets its OpenAI / ChatOpenAI / Vision client from here, so TLS handshakes
+and connection pools are paid once per worker instead of once per module or per call.
+All clients returned here are thread-safe and meant to be shared.
+
+OPENAI_BASE_URL / VISION_API_ENDPOINT point every service at another upstream
+(e.g. benchmarks/fake_upstream.py for load tests without spending tokens).
+"""
+import os
+import asyncio
+import contextvars
+import logging
+import socket
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+import httpcore
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from langchain_core.callbacks import BaseCallbackHandler
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# e.g. http://127.0.0.1:8089 -> Vision over REST (plain http allowed), anonymous credentials
+VISION_API_ENDPOINT = os.getenv("VISION_API_ENDPOINT") or None
+
+# re-entrant: building one client may build the shared http client inside the lock
+_lock = threading.RLock()
+_clients = {}
+_request_stats = {"requests": 0}
+# async pools belong to one event loop, so the async server gets one client per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+def _shared(key, factory):
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+def _on_request(request):
+    with _lock:
+        _request_stats["requests"] += 1
+
+async def _on_async_request(request):
+    _on_request(request)
+
+class HTTPAttempt:
+    """ Handle on the HTTP requests made by one attempt (see abortable), to abort them from another thread """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = set()
+        self.aborted = False
+
+    def abort(self):
+        """ Shut down the connection the attempt is blocked on; its request fails with a connection error """
+        with self._lock:
+            self.aborted = True
+            streams = list(self._streams)
+        for stream in streams:
+            stream.shutdown()
+
+    def _enter(self, stream):
+        with self._lock:
+            self._streams.add(stream)
+            aborted = self.aborted
+        if aborted:
+            stream.shutdown()
+
+    def _exit(self, stream):
+        with self._lock:
+            self._streams.discard(stream)
+
+_attempt = contextvars.ContextVar("http_attempt", default=None)
+
+@contextmanager
+def abortable(attempt: HTTPAttempt):
+    """ with abortable(attempt): requests on the shared HTTP client in this context can be aborted by attempt.abort() """
+    token = _attempt.set(attempt)
+    try:
+        yield attempt
+    finally:
+        _attempt.reset(token)
+
+
+class _AbortableStream(httpcore.NetworkStream):
+    """ Registers itself with the current HTTPAttempt while a read or write blocks on it """
+    def __init__(self, stream):
+        self._stream = stream
+
+    def _io(self, fn, *args):
+        attempt = _attempt.get()
+        if attempt is None:
+            return fn(*args)
+        attempt._enter(self)
+        try:
+            return fn(*args)
+        finally:
+            attempt._exit(self)
+
+    def read(self, max_bytes, timeout=None):
+        return self._io(self._stream.read, max_bytes, timeout)
+
+    def write(self, buffer, timeout=None):
+        return self._io(self._stream.write, buffer, timeout)
+
+    def close(self):
+        self._stream.close()
+
+    def start_tls(self, ssl_context, server_hostname=None, timeout=None):
+        return _AbortableStream(self._stream.start_tls(ssl_context, server_hostname, timeout))
+
+    def get_extra_info(self, info):
+        return self._stream.get_extra_info(info)
+
+    def shutdown(self):
+        # a shutdown (unlike close) wakes a recv blocked in another thread; the plain socket
+        # method also works under TLS without touching the SSL object the reader is using
+        sock = self._stream.get_extra_info("socket")
+        try:
+            socket.socket.shutdown(sock, socket.SHUT_RDWR)
+        except (OSError, TypeError):
+            pass
+
+class _AbortableBackend(httpcore.NetworkBackend):
+    def __init__(self, backend):
+        self._backend = backend
+
+    def connect_tcp(self, *args, **kwargs):
+        return _AbortableStream(self._backend.connect_tcp(*args, **kwargs))
+
+    def connect_unix_socket(self, *args, **kwargs):
+        return _AbortableStream(self._backend.connect_unix_socket(*args, **kwargs))
+
+    def sleep(self, seconds):
+        self._backend.sleep(seconds)
+
+def _abortable_transport(limits: httpx.Limits) -> httpx.HTTPTransport:
+    transport = httpx.HTTPTransport(limits=limits)
+    # httpx has no public hook for httpcore's network backend; the private attributes are those of
+    # the httpx/httpcore versions pinned in requirements.txt
+    pool = getattr(transport, "_pool", None)
+    if not isinstance(getattr(pool, "_network_backend", None), httpcore.NetworkBackend):
+        logger.warning("httpx %s / httpcore %s: no network backend to wrap; losing hedges will run to their timeout",
+                       httpx.__version__, httpcore.__version__)
+        return transport
+    pool._network_backend = _AbortableBackend(pool._network_backend)
+    return transport
+
+
+def get_http_client() -> httpx.Client:
+    """ Keep-alive connection pool used underneath every OpenAI client; its requests are abortable """
+    return _shared("http", lambda: httpx.Client(
+        transport=_abortable_transport(httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        event_hooks={"request": [_on_request]},
+    ))
+
+def get_openai_client() -> OpenAI:
+    return _shared("openai", lambda: OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=OPENAI_BASE_URL,
+        http_client=get_http_client(),
+        max_retries=OPENAI_MAX_RETRIES,
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    ))
+
+class ChatMetricsCallback(BaseCallbackHandler):
+    """ Upstream latency, errors and token usage of every LangChain chat call.
+    The operation label comes from the call's config metadata: chain.invoke(x, config={"metadata": {"operation": ...}})
+    """
+    # cheap bookkeeping: run in the caller, also for ainvoke (no executor hop)
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._runs[run_id] = (time.perf_counter(), (metadata or {}).get("operation", "langchain"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start, operation = self._runs.pop(run_id, (None, None))
+        if start is not None:
+            metrics.upstream_duration.observe(time.perf_counter() - start, upstream="openai_chat", operation=operation)
+        metrics.observe_tokens(self.model, (response.llm_output or {}).get("token_usage"))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        start, operation = self._runs.pop(run_id, (None, "langchain"))
+        if start is not None:
+            metrics.upstream_duration.observe(time.perf_counter() - start, upstream="openai_chat", operation=operation)
+        metrics.upstream_errors.inc(upstream="openai_chat", operation=operation, error=type(error).__name__)
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """ AsyncOpenAI on a keep-alive pool, for the running event loop (asgi.py) """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=OPENAI_BASE_URL,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                    event_hooks={"request": [_on_async_request]},
+                ),
+                max_retries=OPENAI_MAX_RETRIES,
+                timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            )
+        return client
+
+def get_chat_model(model: str, temperature: float, max_retries: int = OPENAI_MAX_RETRIES):
+    """ Shared LangChain ChatOpenAI for (model, temperature, max_retries), on the shared connection pool """
+    from langchain_openai import ChatOpenAI
+    return _shared(("chat", model, temperature, max_retries), lambda: ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        base_url=OPENAI_BASE_URL,
+        http_client=get_http_client(),
+        max_retries=max_retries,
+        timeout=HTTP_TIMEOUT,
+        callbacks=[ChatMetricsCallback(model)],
+    ))
+
+def get_vision_client():
+    """ Shared Google Vision client (its gRPC channel multiplexes concurrent calls) """
+    from google.cloud import vision
+    if VISION_API_ENDPOINT:
+        return _shared("vision", lambda: _vision_rest_client(VISION_API_ENDPOINT))
+    return _shared("vision", vision.ImageAnnotatorClient)
+
+def _vision_rest_client(endpoint: str):
+    from urllib.parse import urlparse
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import vision
+    from google.cloud.vision_v1.services.image_annotator.transports.rest import ImageAnnotatorRestTransport
+    url = urlparse(endpoint if "://" in endpoint else f"https://{endpoint}")
+    transport = ImageAnnotatorRestTransport(host=url.netloc, url_scheme=url.scheme, credentials=AnonymousCredentials())
+    return vision.ImageAnnotatorClient(transport=transport)
+
+def pool_stats() -> dict:
+    """ Connection-pool utilization of the shared HTTP client """
+    stats = {
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive_connections": HTTP_MAX_KEEPALIVE,
+        "connections": 0,
+        "active_connections": 0,
+        "idle_connections": 0,
+        "utilization": 0.0,
+    }
+    with _lock:
+        stats.update(_request_stats)
+        http_client = _clients.get("http")
+    if http_client is None:
+        return stats
+
+    # httpcore does not expose pool state publicly; read it defensively (pinned in requirements.txt)
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    if not isinstance(pool, httpcore.ConnectionPool):
+        return stats
+    connections = list(pool.connections)
+    idle = sum(1 for c in connections if c.is_idle())
+    stats.update({
+        "connections": len(connections),
+        "active_connections": len(connections) - idle,
+        "idle_connections": idle,
+        "utilization": (len(connections) - idle) / HTTP_MAX_CONNECTIONS,
+    })
+    return stats
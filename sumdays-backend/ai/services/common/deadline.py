@@ -0,0 +1,302 @@
+""" Deadline-aware upstream calls: hedged duplicates for slow calls, jittered retries.
+
+The Node controllers send the request's remaining budget in X-Request-Deadline-Ms.
+It is kept in a context variable for the whole request; Pipeline threads copy it, and so
+do async tasks. Wrapped calls then:
+- get at most the remaining budget as their HTTP timeout (OpenAI's own retries are off);
+- are hedged: if an attempt is still running HEDGE_PERCENTILE latency of its operation after
+  it started, an identical request is sent and whichever answers first wins. The loser's HTTP
+  request is aborted (async: the task is cancelled; sync: clients.HTTPAttempt shuts its
+  connection down). Hedges come out of a token bucket refilled by HEDGE_BUDGET_RATIO per call,
+  so a slow upstream gets at most a few percent more requests, not twice as many;
+- are retried on timeouts, connection errors, 429 and 5xx with full-jitter backoff,
+  but only while the backoff still fits in the deadline.
+
+Without the header there is no deadline and attempts use HTTP_TIMEOUT. Sync calls that
+cannot be hedged run in the caller's thread; only hedged ones use the hedge pool.
+
+    response = deadline.call("analyze", lambda timeout: client.chat.completions.create(..., timeout=timeout))
+"""
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import openai
+
+from . import metrics
+from .clients import HTTP_TIMEOUT, HTTPAttempt, abortable
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+# time kept back for sending the response after the last upstream call
+DEADLINE_MARGIN = float(os.getenv("DEADLINE_MARGIN", "0.1"))
+
+HEDGE_ENABLED = os.getenv("HEDGE_REQUESTS", "1") != "0"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+# until an operation has this many samples its hedge delay is HEDGE_DEFAULT_DELAY
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "3.0"))
+HEDGE_MAX_WORKERS = int(os.getenv("HEDGE_MAX_WORKERS", "32"))
+# hedges per call in the long run, and how many can be sent in a burst
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.05"))
+HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", "5"))
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "4.0"))
+
+RETRYABLE = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="hedge")
+
+
+class DeadlineExceeded(TimeoutError):
+    """ The request's deadline passed before the upstream answered """
+
+
+def error_status(error: Exception, default: int = 400) -> int:
+    """ HTTP status for a failed route: 504 when the deadline ran out, otherwise the route's own """
+    return 504 if isinstance(error, DeadlineExceeded) else default
+
+
+def set_budget(milliseconds):
+    """ Start this request's deadline from a remaining budget in ms (None/invalid: no deadline) """
+    try:
+        budget = float(milliseconds) / 1000 if milliseconds not in (None, "") else None
+    except ValueError:
+        budget = None
+    _deadline.set(None if budget is None else time.monotonic() + budget - DEADLINE_MARGIN)
+
+def remaining():
+    """ Seconds left before the deadline, None without one """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def _attempt_timeout(operation) -> float:
+    left = remaining()
+    if left is None:
+        return HTTP_TIMEOUT
+    if left <= 0:
+        metrics.deadline_exceeded.inc(operation=operation)
+        raise DeadlineExceeded(f"{operation}: request deadline exceeded")
+    return min(left, HTTP_TIMEOUT)
+
+
+class LatencyTracker:
+    """ Recent successful latencies per operation -> hedge delay at a percentile """
+    def __init__(self, window: int = 256):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(operation, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, operation: str, percentile: float = HEDGE_PERCENTILE) -> float:
+        with self._lock:
+            samples = sorted(self._samples.get(operation, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return samples[min(len(samples) - 1, int(len(samples) * percentile))]
+
+latency = LatencyTracker()
+
+
+class HedgeBudget:
+    """ Token bucket: every call adds ratio tokens (up to burst), every hedge takes one """
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, burst: float = HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+hedge_budget = HedgeBudget()
+
+def _may_hedge(operation) -> bool:
+    """ Take a hedge from the budget; counted as skipped if it is spent """
+    if hedge_budget.withdraw():
+        metrics.upstream_hedges.inc(operation=operation)
+        return True
+    metrics.upstream_hedges_skipped.inc(operation=operation)
+    return False
+
+
+def _backoff(attempt: int, operation: str, error: Exception):
+    """ Jittered delay before the next attempt, or None if no attempt is left within the deadline """
+    if attempt >= RETRY_MAX_ATTEMPTS:
+        return None
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    left = remaining()
+    if left is not None and left <= delay:
+        return None
+    metrics.upstream_retries.inc(operation=operation, error=type(error).__name__)
+    return delay
+
+
+def call(operation: str, fn, hedge: bool = True):
+    """ fn(timeout) with hedging and retries under the current request deadline """
+    attempt = 1
+    while True:
+        try:
+            return _hedged(operation, fn, hedge and HEDGE_ENABLED)
+        except RETRYABLE as e:
+            delay = _backoff(attempt, operation, e)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+
+def _timed(operation, fn, timeout):
+    start = time.monotonic()
+    result = fn(timeout)
+    latency.record(operation, time.monotonic() - start)
+    return result
+
+def _hedged(operation, fn, hedge):
+    timeout = _attempt_timeout(operation)
+    delay = latency.hedge_delay(operation)
+    hedge_budget.deposit()
+    if not (hedge and delay < timeout):
+        # no thread hop: the attempt's timeout already ends it by the deadline
+        try:
+            return _timed(operation, fn, timeout)
+        except openai.APITimeoutError as e:
+            left = remaining()
+            if left is not None and left <= 0:
+                metrics.deadline_exceeded.inc(operation=operation)
+                raise DeadlineExceeded(f"{operation}: request deadline exceeded") from e
+            raise
+
+    # in a worker thread, so the caller can stop waiting at the deadline even if fn ignores its timeout
+    started = threading.Event()
+    attempts = {}
+
+    def run(attempt, timeout):
+        started.set()
+        with abortable(attempt):
+            return _timed(operation, fn, timeout)
+
+    def submit(timeout):
+        attempt = HTTPAttempt()
+        future = _executor.submit(contextvars.copy_context().run, run, attempt, timeout)
+        attempts[future] = attempt
+        return future
+
+    primary = submit(timeout)
+    pending, backup = {primary}, None
+    try:
+        # the hedge delay counts from when the primary starts, not from its wait in the pool's queue
+        if not started.wait(remaining()):
+            metrics.deadline_exceeded.inc(operation=operation)
+            raise DeadlineExceeded(f"{operation}: request deadline exceeded")
+        done, _ = wait(pending, timeout=delay)
+        if done:
+            return primary.result()
+        left = remaining()
+        if (left is None or left > 0) and _may_hedge(operation):
+            backup = submit(_attempt_timeout(operation))
+            pending.add(backup)
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                metrics.deadline_exceeded.inc(operation=operation)
+                raise DeadlineExceeded(f"{operation}: request deadline exceeded")
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        metrics.upstream_hedge_wins.inc(operation=operation)
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        # the loser (or everything, if out of time) gives its thread and connection back now
+        for future in pending:
+            future.cancel()
+            attempts[future].abort()
+
+
+async def acall(operation: str, fn, hedge: bool = True):
+    """ call() for coroutine functions: await fn(timeout) """
+    attempt = 1
+    while True:
+        try:
+            return await _ahedged(operation, fn, hedge and HEDGE_ENABLED)
+        except RETRYABLE as e:
+            delay = _backoff(attempt, operation, e)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+async def _atimed(operation, fn, timeout):
+    start = time.monotonic()
+    result = await fn(timeout)
+    latency.record(operation, time.monotonic() - start)
+    return result
+
+async def _ahedged(operation, fn, hedge):
+    timeout = _attempt_timeout(operation)
+    delay = latency.hedge_delay(operation)
+    hedge_budget.deposit()
+    hedge = hedge and delay < timeout
+    if not hedge and remaining() is None:
+        return await _atimed(operation, fn, timeout)
+
+    primary = asyncio.ensure_future(_atimed(operation, fn, timeout))
+    pending, backup = {primary}, None
+    try:
+        if hedge:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            left = remaining()
+            if (left is None or left > 0) and _may_hedge(operation):
+                backup = asyncio.ensure_future(_atimed(operation, fn, _attempt_timeout(operation)))
+                pending.add(backup)
+
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=remaining(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                metrics.deadline_exceeded.inc(operation=operation)
+                raise DeadlineExceeded(f"{operation}: request deadline exceeded")
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        metrics.upstream_hedge_wins.inc(operation=operation)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # the loser (or everything, if we were cancelled or out of time) stops here
+        for task in pending:
+            task.cancel()
+
+
+def init_app(app):
+    """ Read the deadline header at the start of every request """
+    from flask import request
+
+    @app.before_request
+    def _start_deadline():
+        # set on every request, so a thread reused by the server never sees a stale deadline
+        set_budget(request.headers.get(DEADLINE_HEADER))
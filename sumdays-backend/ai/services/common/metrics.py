@@ -0,0 +1,239 @@
+""" Minimal Prometheus-style metrics (text exposition format 0.0.4), no extra dependency.
+
+Counters, gauges and histograms live in this process; under gunicorn every worker
+keeps its own numbers, so scrape workers individually or sum them in the dashboard.
+
+Served at GET /metrics (see app.py). What is measured:
+- per route:     http_requests_total, http_request_duration_seconds, http_requests_in_flight,
+                 http_request_errors_total (exceptions a route turned into an error response)
+- per upstream:  upstream_request_duration_seconds, upstream_ttft_seconds (streams),
+                 upstream_errors_total; upstream = openai_chat | whisper | vision | embedding
+- tokens:        llm_tokens_total from response usage
+- hedging:       upstream_hedges_total, upstream_hedges_skipped_total, upstream_hedge_wins_total,
+                 upstream_retries_total, deadline_exceeded_total (see deadline.py)
+- admission:     admission_queue_depth, admission_slots_in_use, admission_wait_seconds,
+                 admission_rejected_total (see admission.py)
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# LLM calls take seconds, not milliseconds, so the buckets go up to a minute and a half
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            # a new list, so render() never sees one half-updated
+            counts = list(counts)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return counts[-1]
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines = [
+            f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(float(b)))])} {c}"
+            for b, c in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+http_requests = REGISTRY.register(Counter(
+    "http_requests_total", "Requests by route, method and status", ("route", "method", "status")))
+http_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Request latency until the response body is finished", ("route", "method")))
+http_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served", ("route",)))
+http_errors = REGISTRY.register(Counter(
+    "http_request_errors_total", "Exceptions turned into error responses, by type", ("route", "error")))
+upstream_duration = REGISTRY.register(Histogram(
+    "upstream_request_duration_seconds", "Upstream call latency (whole stream for streaming calls)", ("upstream", "operation")))
+upstream_ttft = REGISTRY.register(Histogram(
+    "upstream_ttft_seconds", "Time to first token of streaming upstream calls", ("upstream", "operation")))
+upstream_errors = REGISTRY.register(Counter(
+    "upstream_errors_total", "Failed upstream calls by exception type", ("upstream", "operation", "error")))
+llm_tokens = REGISTRY.register(Counter(
+    "llm_tokens_total", "Tokens reported by upstream usage", ("model", "type")))
+upstream_hedges = REGISTRY.register(Counter(
+    "upstream_hedges_total", "Duplicate requests sent for slow upstream calls", ("operation",)))
+upstream_hedges_skipped = REGISTRY.register(Counter(
+    "upstream_hedges_skipped_total", "Hedges not sent because the hedge budget was spent", ("operation",)))
+upstream_hedge_wins = REGISTRY.register(Counter(
+    "upstream_hedge_wins_total", "Hedged calls answered first by the duplicate", ("operation",)))
+upstream_retries = REGISTRY.register(Counter(
+    "upstream_retries_total", "Upstream calls retried after a transient error", ("operation", "error")))
+deadline_exceeded = REGISTRY.register(Counter(
+    "deadline_exceeded_total", "Upstream calls given up because the request deadline passed", ("operation",)))
+admission_queue_depth = REGISTRY.register(Gauge(
+    "admission_queue_depth", "Requests waiting for an upstream slot", ("upstream",)))
+admission_in_use = REGISTRY.register(Gauge(
+    "admission_slots_in_use", "Upstream slots held by running requests", ("upstream",)))
+admission_wait = REGISTRY.register(Histogram(
+    "admission_wait_seconds", "Time spent waiting for an upstream slot", ("upstream",)))
+admission_rejected = REGISTRY.register(Counter(
+    "admission_rejected_total", "Requests turned away by admission control", ("upstream", "reason")))
+
+
+@contextmanager
+def upstream_timer(upstream: str, operation: str):
+    """ with upstream_timer("openai_chat", "analyze"): ... -> latency histogram + error counter """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        upstream_errors.inc(upstream=upstream, operation=operation, error=type(e).__name__)
+        raise
+    finally:
+        upstream_duration.observe(time.perf_counter() - start, upstream=upstream, operation=operation)
+
+def observe_ttft(upstream: str, operation: str, start: float):
+    upstream_ttft.observe(time.perf_counter() - start, upstream=upstream, operation=operation)
+
+def observe_tokens(model: str, usage):
+    """ Count prompt/completion tokens of an OpenAI usage object (or dict) """
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        value = usage.get(f"{kind}_tokens") if isinstance(usage, dict) else getattr(usage, f"{kind}_tokens", None)
+        if value:
+            llm_tokens.inc(value, model=model, type=kind)
+
+def record_error(error: Exception, route: str = None):
+    """ Count an exception a route answered with an error response """
+    if route is None:
+        from flask import request
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+    http_errors.inc(route=route, error=type(error).__name__)
+
+
+def init_app(app):
+    """ Per-route request count, latency and in-flight hooks """
+    from flask import g, request, got_request_exception
+
+    def _count_unhandled(sender, exception, **extra):
+        record_error(exception)
+    # routes without a try/except (or that re-raise) still show up in http_request_errors_total
+    got_request_exception.connect(_count_unhandled, app, weak=False)
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.metrics_start = time.perf_counter()
+        http_in_flight.inc(route=g.metrics_route)
+
+    @app.after_request
+    def _finish_request_timer(response):
+        route, start, method = g.get("metrics_route"), g.get("metrics_start"), request.method
+        if route is None:
+            return response
+
+        def finish():
+            http_in_flight.dec(route=route)
+            http_duration.observe(time.perf_counter() - start, route=route, method=method)
+            http_requests.inc(route=route, method=method, status=response.status_code)
+
+        # a streamed body is still being generated here; count it when the server closes it
+        if response.is_streamed:
+            response.call_on_close(finish)
+        else:
+            finish()
+        return response
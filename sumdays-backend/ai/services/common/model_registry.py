@@ -0,0 +1,54 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "jhgan/ko-sroberta-multitask")
+
+_lock = threading.Lock()
+_models = {}
+_warming = None
+
+def _load_sentence_transformer(name: str):
+    # torch + sentence_transformers are imported here so that importing the app stays cheap
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+def get_embedding_model(name: str = EMBEDDING_MODEL_NAME):
+    """ Return the shared SentenceTransformer, loading it on first use """
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        # another thread may have finished loading while we waited for the lock
+        if name not in _models:
+            _models[name] = _load_sentence_transformer(name)
+        return _models[name]
+
+def warm_up():
+    """ Load every local model up front (call before forking workers) """
+    get_embedding_model()
+
+def start_warm_up():
+    """ Run warm_up() in a background thread unless the models are loaded or loading.
+    Serving entry points that do not preload call this, so readiness never waits for a request.
+    """
+    global _warming
+    with _lock:
+        if is_ready() or (_warming is not None and _warming.is_alive()):
+            return
+        _warming = threading.Thread(target=_warm_up_logged, name="warm-up", daemon=True)
+        _warming.start()
+
+def _warm_up_logged():
+    try:
+        warm_up()
+    except Exception:
+        # not ready; the next start_warm_up() (e.g. the next /ready probe) tries again
+        logger.exception("loading local models failed")
+
+def is_ready() -> bool:
+    """ True once the local models are loaded and requests won't pay the load cost """
+    return EMBEDDING_MODEL_NAME in _models
@@ -0,0 +1,85 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "16"))
+_executor = ThreadPoolExecutor(max_workers=PIPELINE_MAX_WORKERS, thread_name_prefix="pipeline")
+
+
+def submit(executor: ThreadPoolExecutor, fn, *args):
+    """ executor.submit, run in a copy of the caller's context so the work sees the request's deadline """
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+def map_in_context(executor: ThreadPoolExecutor, fn, items, max_in_flight: int = None) -> list:
+    """ executor.map through submit(): results in order, the first error is raised.
+    max_in_flight caps how many of these items run at once on an executor shared by requests.
+    """
+    futures, running = [], set()
+    for item in items:
+        if max_in_flight and len(running) >= max_in_flight:
+            _, running = wait(running, return_when=FIRST_COMPLETED)
+        future = submit(executor, fn, item)
+        futures.append(future)
+        running.add(future)
+    return [future.result() for future in futures]
+
+
+class Pipeline:
+    """ Small DAG runner: each stage starts as soon as the stages it depends on are done.
+
+    pipeline = Pipeline()
+    pipeline.add("diary", lambda: merge(...))
+    pipeline.add("analysis", lambda diary: analyze(diary), deps=["diary"])
+    pipeline.add("mood", lambda diary: mood(diary), deps=["diary"])
+    results, timings = pipeline.run()
+
+    A stage function receives its dependencies' results as keyword arguments.
+    timings[name] = {"start": seconds after run() began, "seconds": stage duration}.
+    """
+    def __init__(self, executor: ThreadPoolExecutor = None):
+        self.executor = executor or _executor
+        self.stages = {}
+
+    def add(self, name: str, fn, deps=()):
+        unknown = [d for d in deps if d not in self.stages]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {unknown}")
+        self.stages[name] = (fn, tuple(deps))
+        return self
+
+    def run(self):
+        results, timings = {}, {}
+        for name, result, timing in self.iter_run():
+            results[name] = result
+            timings[name] = timing
+        return results, timings
+
+    def iter_run(self):
+        """ Yield (name, result, timing) for each stage as soon as it finishes """
+        results = {}
+        running = {}
+        t0 = time.perf_counter()
+
+        def timed(fn, kwargs):
+            start = time.perf_counter()
+            result = fn(**kwargs)
+            return result, {"start": start - t0, "seconds": time.perf_counter() - start}
+
+        def submit_ready():
+            for name, (fn, deps) in self.stages.items():
+                if name in results or name in running.values():
+                    continue
+                if all(d in results for d in deps):
+                    future = submit(self.executor, timed, fn, {d: results[d] for d in deps})
+                    running[future] = name
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                # the first failing stage fails the pipeline; stages already running are left to finish
+                results[name], timing = future.result()
+                yield name, results[name], timing
+            submit_ready()
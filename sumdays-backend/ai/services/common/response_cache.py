@@ -0,0 +1,237 @@
+""" Response cache for deterministic-enough LLM calls (diary analysis, mood, ...).
+
+Keys hash the namespace, model, prompt version and normalized input, so editing a prompt
+(bump its version) or switching models never serves stale answers. Values are stored as JSON.
+
+Backends (RESPONSE_CACHE_BACKEND):
+- memory: in-process LRU dict (default)
+- sqlite: local file at RESPONSE_CACHE_PATH (default: response_cache.sqlite in the ai directory),
+          shared by workers on the same host
+- redis:  anything speaking the Redis protocol at RESPONSE_CACHE_URL (needs the `redis` package)
+- none:   caching disabled
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+BYPASS_HEADER = "X-Cache-Bypass"
+# default home of the SQLite files, so they do not depend on the server's working directory
+AI_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class MemoryBackend:
+    def __init__(self, max_items: int = 10000):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._items[key] = (value, time.time() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteConnection:
+    """ SQLite connection opened on first use in each process.
+    With gunicorn's preload_app the caches are built in the master, and a connection must not be
+    carried across fork: a forked worker opens its own instead of using the inherited one.
+    """
+    def __init__(self, path: str, schema: tuple):
+        self.path = path
+        self.schema = schema
+        self._conn = None
+        self._pid = None
+
+    def get(self) -> sqlite3.Connection:
+        """ This process's connection; call it with the owner's lock held """
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            for statement in self.schema:
+                conn.execute(statement)
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+
+class SQLiteBackend:
+    def __init__(self, path: str, max_items: int = 100000):
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._db = SQLiteConnection(path, (
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)",
+        ))
+
+    @property
+    def _conn(self):
+        return self._db.get()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM responses WHERE key=?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET last_used=? WHERE key=?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now)
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_items:
+                # expired rows go first, then the least recently used
+                self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)", (max(0, count - self.max_items),)
+                )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class RedisBackend:
+    """ TTL is handled by SET EX; size/LRU eviction by the server's maxmemory-policy (allkeys-lru) """
+    def __init__(self, url: str, prefix: str = "sumdays:cache:", env_prefix: str = "RESPONSE_CACHE"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(f"{env_prefix}_BACKEND=redis needs the 'redis' package (pip install redis)") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float = 86400):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    @staticmethod
+    def make_key(namespace: str, model: str, prompt_version: str, *inputs) -> str:
+        """ inputs are strings (normalized here) or JSON-serializable objects """
+        parts = [normalize_text(i) if isinstance(i, str) else i for i in inputs]
+        raw = json.dumps([namespace, model, prompt_version, parts], ensure_ascii=False, sort_keys=True)
+        return f"{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str):
+        """ Cached value for key, or None (counted as a hit or miss) """
+        if self.backend is None:
+            return None
+        cached = self.backend.get(key)
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(cached) if cached is not None else None
+
+    def set(self, key: str, value):
+        if self.backend is not None:
+            self.backend.set(key, json.dumps(value, ensure_ascii=False), self.ttl)
+
+    def get_or_compute(self, key: str, compute, use_cache: bool = True):
+        """ Return the cached value for key, or compute(), store and return it.
+        use_cache=False skips the lookup but still refreshes the stored value.
+        """
+        if self.backend is None:
+            return compute()
+
+        if use_cache:
+            cached = self.backend.get(key)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                return json.loads(cached)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.bypasses += 1
+
+        value = compute()
+        self.backend.set(key, json.dumps(value, ensure_ascii=False), self.ttl)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__ if self.backend is not None else None,
+                "items": len(self.backend) if self.backend is not None else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def backend_from_env(prefix: str = "RESPONSE_CACHE"):
+    kind = os.getenv(f"{prefix}_BACKEND", "memory").lower()
+    size = int(os.getenv(f"{prefix}_SIZE", "10000"))
+    if kind == "none":
+        return None
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv(f"{prefix}_PATH") or os.path.join(AI_DIR, f"{prefix.lower()}.sqlite"), size)
+    if kind == "redis":
+        return RedisBackend(os.getenv(f"{prefix}_URL", "redis://localhost:6379/0"), env_prefix=prefix)
+    return MemoryBackend(size)
+
+def is_bypass(headers) -> bool:
+    """ True if the request asked to skip the cache (X-Cache-Bypass: 1 or Cache-Control: no-cache) """
+    return headers.get(BYPASS_HEADER, "").lower() in ("1", "true") or "no-cache" in headers.get("Cache-Control", "")
+
+response_cache = ResponseCache(backend_from_env(), ttl=float(os.getenv("RESPONSE_CACHE_TTL", "86400")))
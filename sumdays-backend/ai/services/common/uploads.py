@@ -0,0 +1,74 @@
+""" Size-bounded, spooled multipart uploads (/image/*, /extract/style with images, /stt/*).
+
+Each uploaded file is parsed into a SpooledTemporaryFile: kept in memory up to
+UPLOAD_SPOOL_BYTES and moved to a temp file beyond that, so a large upload does not sit in
+worker memory while it waits for an upstream. Services read the files where they use them
+(one OCR page per worker, audio passed on as a file) instead of copying every upload first.
+
+The limits are checked before admission and before the view, so an oversized request is
+refused with 413 without taking an upstream slot:
+- UPLOAD_MAX_REQUEST_BYTES  whole request body (Flask MAX_CONTENT_LENGTH; a too large
+                            Content-Length is refused before the body is read)
+- UPLOAD_MAX_FILE_BYTES     each file
+- UPLOAD_MAX_FILES          files per request
+"""
+import os
+from tempfile import SpooledTemporaryFile
+
+from flask import Request
+
+SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(512 * 1024)))
+MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(100 * 1024 * 1024)))
+MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "10"))
+
+
+class SpooledRequest(Request):
+    """ Flask request whose uploaded files spill to disk past UPLOAD_SPOOL_BYTES """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=SPOOL_BYTES, mode="rb+")
+
+
+def file_size(storage) -> int:
+    """ Bytes in an uploaded file (FileStorage), without reading it """
+    stream = storage.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+def check_files(files) -> str:
+    """ Why the uploads break a limit, or None """
+    uploads = [f for name in files for f in files.getlist(name)]
+    if len(uploads) > MAX_FILES:
+        return f"At most {MAX_FILES} files can be uploaded at once."
+    for upload in uploads:
+        if file_size(upload) > MAX_FILE_BYTES:
+            return f"{upload.filename} is larger than {MAX_FILE_BYTES // (1024 * 1024)} MB."
+    return None
+
+
+def init_app(app):
+    """ Spool uploads and refuse oversized ones with 413; register before admission """
+    from flask import request, jsonify
+    from werkzeug.exceptions import RequestEntityTooLarge
+
+    app.request_class = SpooledRequest
+    app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+
+    @app.before_request
+    def _check_uploads():
+        # a view's own try/except would turn the 413 from reading a too large body into a 400
+        if request.content_length is not None and request.content_length > MAX_REQUEST_BYTES:
+            raise RequestEntityTooLarge()
+        if request.mimetype != "multipart/form-data":
+            return None
+        # parsing here raises RequestEntityTooLarge past MAX_CONTENT_LENGTH
+        error = check_files(request.files)
+        if error:
+            return jsonify({"error": error}), 413
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def _too_large(e):
+        return jsonify({"error": f"Request is larger than {MAX_REQUEST_BYTES // (1024 * 1024)} MB."}), 413
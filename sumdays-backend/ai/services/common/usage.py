@@ -0,0 +1,10 @@
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+def add_usage(totals: dict, usage) -> dict:
+    """ Add an OpenAI usage object (or dict) into totals, in place """
+    if totals is None or usage is None:
+        return totals
+    for field in USAGE_FIELDS:
+        value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+        totals[field] = totals.get(field, 0) + (value or 0)
+    return totals
@@ -0,0 +1,25 @@
+""" /extract routes for the async server (asgi.py).
+Only JSON bodies are served here; multipart uploads (OCR) go to the Flask route.
+"""
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from .extract_service import aextract_style
+from .routes import MIN_DIARY_NUM
+
+async def extract_style_route(request: Request):
+    """ async POST /extract/style with {"diaries": [...]} """
+    data = await request.json()
+    diaries = data.get("diaries") or []
+
+    if len(diaries) < MIN_DIARY_NUM:
+        return JSONResponse({"error": "At least 5 diaries required."}, status_code=400)
+
+    return JSONResponse(await aextract_style(diaries))
+
+routes = [
+    Route("/extract/style", extract_style_route, methods=["POST"]),
+]
+
+# paths served above only for this content type; anything else falls through to Flask
+content_types = {"/extract/style": "application/json"}
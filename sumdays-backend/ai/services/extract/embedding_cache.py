@@ -0,0 +1,151 @@
+import os
+import re
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+from ..common.response_cache import SQLiteConnection
+
+def normalize_sentence(sentence: str) -> str:
+    """ Unicode-normalize and collapse whitespace so trivially different copies share a key """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", sentence)).strip()
+
+
+class DiskEmbeddingStore:
+    """ SQLite tier of the embedding cache, bounded to max_items rows (least recently used out first).
+    The connection is opened per process (SQLiteConnection), so it is safe to build before gunicorn forks.
+    """
+    def __init__(self, path: str, max_items: int):
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._db = SQLiteConnection(path, (
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vec BLOB NOT NULL, last_used REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)",
+        ))
+
+    @property
+    def _conn(self):
+        return self._db.get()
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            # chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update({k: np.frombuffer(v, dtype=np.float32) for k, v in rows})
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used=? WHERE key=?", [(now, k) for k in found])
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(key, vec, last_used) VALUES (?, ?, ?)",
+                [(k, v.astype(np.float32).tobytes(), now) for k, v in items.items()]
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_items:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)", (count - self.max_items,)
+                )
+            self._conn.commit()
+
+
+class EmbeddingCache:
+    """ Two-tier (memory LRU + optional SQLite) cache of sentence embeddings.
+    Keys are sha256(model name + normalized sentence), so a model swap never returns stale vectors.
+    """
+    def __init__(self, model_name: str, max_items: int = 20000, disk_path: str = None, disk_max_items: int = 200000):
+        self.model_name = model_name
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = DiskEmbeddingStore(disk_path, disk_max_items) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, sentence: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{sentence}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vec: np.ndarray):
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def embed(self, sentences: list[str], encode) -> np.ndarray:
+        """ Return embeddings for sentences, calling encode(list[str]) only for cache misses """
+        if not sentences:
+            return np.zeros((0, 0), dtype=np.float32)
+        normalized = [normalize_sentence(s) for s in sentences]
+        keys = [self.key(s) for s in normalized]
+
+        vectors = {}
+        with self._lock:
+            for k in keys:
+                if k in self._memory:
+                    self._memory.move_to_end(k)
+                    vectors[k] = self._memory[k]
+
+        from_disk = {}
+        if self._disk:
+            from_disk = self._disk.get_many(list(dict.fromkeys(k for k in keys if k not in vectors)))
+            vectors.update(from_disk)
+
+        # encode each missing sentence once, even if it appears several times in the input
+        missing = {}
+        for k, s in zip(keys, normalized):
+            if k not in vectors:
+                missing.setdefault(k, s)
+        if missing:
+            encoded = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            new_vectors = dict(zip(missing.keys(), encoded))
+            vectors.update(new_vectors)
+            if self._disk:
+                self._disk.put_many(new_vectors)
+
+        with self._lock:
+            for k in list(from_disk) + list(missing):
+                self._remember(k, vectors[k])
+            self.misses += len(missing)
+            self.disk_hits += len(from_disk)
+            self.hits += len(keys) - len(missing) - len(from_disk)
+
+        return np.stack([vectors[k] for k in keys], axis=0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "memory_items": len(self._memory),
+                "memory_max_items": self.max_items,
+                "disk_enabled": self._disk is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+def cache_from_env(model_name: str) -> EmbeddingCache:
+    """ EMBEDDING_CACHE_SIZE / EMBEDDING_CACHE_PATH (enables the SQLite tier) / EMBEDDING_CACHE_DISK_SIZE """
+    return EmbeddingCache(
+        model_name,
+        max_items=int(os.getenv("EMBEDDING_CACHE_SIZE", "20000")),
+        disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+        disk_max_items=int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "200000")),
+    )
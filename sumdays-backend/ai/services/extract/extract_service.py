@@ -1,56 +1,144 @@
-from .extract_style_profile import compute_style_profile_text
-from sentence_transformers import SentenceTransformer
+from .extract_style_profile import compute_style_profile_text, acompute_style_profile_text
+from .embedding_cache import cache_from_env
+from ..common.model_registry import get_embedding_model, EMBEDDING_MODEL_NAME
+from ..common.metrics import upstream_timer
+from ..common.pipeline import submit
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import logging
+import os
+import time
 import numpy as np
 import json
 
-model = SentenceTransformer("jhgan/ko-sroberta-multitask")
+logger = logging.getLogger(__name__)
+# the style-profile GPT call runs here while the request thread does the embedding work
+profile_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="style-profile")
+# async mode: CPU-bound encoding runs here so it never blocks the event loop
+embedding_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EMBEDDING_MAX_WORKERS", "2")), thread_name_prefix="embedding"
+)
+embedding_cache = cache_from_env(EMBEDDING_MODEL_NAME)
 
 def l2norm(x):
     return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-12)
 
-def embed_sentences(sentences):
-    E = model.encode(sentences, convert_to_numpy=True, batch_size=64)
+def _encode(sentences):
+    model = get_embedding_model()
+    with upstream_timer("embedding", "encode"):
+        E = model.encode(sentences, convert_to_numpy=True, batch_size=64)
     return l2norm(E)
 
-def diary_embedding(diary_text):
-    sentences = [s.strip() for s in diary_text.split("\n") if s.strip()]
-    E = embed_sentences(sentences)
-    diary_vec = l2norm(E.mean(axis=0, keepdims=True))[0]
-    
-    return diary_vec
-
-def compute_style_vector(diaries):
-    diary_vecs = [diary_embedding(d) for d in diaries]
-    user_vec = np.stack(diary_vecs, axis=0).mean(axis=0)
-    user_vec = l2norm(user_vec.reshape(1, -1))[0]
-    return user_vec.tolist()
+def embed_sentences(sentences):
+    """ Normalized embeddings; only sentences missing from embedding_cache are encoded """
+    return embedding_cache.embed(sentences, _encode)
 
-def extract_style_examples(diaries, style_vector, n=4):
-    text = "\n".join(diaries)
+def split_lines(diary_text):
+    return [s.strip() for s in diary_text.split("\n") if s.strip()]
 
+def split_candidates(diaries):
+    """ Sentences (8+ chars) that can be picked as style examples """
     raw_candidates = []
-    for paragraph in text.split("\n"):
+    for paragraph in "\n".join(diaries).split("\n"):
         paragraph = paragraph.strip()
         if len(paragraph) < 2:
             continue
         sentences = [s.strip() for s in paragraph.split(".") if len(s.strip()) >= 8]
         raw_candidates.extend(sentences)
+    return raw_candidates
 
-    if len(raw_candidates) <= n:
-        return raw_candidates
+def segment_mean(E, lengths):
+    """ Row means of consecutive segments of E (segment i has lengths[i] rows, all > 0) """
+    lengths = np.asarray(lengths)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.add.reduceat(E, offsets, axis=0) / lengths[:, None]
 
-    candidate_vectors = embed_sentences(raw_candidates)
-    style_vector = np.array(style_vector).reshape(1,-1)
+def style_vector_from_lines(line_vectors, lengths):
+    """ Mean-pool line vectors per diary, then average the normalized diary vectors """
+    diary_vecs = l2norm(segment_mean(line_vectors, lengths))
+    return l2norm(diary_vecs.mean(axis=0, keepdims=True))[0]
+
+def select_examples(candidates, candidate_vectors, style_vector, n=4):
+    if len(candidates) <= n:
+        return candidates
 
+    style_vector = np.array(style_vector).reshape(1,-1)
     similarities = (candidate_vectors @ style_vector.T).reshape(-1)
     top_idx = np.argsort(-similarities)[:n]
 
-    return [raw_candidates[i] for i in top_idx]
+    return [candidates[i] for i in top_idx]
+
+def diary_embedding(diary_text):
+    E = embed_sentences(split_lines(diary_text))
+    diary_vec = l2norm(E.mean(axis=0, keepdims=True))[0]
+    
+    return diary_vec
+
+def compute_style_vector(diaries):
+    diary_lines = [lines for lines in map(split_lines, diaries) if lines]
+    E = embed_sentences([line for lines in diary_lines for line in lines])
+    return style_vector_from_lines(E, [len(lines) for lines in diary_lines]).tolist()
+
+def extract_style_examples(diaries, style_vector, n=4):
+    candidates = split_candidates(diaries)
+    if len(candidates) <= n:
+        return candidates
+    return select_examples(candidates, embed_sentences(candidates), style_vector, n)
+
+def embed_style_inputs(diaries, n=4):
+    """ Style vector and examples from ONE batched encode over every unique line and candidate """
+    diary_lines = [lines for lines in map(split_lines, diaries) if lines]
+    lines = [line for lines in diary_lines for line in lines]
+    candidates = split_candidates(diaries)
+    # candidates are only ranked when there are more than n of them
+    ranked = candidates if len(candidates) > n else []
+
+    unique = list(dict.fromkeys(lines + ranked))
+    index = {s: i for i, s in enumerate(unique)}
+    E = embed_sentences(unique)
+
+    style_vector = style_vector_from_lines(E[[index[s] for s in lines]], [len(l) for l in diary_lines])
+    if ranked:
+        style_examples = select_examples(ranked, E[[index[s] for s in ranked]], style_vector, n)
+    else:
+        style_examples = candidates
+
+    return style_vector.tolist(), style_examples
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
 
 def extract_style(diaries):
-    style_vector = compute_style_vector(diaries)
-    style_examples = extract_style_examples(diaries, style_vector, n=4)
-    style_prompt = compute_style_profile_text(diaries)
+    """ The style-profile LLM call (network-bound) overlaps with the local embedding work """
+    start = time.perf_counter()
+    profile_future = submit(profile_executor, _timed, compute_style_profile_text, diaries)
+
+    (style_vector, style_examples), embed_seconds = _timed(embed_style_inputs, diaries, 4)
+    style_prompt, profile_seconds = profile_future.result()
+
+    logger.info(
+        "extract_style: embedding=%.3fs style_profile=%.3fs total=%.3fs (%d diaries)",
+        embed_seconds, profile_seconds, time.perf_counter() - start, len(diaries)
+    )
+
+    return {
+        "style_vector": style_vector,
+        "style_examples": style_examples,
+        "style_prompt": style_prompt
+    }
+
+async def aextract_style(diaries):
+    """ extract_style for the async server: style profile via ainvoke, embeddings on embedding_executor """
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    (style_vector, style_examples), style_prompt = await asyncio.gather(
+        loop.run_in_executor(embedding_executor, contextvars.copy_context().run, embed_style_inputs, diaries, 4),
+        acompute_style_profile_text(diaries),
+    )
+    logger.info("aextract_style: total=%.3fs (%d diaries)", time.perf_counter() - start, len(diaries))
 
     return {
         "style_vector": style_vector,
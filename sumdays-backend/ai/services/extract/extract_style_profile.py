@@ -1,8 +1,8 @@
 import os
 from typing import List, Dict, Any
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
+from ..common.clients import get_chat_model
 
 class StyleProfile(BaseModel):
     # 0. 컨셉 정의
@@ -28,10 +28,20 @@ def compute_style_profile_text(diaries: List[str]) -> Dict[str, Any]:
     if not combined_text.strip():
         return {"error": "No text provided for analysis"}
 
-    llm = ChatOpenAI(
-        model=os.getenv("IMAGE_MODEL", "gpt-4o-mini"), 
-        temperature=0.5
-    ).with_structured_output(StyleProfile)
+    result = _style_profile_chain().invoke({"text": combined_text}, config={"metadata": {"operation": "style_profile"}})
+    return result.model_dump()
+
+async def acompute_style_profile_text(diaries: List[str]) -> Dict[str, Any]:
+    combined_text = "\n".join(diaries)
+
+    if not combined_text.strip():
+        return {"error": "No text provided for analysis"}
+
+    result = await _style_profile_chain().ainvoke({"text": combined_text}, config={"metadata": {"operation": "style_profile"}})
+    return result.model_dump()
+
+def _style_profile_chain():
+    llm = get_chat_model(os.getenv("IMAGE_MODEL", "gpt-4o-mini"), 0.5).with_structured_output(StyleProfile)
 
     prompt_text = """
     당신은 텍스트의 [언어학적 구조]와 [캐릭터 페르소나]를 동시에 분석하는 '문체 프로파일러'입니다.
@@ -54,7 +64,4 @@ def compute_style_profile_text(diaries: List[str]) -> Dict[str, Any]:
     """
     
     prompt = PromptTemplate.from_template(prompt_text)
-    chain = prompt | llm
-    result = chain.invoke({"text": combined_text})
-
-    return result.model_dump()
\ No newline at end of file
+    return prompt | llm
\ No newline at end of file
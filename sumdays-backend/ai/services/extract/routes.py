@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from .extract_service import extract_style
 from ..image.image_service import ImageService
+from ..common.response_cache import is_bypass
 import json
 
 extract_bp = Blueprint("extract", __name__, url_prefix="/extract")
@@ -26,7 +27,7 @@ def extract_style_route():
     # get image diary input
     image_files = request.files.getlist("images")
     if image_files:
-        ocr_results = image_service.detect_texts_from_diaries(image_files)
+        ocr_results = image_service.detect_texts_from_diaries(image_files, use_cache=not is_bypass(request.headers))
         refined_results = ocr_results.get("result", [])
 
         for diary in refined_results:
@@ -0,0 +1,141 @@
+""" Image result cache by content hash: a page uploaded again (to /image/diary, then with
+/extract/style, or twice) skips Vision and the model.
+
+Entries are stored separately, so each is reused on its own:
+- ocr:      image SHA-256 -> full_text_annotation text
+- refine:   OCR text -> RefinedDiaryResult (keyed on the text, so any photo that reads the same shares it)
+- describe: image SHA-256 -> description
+
+The store is a ResponseCache configured like the response cache, with the IMAGE_CACHE_ prefix
+(IMAGE_CACHE_BACKEND=memory|sqlite|redis|none, IMAGE_CACHE_PATH, IMAGE_CACHE_SIZE for LRU eviction,
+IMAGE_CACHE_TTL). IMAGE_CACHE_BACKEND=sqlite keeps results on local disk across restarts, in
+image_cache.sqlite in the ai directory unless IMAGE_CACHE_PATH says otherwise; like the response
+cache's, its connection is opened in each worker, not in the preloading master.
+
+Near duplicates (IMAGE_CACHE_NEAR_DUPLICATE_DISTANCE, e.g. 4; off by default): the same photo
+re-encoded or resized by the client has another SHA-256 but a 64-bit difference hash (dHash)
+within that many bits. Only descriptions are matched this way (NEAR_DUPLICATE_NAMESPACES): the
+cache is shared by all users, and a dHash match is not proof of the same picture, so matching OCR
+would hand one user the text of another user's page. The dHash index lives in the worker (LRU, IMAGE_CACHE_SIZE entries), so
+near-duplicate matches last as long as the process; exact matches last as long as the backend.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+from ..common.response_cache import ResponseCache, backend_from_env
+
+IMAGE_CACHE_TTL = float(os.getenv("IMAGE_CACHE_TTL", str(30 * 86400)))
+# the cache is shared across users: a near-duplicate hit serves the result of someone else's upload,
+# so it is limited to descriptions; OCR text (a diary page) is only reused for the exact same bytes
+_distance = os.getenv("IMAGE_CACHE_NEAR_DUPLICATE_DISTANCE", "")
+NEAR_DUPLICATE_DISTANCE = int(_distance) if _distance else None
+NEAR_DUPLICATE_NAMESPACES = frozenset({"describe"})
+
+
+def content_hash(source) -> str:
+    """ SHA-256 of an upload (bytes or a seekable binary file, read in blocks and rewound) """
+    digest = hashlib.sha256()
+    if isinstance(source, bytes):
+        digest.update(source)
+        return digest.hexdigest()
+    source.seek(0)
+    for block in iter(lambda: source.read(64 * 1024), b""):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+def difference_hash(source) -> int:
+    """ 64-bit dHash of the upright image (is each pixel of a 9x8 grayscale thumbnail brighter than its right neighbour), or None """
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        # JPEG: decode at 1/8 scale, plenty for a 9x8 thumbnail
+        image.draft("L", (64, 64))
+        pixels = ImageOps.exif_transpose(image).convert("L").resize((9, 8), Image.Resampling.BOX).tobytes()
+    except (OSError, ValueError):
+        return None
+    finally:
+        if not isinstance(source, bytes):
+            source.seek(0)
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+class NearDuplicateIndex:
+    """ dHash -> SHA-256 of recently cached images, searched by Hamming distance """
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def add(self, dhash: int, digest: str):
+        with self._lock:
+            self._items[dhash] = digest
+            self._items.move_to_end(dhash)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def find(self, dhash: int, distance: int) -> str:
+        """ SHA-256 of the closest indexed image within distance bits, or None """
+        with self._lock:
+            best, best_distance = None, distance + 1
+            for other, digest in self._items.items():
+                d = (dhash ^ other).bit_count()
+                if d < best_distance:
+                    best, best_distance = other, d
+            if best is None:
+                return None
+            self._items.move_to_end(best)
+            self.hits += 1
+            return self._items[best]
+
+
+class ImageKey:
+    """ An upload's cache identity: SHA-256 now, dHash only if a near-duplicate lookup needs it """
+    def __init__(self, source):
+        self.source = source
+        self.digest = content_hash(source)
+        self._dhash = None
+        self._dhash_done = False
+
+    @property
+    def dhash(self) -> int:
+        if not self._dhash_done:
+            self._dhash = difference_hash(self.source)
+            self._dhash_done = True
+        return self._dhash
+
+
+def lookup(namespace: str, model: str, version: str, image: ImageKey, *inputs, use_cache: bool = True):
+    """ Cached value for the image (then for a near duplicate, if enabled for the namespace), or None """
+    if not use_cache:
+        return None
+    value = image_cache.get(image_cache.make_key(namespace, model, version, image.digest, *inputs))
+    if value is None and _near_duplicates_for(namespace) and image.dhash is not None:
+        digest = near_duplicates.find(image.dhash, NEAR_DUPLICATE_DISTANCE)
+        if digest is not None and digest != image.digest:
+            value = image_cache.get(image_cache.make_key(namespace, model, version, digest, *inputs))
+    return value
+
+def store(namespace: str, model: str, version: str, image: ImageKey, *inputs, value):
+    image_cache.set(image_cache.make_key(namespace, model, version, image.digest, *inputs), value)
+    if _near_duplicates_for(namespace) and image.dhash is not None:
+        near_duplicates.add(image.dhash, image.digest)
+
+def _near_duplicates_for(namespace: str) -> bool:
+    return NEAR_DUPLICATE_DISTANCE is not None and namespace in NEAR_DUPLICATE_NAMESPACES
+
+def stats() -> dict:
+    return {**image_cache.stats(), "near_duplicate_hits": near_duplicates.hits}
+
+
+image_cache = ResponseCache(backend_from_env("IMAGE_CACHE"), ttl=IMAGE_CACHE_TTL)
+near_duplicates = NearDuplicateIndex(int(os.getenv("IMAGE_CACHE_SIZE", "10000")))
@@ -1,13 +1,21 @@
-from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from google.cloud import vision
+from ..common.clients import get_chat_model, get_vision_client
+from ..common.metrics import upstream_timer
+from ..common.pipeline import map_in_context
+from . import preprocess, image_cache
+from concurrent.futures import ThreadPoolExecutor
 import os
-import base64
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "8"))
+REFINE_MAX_CONCURRENCY = int(os.getenv("REFINE_MAX_CONCURRENCY", "8"))
+# bump when a prompt (or how its input is prepared) changes, so cached results are not reused
+OCR_CACHE_VERSION = "1"
+REFINE_PROMPT_VERSION = "1"
+DESCRIBE_PROMPT_VERSION = "1"
 
 class RefinedDiaryResult(BaseModel):
     """ Represents the result of the diary analysis """
@@ -15,29 +23,73 @@ class RefinedDiaryResult(BaseModel):
     refined_text    : str   = Field(description="A refined diary with unnecessary OCR extracted text removed and paragraphs and sentences divided according to the content.")
 
 
+REFINE_PROMPT = """
+    You are refining OCR text from a scanned diary page.
+    You will receive OCR-extracted diary text that may include formatting noise or irrelevant template sections.
+
+    Task:
+    1. Detect the diary's date written in the text (e.g., "2025년 10월 25일").
+        - If a date-like expression is present, extract it and normalize it into the format "YYYY-MM-DD".
+        - If some parts of the date are missing:
+            * replace unknown year/month/day with "X".
+            * e.g., "10월 6일" → "XXXX-10-06", "2023년 5월" → "2023-05-XX"
+    2. Remove irrelevant template sections entirely — do not leave placeholders or explanations.
+    Examples of such sections:
+    - "오늘 할 일", "내일 할 일", "쓰기 연습", checklists, teacher comments, titles, or prompts.
+    3. Keep only the main diary content written by the user.
+    4. Preserve original meaning and tone. Do NOT add comments like "removed" or "excluded".
+    5. Return JSON following the RefinedDiaryResult schema.
+
+    Respond **in the same language** as the diary text.
+    ---
+    Make RefinedDiaryResult for diary: {ocr_extracted_diary}
+    """
+
+
+class OCRError(Exception):
+    """ Reading failed for one or more images; errors maps the image index to its error message """
+    def __init__(self, errors: dict):
+        self.errors = errors
+        super().__init__("; ".join(f"image {idx}: {msg}" for idx, msg in sorted(errors.items())))
+
+
 class ImageService:
     """ Service for image memos or diaries """
-    def __init__(self):
-        self.image_model = ChatOpenAI(
-            model=os.getenv("IMAGE_MODEL", "gpt-4o-mini"),
-            temperature=0.3
-        )
-        self.refine_model = ChatOpenAI(
-            model=os.getenv("GPT_MODEL", "GPT-4.1-nano"),
-            temperature=0.7
+    def __init__(self, ocr_client=None, ocr_max_workers: int = OCR_MAX_WORKERS):
+        self.image_model_name = os.getenv("IMAGE_MODEL", "gpt-4o-mini")
+        self.refine_model_name = os.getenv("GPT_MODEL", "GPT-4.1-nano")
+        self.image_model = get_chat_model(self.image_model_name, 0.3)
+        self.refine_model = get_chat_model(self.refine_model_name, 0.7)
+        self.refine_chain = (
+            PromptTemplate.from_template(REFINE_PROMPT)
+            | self.refine_model.with_structured_output(RefinedDiaryResult)
         )
-        self.ocr_client = vision.ImageAnnotatorClient()
-
-    def analyze(self, image_file, analysis_type: str):
+        self.refine_max_concurrency = REFINE_MAX_CONCURRENCY
+        self._ocr_client = ocr_client
+        self.ocr_long_edge = preprocess.OCR_LONG_EDGE
+        self.describe_long_edge = preprocess.DESCRIBE_LONG_EDGE
+        self.describe_detail = preprocess.DESCRIBE_DETAIL
+        # Vision calls are network-bound, so a page per thread keeps multi-page uploads to ~1 round-trip
+        self.ocr_executor = ThreadPoolExecutor(max_workers=ocr_max_workers, thread_name_prefix="ocr")
+
+    @property
+    def ocr_client(self):
+        """ Vision client, created on first use: with gunicorn's preload_app the service is built in the
+        master, and a gRPC channel opened before fork must not be shared by the workers """
+        if self._ocr_client is None:
+            self._ocr_client = get_vision_client()
+        return self._ocr_client
+
+    def analyze(self, image_file, analysis_type: str, use_cache: bool = True):
         """ Extract image descriptions or text depending on the analysis type """
         if analysis_type == "extract":
-            text = self.extract_text_from_image(image_files=[image_file])[0]
+            text = self.extract_text_from_image(image_files=[image_file], use_cache=use_cache)[0]
             return {
                 "type": analysis_type,
                 "text": text.text.strip()
             }
         elif analysis_type == "describe":
-            result_text = self.describe_image(image_file)
+            result_text = self.describe_image(image_file, use_cache=use_cache)
             return {
                 "type": analysis_type,
                 "text": result_text
@@ -45,64 +97,96 @@ class ImageService:
         else:
             raise ValueError(f"Unsupported analysis type: {analysis_type}")
 
-    def detect_texts_from_diaries(self, image_files): 
-        """ OCR multiple image files and extract date/refine extracted text """
+    def detect_texts_from_diaries(self, image_files, use_cache: bool = True):
+        """ OCR multiple image files and extract date/refine extracted text.
+        OCR text and refinements already cached (same image, same text) skip their upstream call.
+        """
         result = []
-        extracted_texts = self.extract_text_from_image(image_files)
-        
-        for idx, text_obj in enumerate(extracted_texts):
-            extracted_text = text_obj.text.strip()
-
-            prompt_text = """
-            You are refining OCR text from a scanned diary page.
-            You will receive OCR-extracted diary text that may include formatting noise or irrelevant template sections.
-
-            Task:
-            1. Detect the diary's date written in the text (e.g., "2025년 10월 25일").
-                - If a date-like expression is present, extract it and normalize it into the format "YYYY-MM-DD".
-                - If some parts of the date are missing:
-                    * replace unknown year/month/day with "X".
-                    * e.g., "10월 6일" → "XXXX-10-06", "2023년 5월" → "2023-05-XX"
-            2. Remove irrelevant template sections entirely — do not leave placeholders or explanations.
-            Examples of such sections:
-            - "오늘 할 일", "내일 할 일", "쓰기 연습", checklists, teacher comments, titles, or prompts.
-            3. Keep only the main diary content written by the user.
-            4. Preserve original meaning and tone. Do NOT add comments like "removed" or "excluded".
-            5. Return JSON following the RefinedDiaryResult schema.
-
-            Respond **in the same language** as the diary text.
-            ---
-            Make RefinedDiaryResult for diary: {ocr_extracted_diary}
-            """
-
-            prompt = PromptTemplate.from_template(prompt_text)
-            llm = self.refine_model.with_structured_output(RefinedDiaryResult)
-
-            chain = prompt | llm
-            refined_result = chain.invoke({"ocr_extracted_diary": extracted_text})
-            result.append(refined_result.model_dump())
+        extracted_texts = self.extract_text_from_image(image_files, return_exceptions=True, use_cache=use_cache)
+        errors = {idx: str(t) for idx, t in enumerate(extracted_texts) if isinstance(t, Exception)}
+
+        refined_by_page = {}
+        pending = []
+        for idx in range(len(extracted_texts)):
+            if idx in errors:
+                continue
+            cached = image_cache.image_cache.get(self._refine_key(extracted_texts[idx].text)) if use_cache else None
+            if cached is not None:
+                refined_by_page[idx] = cached
+            else:
+                pending.append(idx)
+
+        # one chain, all uncached pages refined concurrently; batch() returns results in input order
+        refined_results = self.refine_chain.batch(
+            [{"ocr_extracted_diary": extracted_texts[idx].text.strip()} for idx in pending],
+            config={"max_concurrency": self.refine_max_concurrency, "metadata": {"operation": "refine_ocr"}},
+            return_exceptions=True,
+        )
+        for idx, refined_result in zip(pending, refined_results):
+            if isinstance(refined_result, Exception):
+                errors[idx] = str(refined_result)
+            else:
+                refined_by_page[idx] = refined_result.model_dump()
+                image_cache.image_cache.set(self._refine_key(extracted_texts[idx].text), refined_by_page[idx])
+        if errors and len(errors) == len(extracted_texts):
+            raise OCRError(errors)
+
+        for idx in range(len(extracted_texts)):
+            if idx in errors:
+                # keep page order and report the failed page on its own
+                result.append({"date": "", "refined_text": "", "error": errors[idx]})
+            else:
+                result.append(refined_by_page[idx])
 
         return {
             "result": result
         }        
 
-    def extract_text_from_image(self, image_files):
-        extracted_texts = [] 
-        for image_file in image_files:
-            image_bytes = image_file.read()
-            image = vision.Image(content=image_bytes)
-
+    def _detect_document_text(self, image_bytes):
+        image = vision.Image(content=image_bytes)
+        with upstream_timer("vision", "document_text_detection"):
             response = self.ocr_client.document_text_detection(image=image)
 
-            if response.error.message:
-                raise Exception(f"Vision API Error: {response.error.message}")
-            
-            texts = response.full_text_annotation
-            extracted_texts.append(texts)
+        if response.error.message:
+            raise Exception(response.error.message)
+
+        return response.full_text_annotation
+
+    def _refine_key(self, ocr_text: str) -> str:
+        return image_cache.image_cache.make_key("refine", self.refine_model_name, REFINE_PROMPT_VERSION, ocr_text)
+
+    def _read_page(self, image_file, use_cache: bool):
+        """ OCR one page, or its cached text if the same image was read before """
+        image = image_cache.ImageKey(image_file)
+        text = image_cache.lookup("ocr", "vision", OCR_CACHE_VERSION, image, self.ocr_long_edge, use_cache=use_cache)
+        if text is not None:
+            return vision.TextAnnotation(text=text)
+        # read and shrunk in the worker, so only the pages being sent are in memory at once
+        annotation = self._detect_document_text(preprocess.prepare(image_file, self.ocr_long_edge).data)
+        image_cache.store("ocr", "vision", OCR_CACHE_VERSION, image, self.ocr_long_edge, value=annotation.text)
+        return annotation
+
+    def _safe_read_page(self, image_file, use_cache: bool):
+        try:
+            return self._read_page(image_file, use_cache)
+        except Exception as e:
+            return e
+
+    def extract_text_from_image(self, image_files, return_exceptions: bool = False, use_cache: bool = True):
+        """ OCR images concurrently. Results keep the input order.
+        With return_exceptions=True a failed image yields its exception in place,
+        otherwise OCRError reports every failed image by index.
+        """
+        extracted_texts = map_in_context(self.ocr_executor, lambda image_file: self._safe_read_page(image_file, use_cache), image_files)
+
+        if not return_exceptions:
+            errors = {idx: str(t) for idx, t in enumerate(extracted_texts) if isinstance(t, Exception)}
+            if errors:
+                raise OCRError(errors)
 
         return extracted_texts
     
-    def describe_image(self, image_file):
+    def describe_image(self, image_file, use_cache: bool = True):
         prompt = """
         You are helping an app that analyzes a single diary image input.
         Your task is to describe what kind of moment or situation the image represents,
@@ -115,15 +199,22 @@ class ImageService:
         - Avoid excessive imagination or details not clearly implied by the image.
         """
 
-        image_bytes = image_file.read()
-        image_b64 = base64.b64encode(image_bytes).decode("utf-8")
-        data_uri = f"data:image/jpeg;base64,{image_b64}"
+        image_key = image_cache.ImageKey(image_file)
+        cache_inputs = (self.describe_detail, self.describe_long_edge)
+        cached = image_cache.lookup("describe", self.image_model_name, DESCRIBE_PROMPT_VERSION, image_key, *cache_inputs, use_cache=use_cache)
+        if cached is not None:
+            return cached
+
+        # a small JPEG of the photo (its real MIME type if sent as is); the raw upload is never base64-encoded
+        image = preprocess.prepare(image_file, self.describe_long_edge)
 
         response = self.image_model.invoke([
             HumanMessage(content=[
                 {"type": "text", "text": prompt},
-                {"type": "image_url", "image_url": {'url': data_uri}}
+                {"type": "image_url", "image_url": {'url': image.data_uri(), 'detail': self.describe_detail}}
             ])
-        ])
+        ], config={"metadata": {"operation": "describe_image"}})
 
-        return response.content.strip()
\ No newline at end of file
+        description = response.content.strip()
+        image_cache.store("describe", self.image_model_name, DESCRIBE_PROMPT_VERSION, image_key, *cache_inputs, value=description)
+        return description
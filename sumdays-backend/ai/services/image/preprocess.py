@@ -0,0 +1,110 @@
+""" Image preprocessing before Vision OCR and the description model: smaller uploads, the right MIME type.
+
+Uploads are opened with Pillow (HEIC/HEIF too if pillow-heif is installed), turned upright
+from their EXIF orientation, shrunk to a long edge per use (OCR needs more pixels than a
+one-sentence description) and re-encoded as JPEG. JPEGs are decoded at reduced scale
+(draft mode) when they are much larger than the target, so a 12 MP phone photo is not fully
+decoded just to be shrunk. An upload already upright, within the long edge and in a format
+the upstreams take (JPEG, PNG, WebP, GIF) is sent as is.
+
+Anything Pillow cannot open is sent as uploaded, with a MIME type sniffed from its header.
+"""
+import io
+import logging
+import math
+import os
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Vision reads handwriting better with more pixels; ~2k on the long edge keeps small print legible
+OCR_LONG_EDGE = int(os.getenv("IMAGE_OCR_LONG_EDGE", "2048"))
+# "low" is a fixed 512x512 view of the image for 85 tokens; "high"/"auto" tile it at 170 tokens per 512px tile
+DESCRIBE_DETAIL = os.getenv("IMAGE_DESCRIBE_DETAIL", "low").lower()
+DESCRIBE_LONG_EDGE = int(os.getenv("IMAGE_DESCRIBE_LONG_EDGE", "512" if DESCRIBE_DETAIL == "low" else "1536"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+ORIENTATION_TAG = 0x0112
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+
+class PreparedImage:
+    """ Bytes to send upstream, their MIME type and pixel size (None if the upload was not decoded) """
+    def __init__(self, data: bytes, mime: str, size: tuple = None):
+        self.data = data
+        self.mime = mime
+        self.size = size
+
+    def data_uri(self) -> str:
+        import base64
+        return f"data:{self.mime};base64," + base64.b64encode(self.data).decode("ascii")
+
+
+def _as_file(source):
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+def sniff_mime(header: bytes) -> str:
+    """ MIME type from the first bytes of a file; JPEG if unknown """
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header.startswith(b"GIF8"):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[4:8] == b"ftyp" and header[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return "image/jpeg"
+
+def _original(file, mime: str = None, size: tuple = None) -> PreparedImage:
+    file.seek(0)
+    data = file.read()
+    return PreparedImage(data, mime or sniff_mime(data[:16]), size)
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """ RGB (or grayscale) for JPEG; transparency goes onto white, as the page would look """
+    if image.mode in ("RGB", "L"):
+        return image
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def prepare(source, long_edge: int) -> PreparedImage:
+    """ An upload (bytes or a seekable binary file) made upright, at most long_edge px on its long side """
+    file = _as_file(source)
+    try:
+        image = Image.open(file)
+        width, height = image.size
+        orientation = image.getexif().get(ORIENTATION_TAG, 1)
+        scale = long_edge / max(width, height)
+        if scale >= 1 and orientation == 1 and image.format in MIME_TYPES:
+            return _original(file, MIME_TYPES[image.format], image.size)
+
+        if scale < 1:
+            # JPEG only: decode at 1/2, 1/4 or 1/8 scale, never below the target size
+            image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+        image = ImageOps.exif_transpose(image)
+        if scale < 1:
+            image.thumbnail((long_edge, long_edge), Image.Resampling.LANCZOS)
+        image = _flatten(image)
+
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        return PreparedImage(out.getvalue(), "image/jpeg", image.size)
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        logger.info("image sent as uploaded: %s", e)
+        return _original(file)
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from .image_service import ImageService
+from ..common.metrics import record_error
+from ..common.response_cache import is_bypass
 
 image_service = ImageService()
 image_bp = Blueprint("image", __name__, url_prefix="/image")
@@ -20,10 +22,11 @@ def image_memo():
             return jsonify({"error": "Invalid analysis type."}), 400
         
         image_file = request.files["image"]
-        response = image_service.analyze(image_file, analysis_type)
+        response = image_service.analyze(image_file, analysis_type, use_cache=not is_bypass(request.headers))
         
         return jsonify(response), 200
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)}), 400
 
 @image_bp.route("/diary", methods=["POST"])
@@ -37,8 +40,9 @@ def image_diary():
         if not image_files:
             return jsonify({"error": "No image files uploaded."}), 400
         
-        response = image_service.detect_texts_from_diaries(image_files)
+        response = image_service.detect_texts_from_diaries(image_files, use_cache=not is_bypass(request.headers))
         
         return jsonify(response), 200
     except Exception as e:
+        record_error(e)
         return jsonify({"error": str(e)}), 400
\ No newline at end of file
@@ -0,0 +1,121 @@
+""" /merge routes for the async server (asgi.py): AsyncOpenAI streams, no thread held per request """
+import asyncio
+import logging
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from .merge_service import amerge_stream, amerge_diary, amerge_paragraph_stream, agenerate_mood
+from .routes import SPECULATIVE_MOOD, analysis_service, merge_response, event, stage_event, done_event
+from ..common.metrics import record_error
+from ..common.deadline import error_status
+from ..common.response_cache import is_bypass
+
+logger = logging.getLogger(__name__)
+
+def _memos(data):
+    return [m["content"] for m in sorted(data["memos"], key=lambda x: x["order"])]
+
+async def merge_memo(request: Request):
+    """ async POST /merge/ (same body and response as the Flask route) """
+    mood_task = None
+    try:
+        data = await request.json()
+        memos = _memos(data)
+        style_prompt = data["style_prompt"]
+        style_examples = data["style_examples"]
+
+        if data.get("speculative_mood", SPECULATIVE_MOOD):
+            mood_task = asyncio.create_task(agenerate_mood("\n\n".join(memos), style_prompt, style_examples))
+        diary = await amerge_diary(memos, style_prompt, style_examples)
+        if mood_task is None:
+            mood_task = asyncio.create_task(agenerate_mood(diary, style_prompt, style_examples))
+        result, mood = await asyncio.gather(analysis_service.aanalyze(diary), mood_task)
+
+        return JSONResponse(merge_response(data, diary, result, mood))
+
+    except Exception as e:
+        if mood_task is not None:
+            mood_task.cancel()
+        record_error(e, route="/merge/")
+        return JSONResponse({"error": str(e)}, status_code=error_status(e, 401))
+
+async def merge_memo_stream(request: Request):
+    """ async POST /merge/stream (NDJSON, same events as the Flask route) """
+    try:
+        data = await request.json()
+        memos = _memos(data)
+        style_prompt = data["style_prompt"]
+        style_examples = data["style_examples"]
+    except Exception as e:
+        record_error(e, route="/merge/stream")
+        return JSONResponse({"error": str(e)}, status_code=error_status(e))
+
+    async def generate():
+        usage = {"diary": {}, "analysis": {}, "mood": {}}
+        tasks = {}
+        try:
+            diary = ""
+            async for chunk in amerge_stream(memos, style_prompt, style_examples, usage=usage["diary"]):
+                content = chunk.choices[0].delta.content or ""
+                diary += content
+                yield event({"type": "diary", "delta": content})
+
+            tasks = {
+                asyncio.create_task(analysis_service.aanalyze(diary, usage=usage["analysis"])): "analysis",
+                asyncio.create_task(agenerate_mood(diary, style_prompt, style_examples, usage=usage["mood"])): "mood",
+            }
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield event(stage_event(tasks.pop(task), task.result()))
+            yield event(done_event(data, usage))
+        except Exception as e:
+            record_error(e, route="/merge/stream")
+            yield event({"type": "error", "error": str(e)})
+        finally:
+            # a client that hung up cancels the generator; stop the stages it no longer needs
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson; charset=utf-8")
+
+async def generate_mood_route(request: Request):
+    """ async POST /merge/mood """
+    try:
+        data = await request.json()
+        mood = await agenerate_mood(
+            data["diary"], data["style_prompt"], data["style_examples"], use_cache=not is_bypass(request.headers)
+        )
+        return JSONResponse({"mood": mood})
+
+    except Exception as e:
+        record_error(e, route="/merge/mood")
+        return JSONResponse({"error": str(e)}, status_code=error_status(e))
+
+async def merge_memo_paragraph(request: Request):
+    """ async POST /merge/paragraph (text/plain stream) """
+    try:
+        data = await request.json()
+        memos = _memos(data)
+        length_level = data["length_level"]
+        style_prompt = data["style_prompt"]
+        style_examples = data["style_examples"]
+
+        async def generate():
+            async for chunk in amerge_paragraph_stream(memos, style_prompt, style_examples, length_level=length_level):
+                content = chunk.choices[0].delta.content or ""
+                if content:
+                    yield content
+
+        return StreamingResponse(generate(), media_type="text/plain; charset=utf-8")
+
+    except Exception as e:
+        record_error(e, route="/merge/paragraph")
+        return JSONResponse({"error": str(e)}, status_code=error_status(e, 402))
+
+routes = [
+    Route("/merge/", merge_memo, methods=["POST"]),
+    Route("/merge/stream", merge_memo_stream, methods=["POST"]),
+    Route("/merge/mood", generate_mood_route, methods=["POST"]),
+    Route("/merge/paragraph", merge_memo_paragraph, methods=["POST"]),
+]
@@ -1,12 +1,28 @@
 # from sentence_transformers import SentenceTransformer
-import os, json #, re, math
+import os, json, time #, re, math
 # import numpy as np
-from openai import OpenAI
-
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-
-def merge_stream(memos, style_features, style_examples):
-
+from ..common.clients import get_openai_client, get_async_openai_client
+from ..common.usage import add_usage
+from ..common.response_cache import response_cache
+from ..common.metrics import upstream_timer, observe_ttft, observe_tokens
+from ..common import deadline
+
+# retries are left to deadline.call, which knows how much time the request has left
+client = get_openai_client().with_options(max_retries=0)
+# bump when the mood prompt changes, so cached moods are not reused
+MOOD_PROMPT_VERSION = "1"
+
+def merge_stream(memos, style_features, style_examples, usage=None):
+    """ Yield diary chunks; if a usage dict is given, the stream's token usage is added to it """
+    yield from _timed_stream("merge_stream", usage, **merge_request(memos, style_features, style_examples))
+
+async def amerge_stream(memos, style_features, style_examples, usage=None):
+    """ merge_stream on AsyncOpenAI """
+    async for chunk in _atimed_stream("merge_stream", usage, **merge_request(memos, style_features, style_examples)):
+        yield chunk
+
+def merge_request(memos, style_features, style_examples) -> dict:
+    """ chat.completions parameters of the diary merge (shared by the sync and async paths) """
     style_features_text, style_examples_text = prep(style_features, style_examples)
     paragraphs = "\n\n".join(f"<p>{m}</p>" for m in memos)
 
@@ -50,9 +66,8 @@ Merge the paragraphs into a complete diary entry with smooth transitions and con
     estimated_input_tokens = int(input_len * 0.35)
     max_tokens = estimated_input_tokens + 200
 
-    stream = client.chat.completions.create(
+    return dict(
         model=os.getenv("GPT_MODEL", "gpt-4.1-nano"),
-        stream=True,
         messages=[
             {"role": "developer", "content": developer_msg},
             {"role": "user",  "content": prompt},
@@ -61,14 +76,74 @@ Merge the paragraphs into a complete diary entry with smooth transitions and con
         max_tokens=max_tokens,
     )
 
-    for chunk in stream:
-        delta = chunk.choices[0].delta
-        text = delta.content or ""
-        if text:
-            yield chunk
+def _timed_stream(operation, usage=None, **params):
+    """ Stream chunks that carry text; records TTFT, stream duration and token usage """
+    start = time.perf_counter()
+    first = True
+    with upstream_timer("openai_chat", operation):
+        # retried until the stream opens; once tokens flow a failure is the client's to see
+        stream = deadline.call(operation, lambda timeout: client.chat.completions.create(
+            **params, stream=True, stream_options={"include_usage": True}, timeout=timeout
+        ), hedge=False)
+        try:
+            for chunk in stream:
+                if _text_chunk(chunk, params["model"], usage):
+                    if first:
+                        observe_ttft("openai_chat", operation, start)
+                        first = False
+                    yield chunk
+        finally:
+            # the client may hang up mid-stream; give the upstream connection back right away
+            stream.close()
+
+async def _atimed_stream(operation, usage=None, **params):
+    """ _timed_stream on AsyncOpenAI; the event loop is free while tokens arrive """
+    start = time.perf_counter()
+    first = True
+    with upstream_timer("openai_chat", operation):
+        async_client = get_async_openai_client().with_options(max_retries=0)
+        stream = await deadline.acall(operation, lambda timeout: async_client.chat.completions.create(
+            **params, stream=True, stream_options={"include_usage": True}, timeout=timeout
+        ), hedge=False)
+        try:
+            async for chunk in stream:
+                if _text_chunk(chunk, params["model"], usage):
+                    if first:
+                        observe_ttft("openai_chat", operation, start)
+                        first = False
+                    yield chunk
+        finally:
+            await stream.close()
+
+def _text_chunk(chunk, model, usage) -> bool:
+    # with include_usage the last chunk has no choices, only usage
+    if not chunk.choices:
+        add_usage(usage, chunk.usage)
+        observe_tokens(model, chunk.usage)
+        return False
+    return bool(chunk.choices[0].delta.content)
+
+def merge_diary(memos, style_features, style_examples, usage=None) -> str:
+    """ Run merge_stream to completion and return the whole diary """
+    diary = ""
+    for chunk in merge_stream(memos, style_features, style_examples, usage=usage):
+        diary += chunk.choices[0].delta.content or ""
+    return diary
+
+async def amerge_diary(memos, style_features, style_examples, usage=None) -> str:
+    diary = ""
+    async for chunk in amerge_stream(memos, style_features, style_examples, usage=usage):
+        diary += chunk.choices[0].delta.content or ""
+    return diary
 
 def merge_paragraph_stream(memos, style_features, style_examples, length_level=1):
+    yield from _timed_stream("merge_paragraph_stream", **paragraph_request(memos, style_features, style_examples, length_level))
 
+async def amerge_paragraph_stream(memos, style_features, style_examples, length_level=1):
+    async for chunk in _atimed_stream("merge_paragraph_stream", **paragraph_request(memos, style_features, style_examples, length_level)):
+        yield chunk
+
+def paragraph_request(memos, style_features, style_examples, length_level=1) -> dict:
     style_features_text, style_examples_text = prep(style_features, style_examples)
     memo_body = memos[0]
     memo_piece = memos[1]
@@ -132,9 +207,8 @@ Merge the base memo and the piece memo into a single diary paragraph that follow
 
     max_tokens = int(max(200, input_text_len * token_multiplier + 200))
 
-    stream = client.chat.completions.create(
+    return dict(
         model=os.getenv("GPT_MODEL", "gpt-4.1-nano"),
-        stream=True,
         messages=[
             {"role": "developer", "content": developer_msg},
             {"role": "user",  "content": prompt},
@@ -143,13 +217,43 @@ Merge the base memo and the piece memo into a single diary paragraph that follow
         max_tokens=max_tokens,
     )
 
-    for chunk in stream:
-        delta = chunk.choices[0].delta
-        text = delta.content or ""
-        if text:
-            yield chunk
+def _mood_cache_key(diary, style_features, style_examples) -> str:
+    model = os.getenv("GPT_MODEL", "gpt-4.1-nano")
+    return response_cache.make_key("mood", model, MOOD_PROMPT_VERSION, diary, style_features, style_examples)
+
+def generate_mood(diary: str, style_features, style_examples, usage=None, use_cache=True) -> str:
+    """ One pet-perspective sentence about the owner's mood; cached per diary and style """
+    return response_cache.get_or_compute(
+        _mood_cache_key(diary, style_features, style_examples),
+        lambda: _generate_mood(diary, style_features, style_examples, usage), use_cache=use_cache
+    )
+
+async def agenerate_mood(diary: str, style_features, style_examples, usage=None, use_cache=True) -> str:
+    key = _mood_cache_key(diary, style_features, style_examples)
+    mood = response_cache.get(key) if use_cache else None
+    if mood is None:
+        params = mood_request(diary, style_features, style_examples)
+        async_client = get_async_openai_client().with_options(max_retries=0)
+        with upstream_timer("openai_chat", "mood"):
+            response = await deadline.acall(
+                "mood", lambda timeout: async_client.chat.completions.create(**params, timeout=timeout)
+            )
+        mood = _mood_result(response, params["model"], usage)
+        response_cache.set(key, mood)
+    return mood
+
+def _generate_mood(diary: str, style_features, style_examples, usage=None) -> str:
+    params = mood_request(diary, style_features, style_examples)
+    with upstream_timer("openai_chat", "mood"):
+        response = deadline.call("mood", lambda timeout: client.chat.completions.create(**params, timeout=timeout))
+    return _mood_result(response, params["model"], usage)
+
+def _mood_result(response, model, usage) -> str:
+    add_usage(usage, response.usage)
+    observe_tokens(model, response.usage)
+    return response.choices[0].message.content.strip()
 
-def generate_mood(diary: str, style_features, style_examples) -> str:
+def mood_request(diary: str, style_features, style_examples) -> dict:
     style_features_text, style_examples_text = prep(style_features, style_examples)
 
     developer_msg = """
@@ -180,7 +284,7 @@ Rules:
 Write one sentence from the pet's perspective about the owner's emotional state today.
 """
 
-    response = client.chat.completions.create(
+    return dict(
         model=os.getenv("GPT_MODEL", "gpt-4.1-nano"),
         messages=[
             {"role": "developer", "content": developer_msg},
@@ -190,8 +294,6 @@ Write one sentence from the pet's perspective about the owner's emotional state
         max_tokens=120,
     )
 
-    return response.choices[0].message.content.strip()
-
 def prep(style_features, style_examples):
     if isinstance(style_features, dict):
         style_features_text = json.dumps(style_features, ensure_ascii=False, indent=2)
@@ -1,8 +1,19 @@
 from flask import Blueprint, request, jsonify, Response
-from .merge_service import merge_stream, merge_paragraph_stream, generate_mood
+from .merge_service import merge_stream, merge_diary, merge_paragraph_stream, generate_mood
+from ..common.usage import add_usage
+from ..common.response_cache import is_bypass
 from ..analysis.diary_service import DiaryAnalyzer
+from ..common.pipeline import Pipeline
+from ..common.metrics import record_error
+from ..common.deadline import error_status
+import logging
+import json
+import os
 
+logger = logging.getLogger(__name__)
 analysis_service = DiaryAnalyzer()
+# start mood generation from the raw memos while the diary is still being merged
+SPECULATIVE_MOOD = os.getenv("MERGE_SPECULATIVE_MOOD") == "1"
 merge_bp = Blueprint("merge", __name__, url_prefix="/merge")
 
 @merge_bp.route("/", methods=["POST"])
@@ -14,7 +25,8 @@ def merge_memo():
             {"content": "집에 와서 소개원실 실습과제나 했는데, 아침에 다짐한 덕분에 일찍 시작하니까 마음이 무척 편안하더라냥. 그런데 오늘은 또 닭다리 과자를 처음 먹어봤다냥! 와, 존맛이더라니까! 고양이처럼 새콤달콤한 냄새에 먼저 코를 킁킁 거렸는데, 한입 넣자마자 바로 눈이 반짝였어. 집사도 이렇게 맛있는 건 또 처음 본다며 웃던데, 나도 모르게 냥냥거릴 정도로 빠져들었지 뭐냐냥. 오늘 하루는 진짜 완전 꿀맛이었냥!", "order": 2},
         ],
         "style_prompt": {...},
-        "style_examples": {"adsf", "asdfaf", "FKSJD"}
+        "style_examples": {"adsf", "asdfaf", "FKSJD"},
+        "speculative_mood": false (optional, mood from memos while merging)
     \}
     """
     try:
@@ -22,36 +34,107 @@ def merge_memo():
         memos =  [m["content"] for m in sorted(data["memos"], key=lambda x: x["order"])]
         style_prompt = data["style_prompt"]
         style_examples = data["style_examples"]
+        speculative_mood = data.get("speculative_mood", SPECULATIVE_MOOD)
+
+        # analysis and mood only need the finished diary, so they run side by side
+        pipeline = Pipeline()
+        pipeline.add("diary", lambda: merge_diary(memos, style_prompt, style_examples))
+        pipeline.add("analysis", lambda diary: analysis_service.analyze(diary), deps=["diary"])
+        if speculative_mood:
+            pipeline.add("mood", lambda: generate_mood("\n\n".join(memos), style_prompt, style_examples))
+        else:
+            pipeline.add("mood", lambda diary: generate_mood(diary, style_prompt, style_examples), deps=["diary"])
+        stages, timings = pipeline.run()
+        logger.info("merge timings: %s", {name: round(t["seconds"], 3) for name, t in timings.items()})
+
+        return jsonify(merge_response(data, stages["diary"], stages["analysis"], stages["mood"])), 200
+
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), error_status(e, 401)
+    
+@merge_bp.route("/stream", methods=["POST"])
+def merge_memo_stream():
+    """ POST http://localhost:5001/merge/stream
+    same body as /merge/, response is NDJSON (application/x-ndjson), one event per line:
+    {"type": "diary", "delta": "오늘은..."}           (repeated while the diary is generated)
+    {"type": "analysis", "icon": "📖", "analysis": {"keywords": [...], "emotion_score": 0.6}}
+    {"type": "mood", "mood": "주인은..."}              (analysis/mood in whichever order they finish)
+    {"type": "done", "entry_date": ..., "user_id": ..., "usage": {"diary": {...}, "analysis": {...}, "mood": {...}, "total": {...}}}
+    {"type": "error", "error": "..."}                   (instead of the remaining events if a stage fails)
+    """
+    try:
+        data = request.get_json()
+        memos =  [m["content"] for m in sorted(data["memos"], key=lambda x: x["order"])]
+        style_prompt = data["style_prompt"]
+        style_examples = data["style_examples"]
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), error_status(e)
 
-        diary = ""
+    def generate():
+        usage = {"diary": {}, "analysis": {}, "mood": {}}
+        try:
+            diary = ""
+            for chunk in merge_stream(memos, style_prompt, style_examples, usage=usage["diary"]):
+                content = chunk.choices[0].delta.content or ""
+                diary += content
+                yield event({"type": "diary", "delta": content})
 
-        for chunk in merge_stream(memos, style_prompt, style_examples):
-            delta = chunk.choices[0].delta
-            content = delta.content or ""
-            if not content:
-                continue
-            diary += content
+            pipeline = Pipeline()
+            pipeline.add("analysis", lambda: analysis_service.analyze(diary, usage=usage["analysis"]))
+            pipeline.add("mood", lambda: generate_mood(diary, style_prompt, style_examples, usage=usage["mood"]))
+            for name, result, _ in pipeline.iter_run():
+                yield event(stage_event(name, result))
+            yield event(done_event(data, usage))
+        except Exception as e:
+            # headers are already sent, so the failure is reported in-band
+            record_error(e, route="/merge/stream")
+            yield event({"type": "error", "error": str(e)})
 
-        result = analysis_service.analyze(diary)
-        mood = generate_mood(diary, style_prompt, style_examples)
+    return Response(generate(), mimetype="application/x-ndjson; charset=utf-8")
 
-        response = {
-            "entry_date": data.get("entry_date"),
-            "user_id": data.get("user_id"),
-            "diary": diary,
+def merge_response(data, diary, result, mood):
+    """ /merge/ response body (shared with the async server) """
+    return {
+        "entry_date": data.get("entry_date"),
+        "user_id": data.get("user_id"),
+        "diary": diary,
+        "icon": result["emoji"],
+        "mood": mood,
+        "analysis": {
+            "keywords": result["keywords"],
+            "emotion_score": result["emotion_score"]
+        }
+    }
+
+def event(payload):
+    """ one NDJSON line of /merge/stream """
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+def stage_event(name, result):
+    if name == "analysis":
+        return {
+            "type": "analysis",
             "icon": result["emoji"],
-            "mood": mood,
             "analysis": {
                 "keywords": result["keywords"],
                 "emotion_score": result["emotion_score"]
             }
         }
+    return {"type": "mood", "mood": result}
 
-        return jsonify(response), 200
+def done_event(data, usage):
+    total = {}
+    for stage_usage in usage.values():
+        add_usage(total, stage_usage)
+    return {
+        "type": "done",
+        "entry_date": data.get("entry_date"),
+        "user_id": data.get("user_id"),
+        "usage": {**usage, "total": total}
+    }
 
-    except Exception as e:
-        return jsonify({"error": str(e)}), 401
-    
 @merge_bp.route("/mood", methods=["POST"])
 def generate_mood_route():
     """ POST http://localhost:5001/merge/mood
@@ -60,6 +143,7 @@ def generate_mood_route():
         "style_prompt": {...},
         "style_examples": ["...", "..."]
     \}
+    header X-Cache-Bypass: 1 skips the cached mood for this diary
     """
     try:
         data = request.get_json()
@@ -67,11 +151,12 @@ def generate_mood_route():
         style_prompt = data["style_prompt"]
         style_examples = data["style_examples"]
 
-        mood = generate_mood(diary, style_prompt, style_examples)
+        mood = generate_mood(diary, style_prompt, style_examples, use_cache=not is_bypass(request.headers))
         return jsonify({"mood": mood}), 200
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        record_error(e)
+        return jsonify({"error": str(e)}), error_status(e)
 
 @merge_bp.route("/paragraph", methods=["POST"])
 def merge_memo_paragraph():
@@ -104,4 +189,5 @@ def merge_memo_paragraph():
         return Response(generate(), mimetype="text/plain; charset=utf-8")
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 402
+        record_error(e)
+        return jsonify({"error": str(e)}), error_status(e, 402)
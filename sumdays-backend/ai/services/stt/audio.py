@@ -0,0 +1,205 @@
+""" Audio preprocessing before Whisper: smaller uploads, and long memos split for parallel transcription.
+
+WAV uploads are decoded (stdlib wave), downmixed to mono, resampled to 16 kHz (what Whisper
+works at anyway), trimmed of leading/trailing silence by a frame-energy VAD, and encoded as
+16 kHz mono FLAC (soundfile, if installed) or 16-bit PCM WAV. A 44.1 kHz stereo WAV shrinks
+~5.5x as WAV and more as FLAC. Memos longer than STT_CHUNK_SECONDS are cut at the quietest
+frame near each boundary, so words are not split between chunks.
+
+Formats the stdlib cannot decode (mp3, m4a, webm, ...) and anything that fails to decode
+are sent as uploaded, under their own file name so Whisper knows the format.
+"""
+import io
+import logging
+import os
+import shutil
+import wave
+from tempfile import SpooledTemporaryFile
+
+import numpy as np
+
+from ..common.uploads import SPOOL_BYTES
+
+logger = logging.getLogger(__name__)
+
+TARGET_RATE = 16000
+FRAME_SECONDS = 0.03
+# a frame is speech if its RMS is above this (dBFS)
+VAD_THRESHOLD_DB = float(os.getenv("STT_VAD_THRESHOLD_DB", "-45"))
+# silence kept around the speech so the first/last syllable is not clipped
+VAD_PADDING_SECONDS = float(os.getenv("STT_VAD_PADDING_SECONDS", "0.2"))
+CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "60"))
+# a chunk is cut at the quietest frame in its last CHUNK_SEARCH_SECONDS
+CHUNK_SEARCH_SECONDS = float(os.getenv("STT_CHUNK_SEARCH_SECONDS", "10"))
+ENCODING = os.getenv("STT_ENCODING", "flac").lower()
+
+try:
+    import soundfile
+except (ImportError, OSError):
+    soundfile = None
+
+
+class AudioChunk:
+    """ One upload for Whisper: encoded bytes (or the uploaded file itself) plus a file name whose extension names the format """
+    def __init__(self, data, name: str, seconds: float = None):
+        self.data = data
+        self.name = name
+        self.seconds = seconds
+
+    def upload(self) -> tuple:
+        """ (name, file) for the OpenAI client; httpx streams the file from its start """
+        if isinstance(self.data, bytes):
+            return self.name, io.BytesIO(self.data)
+        self.data.seek(0)
+        return self.name, self.data
+
+    def detach(self) -> "AudioChunk":
+        """ This chunk with its own copy of the uploaded file, for use after the request has closed it """
+        if isinstance(self.data, bytes):
+            return self
+        self.data.seek(0)
+        copy = SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        shutil.copyfileobj(self.data, copy)
+        copy.seek(0)
+        return AudioChunk(copy, self.name, self.seconds)
+
+    def close(self):
+        if not isinstance(self.data, bytes):
+            self.data.close()
+
+
+def _as_file(source):
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+def decode_wav(source):
+    """ (float32 samples in -1..1 with shape (frames, channels), sample rate), or None if not a PCM WAV.
+    source is bytes or a seekable binary file (left open).
+    """
+    try:
+        with wave.open(_as_file(source), "rb") as reader:
+            channels, width, rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+            raw = reader.readframes(reader.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        # 24-bit: sign-extend each little-endian triple into an int32
+        triples = np.frombuffer(raw[:len(raw) - len(raw) % 3], dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+        samples = np.where(ints >= 1 << 23, ints - (1 << 24), ints).astype(np.float32) / (1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        return None
+    frames = len(samples) // channels
+    return samples[:frames * channels].reshape(frames, channels), rate
+
+
+def to_mono_16k(samples: np.ndarray, rate: int) -> np.ndarray:
+    """ Downmix, then resample linearly (box-filtered first when downsampling, against aliasing) """
+    mono = samples.mean(axis=1) if samples.ndim == 2 else samples
+    if rate == TARGET_RATE or len(mono) == 0:
+        return mono.astype(np.float32)
+    if rate > TARGET_RATE:
+        width = int(round(rate / TARGET_RATE))
+        if width > 1:
+            mono = np.convolve(mono, np.ones(width) / width, mode="same")
+    count = int(len(mono) * TARGET_RATE / rate)
+    positions = np.arange(count) * (rate / TARGET_RATE)
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+
+def frame_energy(samples: np.ndarray, rate: int = TARGET_RATE) -> np.ndarray:
+    """ RMS level (dBFS) of each FRAME_SECONDS frame """
+    size = max(1, int(rate * FRAME_SECONDS))
+    frames = len(samples) // size
+    if frames == 0:
+        return np.full(1, -np.inf) if len(samples) == 0 else np.array([_db(np.sqrt(np.mean(samples ** 2)))])
+    rms = np.sqrt(np.mean(samples[:frames * size].reshape(frames, size) ** 2, axis=1))
+    return _db(rms)
+
+def _db(rms):
+    with np.errstate(divide="ignore"):
+        return 20 * np.log10(rms)
+
+
+def trim_silence(samples: np.ndarray, rate: int = TARGET_RATE) -> np.ndarray:
+    """ Cut leading and trailing silence; all-silent audio comes back empty """
+    size = max(1, int(rate * FRAME_SECONDS))
+    voiced = np.flatnonzero(frame_energy(samples, rate) > VAD_THRESHOLD_DB)
+    if voiced.size == 0:
+        return samples[:0]
+    pad = int(VAD_PADDING_SECONDS * rate)
+    start = max(0, voiced[0] * size - pad)
+    end = min(len(samples), (voiced[-1] + 1) * size + pad)
+    return samples[start:end]
+
+
+def split_on_silence(samples: np.ndarray, rate: int = TARGET_RATE, chunk_seconds: float = CHUNK_SECONDS) -> list:
+    """ Chunks of at most chunk_seconds, each cut at the quietest frame near its end """
+    size = max(1, int(rate * FRAME_SECONDS))
+    limit = int(chunk_seconds * rate)
+    if len(samples) <= limit:
+        return [samples]
+
+    energy = frame_energy(samples, rate)
+    search = max(size, int(min(CHUNK_SEARCH_SECONDS, chunk_seconds / 2) * rate))
+    chunks, start = [], 0
+    while len(samples) - start > limit:
+        first, last = (start + limit - search) // size, (start + limit) // size
+        cut = (first + int(np.argmin(energy[first:last]))) * size
+        chunks.append(samples[start:cut])
+        start = cut
+    chunks.append(samples[start:])
+    return chunks
+
+
+def encode(samples: np.ndarray, rate: int = TARGET_RATE):
+    """ (bytes, extension): FLAC when soundfile is available, else 16-bit PCM WAV """
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    if ENCODING == "flac" and soundfile is not None:
+        out = io.BytesIO()
+        soundfile.write(out, pcm, rate, format="FLAC", subtype="PCM_16")
+        return out.getvalue(), "flac"
+    out = io.BytesIO()
+    with wave.open(out, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(pcm.tobytes())
+    return out.getvalue(), "wav"
+
+
+def prepare(source, filename: str = None, chunk_seconds: float = CHUNK_SECONDS) -> list:
+    """ Upload (bytes or a seekable binary file) -> [AudioChunk] in playback order; [] if the recording is all silence.
+    An upload that is not decoded is passed on as is, without reading it into memory.
+    """
+    name = os.path.basename(filename or "") or "file.mp3"
+    if not os.path.splitext(name)[1]:
+        # e.g. a temp upload name; Whisper needs an extension, mp3 is what every upload used to be labelled
+        name += ".mp3"
+    decoded = decode_wav(source)
+    if decoded is None:
+        return [AudioChunk(source, name)]
+    try:
+        samples = trim_silence(to_mono_16k(*decoded))
+    except Exception as e:
+        # preprocessing is an optimization; Whisper can still read the original
+        logger.warning("audio preprocessing failed (%s), sending %s as uploaded", e, name)
+        return [AudioChunk(source, name)]
+    if len(samples) == 0:
+        return []
+
+    stem = os.path.splitext(name)[0]
+    chunks = []
+    for idx, chunk in enumerate(split_on_silence(samples, TARGET_RATE, chunk_seconds)):
+        encoded, extension = encode(chunk)
+        chunks.append(AudioChunk(encoded, f"{stem}_{idx}.{extension}", len(chunk) / TARGET_RATE))
+    return chunks
@@ -1,5 +1,7 @@
-from flask import Blueprint, request, jsonify
-from .stt_service import SpeechToTextService
+from flask import Blueprint, Response, request, jsonify
+from .stt_service import SpeechToTextService, join_texts
+from ..common.metrics import record_error
+import json
 
 stt_service = SpeechToTextService()
 stt_bp = Blueprint("stt", __name__, url_prefix="/stt")
@@ -20,4 +22,42 @@ def stt_memo():
         return jsonify({"transcribed_text": text}), 200
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
\ No newline at end of file
+        record_error(e)
+        return jsonify({"error": str(e)}), 400
+
+@stt_bp.route("/memo/stream", methods=["POST"])
+def stt_memo_stream():
+    """POST http://localhost:5001/stt/memo/stream
+    same form-data as /stt/memo, response is NDJSON (application/x-ndjson), one event per line:
+    {"type": "segment", "index": 1, "total": 4, "text": "..."}   (per audio chunk, in the order they finish)
+    {"type": "done", "transcribed_text": "..."}                    (all segments in playback order)
+    {"type": "error", "error": "..."}                              (instead of the remaining events if a chunk fails)
+    """
+    try:
+        if "audio" not in request.files:
+            return jsonify({"error": "No audio file uploaded."}), 400
+        # chunks start transcribing here, before the first byte of the response is sent
+        total, segments = stt_service.transcribe_stream(request.files["audio"])
+    except Exception as e:
+        record_error(e)
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        texts = [""] * total
+        try:
+            for idx, text in segments:
+                texts[idx] = text
+                # silent or filtered chunks have nothing to show
+                if text:
+                    yield event({"type": "segment", "index": idx, "total": total, "text": text})
+            yield event({"type": "done", "transcribed_text": join_texts(texts)})
+        except Exception as e:
+            # headers are already sent, so the failure is reported in-band
+            record_error(e, route="/stt/memo/stream")
+            yield event({"type": "error", "error": str(e)})
+
+    return Response(generate(), mimetype="application/x-ndjson; charset=utf-8")
+
+def event(payload):
+    """ one NDJSON line of /stt/memo/stream """
+    return json.dumps(payload, ensure_ascii=False) + "\n"
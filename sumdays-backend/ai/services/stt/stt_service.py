@@ -1,42 +1,86 @@
 import os
-import io
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ..common.clients import get_openai_client
+from ..common.metrics import upstream_timer
+from ..common.pipeline import map_in_context, submit
+from . import audio
+
+STT_MAX_WORKERS = int(os.getenv("STT_MAX_WORKERS", "8"))
+# shorter chunks when streaming: the first text shows up after one short Whisper call
+STT_STREAM_CHUNK_SECONDS = float(os.getenv("STT_STREAM_CHUNK_SECONDS", "15"))
+NO_SPEECH_THRESHOLD = 0.75
+
+# filter hallucination manually
+HALLUCINATIONS = [
+    "MBC 뉴스",
+    "시청해",
+    "구독",
+    "고맙습니다."
+]
 
 class SpeechToTextService:
     """ Service for converting audio to text using Whisper API. """
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, max_workers: int = STT_MAX_WORKERS, chunk_seconds: float = audio.CHUNK_SECONDS,
+                 stream_chunk_seconds: float = STT_STREAM_CHUNK_SECONDS):
+        self.client = get_openai_client()
         self.model = os.getenv("AUDIO_MODEL", "whisper-1")
+        self.chunk_seconds = chunk_seconds
+        self.stream_chunk_seconds = stream_chunk_seconds
+        # chunks of a long memo are separate Whisper requests, sent side by side
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stt")
 
     def transcribe(self, audio_file, language: str = "ko") -> str:
-        """ Transcribe an audio file using OpenAI Whisper API. """
-        audio_data = audio_file.read()
-        buffer = io.BytesIO(audio_data)
-        buffer.name = "file.mp3"
-
-        result = self.client.audio.transcriptions.create(
-            model=self.model,
-            file=buffer,
-            language=language,
-            response_format="verbose_json",
-        )
-
-        # check if file has no speech
-        if hasattr(result, 'segments') and result.segments:
-            avg_no_speech_prob = sum(s.no_speech_prob for s in result.segments) / len(result.segments)
-            if avg_no_speech_prob > 0.75:
-                return ""
-
-        # filter hallucination manually
-        temp_filter = [
-            "MBC 뉴스",
-            "시청해",
-            "구독",
-            "고맙습니다."
+        """ Transcribe an audio file using OpenAI Whisper API.
+        WAV is shrunk to trimmed 16 kHz mono first; a long memo is transcribed chunk by chunk in parallel.
+        """
+        chunks = audio.prepare(_stream(audio_file), getattr(audio_file, "filename", None), self.chunk_seconds)
+        if len(chunks) == 1:
+            return self._transcribe_chunk(chunks[0], language)
+        texts = map_in_context(self.executor, lambda chunk: self._transcribe_chunk(chunk, language), chunks)
+        return join_texts(texts)
+
+    def transcribe_stream(self, audio_file, language: str = "ko"):
+        """ Start transcribing every chunk now; returns (chunk count, iterator of (index, text) as each finishes) """
+        chunks = audio.prepare(_stream(audio_file), getattr(audio_file, "filename", None), self.stream_chunk_seconds)
+        # the response streams after the request has closed its upload, so a passed-through file is copied first
+        chunks = [chunk.detach() for chunk in chunks]
+        futures = {submit(self.executor, self._transcribe_detached, chunk, language): idx for idx, chunk in enumerate(chunks)}
+        return len(chunks), ((futures[future], future.result()) for future in as_completed(futures))
+
+    def _transcribe_detached(self, chunk: audio.AudioChunk, language: str) -> str:
+        try:
+            return self._transcribe_chunk(chunk, language)
+        finally:
+            chunk.close()
+
+    def _transcribe_chunk(self, chunk: audio.AudioChunk, language: str) -> str:
+        with upstream_timer("whisper", "transcribe"):
+            result = self.client.audio.transcriptions.create(
+                model=self.model,
+                file=chunk.upload(),
+                language=language,
+                response_format="verbose_json",
+            )
+
+        segments = getattr(result, "segments", None)
+        if not segments:
+            return "" if is_hallucination(result.text) else result.text
+
+        # gate each segment: a silent stretch or a hallucinated line drops only itself
+        kept = [
+            s.text for s in segments
+            if s.no_speech_prob <= NO_SPEECH_THRESHOLD and not is_hallucination(s.text)
         ]
+        return "".join(kept).strip()
+
+
+def _stream(audio_file):
+    """ An upload's (spooled, seekable) file, so it is not copied into memory; bytes for anything else """
+    stream = getattr(audio_file, "stream", None)
+    return stream if stream is not None else audio_file.read()
 
-        for s in temp_filter:
-            if s in result.text:
-                return ""
+def is_hallucination(text: str) -> bool:
+    return any(s in text for s in HALLUCINATIONS)
 
-        return result.text
+def join_texts(texts) -> str:
+    return " ".join(text.strip() for text in texts if text.strip())
@@ -6,6 +6,13 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
+# FAKE_UPSTREAM=1 runs the whole suite against benchmarks/fake_upstream.py instead of the live APIs
+if os.getenv("FAKE_UPSTREAM") == "1":
+    from ai.benchmarks.fake_upstream import serve_in_thread, FakeConfig
+    _fake_server, _fake_url = serve_in_thread(FakeConfig(latency=0.01, jitter=0, ttft=0.01, ocr_latency=0.01, stt_latency=0.01))
+    os.environ["OPENAI_BASE_URL"] = f"{_fake_url}/v1"
+    os.environ["VISION_API_ENDPOINT"] = _fake_url
+
 import pytest
 from ai.app import app
 
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+
+def _limiter(limit=1, queue_size=4, per_user=2, timeout=2.0):
+    from services.common.admission import UpstreamLimiter
+    return UpstreamLimiter("test", limit, queue_size=queue_size, max_queued_per_user=per_user, timeout=timeout)
+
+
+def _queue_in_thread(limiter, user, order):
+    def run():
+        limiter.acquire(user)
+        order.append(user)
+        limiter.release(0.0)
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+
+def _wait_queued(limiter, n):
+    for _ in range(200):
+        if limiter.queued == n:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"expected {n} queued, got {limiter.queued}")
+
+
+def test_waiters_are_served_round_robin_by_user():
+    limiter = _limiter(queue_size=8, per_user=4)
+    limiter.acquire("holder")
+    order = []
+    threads = []
+    for i, user in enumerate(["a", "a", "a", "b"]):
+        threads.append(_queue_in_thread(limiter, user, order))
+        _wait_queued(limiter, i + 1)
+
+    limiter.release(0.0)
+    for t in threads:
+        t.join(2)
+    # b queued last but is served right after a's first request
+    assert order == ["a", "b", "a", "a"]
+    assert limiter.in_use == 0 and limiter.queued == 0
+
+
+def test_full_queue_is_rejected_with_429_and_retry_after():
+    from services.common.admission import AdmissionRejected
+
+    limiter = _limiter(queue_size=1, per_user=1)
+    limiter.acquire("holder")
+    t = _queue_in_thread(limiter, "a", [])
+    _wait_queued(limiter, 1)
+
+    with pytest.raises(AdmissionRejected) as e:
+        limiter.acquire("b")
+    assert e.value.status == 429
+    assert e.value.reason == "queue_full"
+    assert e.value.retry_after >= 1
+
+    limiter.release(0.0)
+    t.join(2)
+
+
+def test_user_over_its_queue_share_is_rejected():
+    from services.common.admission import AdmissionRejected
+
+    limiter = _limiter(queue_size=8, per_user=1)
+    limiter.acquire("holder")
+    t = _queue_in_thread(limiter, "a", [])
+    _wait_queued(limiter, 1)
+
+    with pytest.raises(AdmissionRejected) as e:
+        limiter.acquire("a")
+    assert e.value.reason == "user_queue_full"
+
+    limiter.release(0.0)
+    t.join(2)
+
+
+def test_anonymous_requests_do_not_share_a_queue_share():
+    from services.common.admission import user_key
+
+    limiter = _limiter(queue_size=8, per_user=1)
+    limiter.acquire("holder")
+    # all anonymous calls come from the Node server's address; each one is its own user
+    threads = [_queue_in_thread(limiter, user_key(None), []) for _ in range(3)]
+    _wait_queued(limiter, 3)
+    assert user_key("7") == "7"
+
+    limiter.release(0.0)
+    for t in threads:
+        t.join(2)
+    assert limiter.in_use == 0 and limiter.queued == 0
+
+
+def test_waiting_too_long_gives_503_and_leaves_the_queue():
+    from services.common.admission import AdmissionRejected
+
+    limiter = _limiter(timeout=0.05)
+    limiter.acquire("holder")
+    with pytest.raises(AdmissionRejected) as e:
+        limiter.acquire("a")
+    assert e.value.status == 503
+    assert limiter.queued == 0
+
+    limiter.release(0.0)
+    assert limiter.in_use == 0
+
+
+def test_async_waiter_gets_slot_released_from_another_thread():
+    limiter = _limiter()
+    limiter.acquire("holder")
+
+    async def main():
+        task = asyncio.create_task(limiter.acquire_async("a"))
+        await asyncio.sleep(0.01)
+        assert limiter.queued == 1
+        threading.Timer(0.02, limiter.release, args=(0.0,)).start()
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(main())
+    assert limiter.in_use == 1 and limiter.queued == 0
+    limiter.release(0.0)
+
+
+def test_route_answers_429_with_retry_after_when_saturated(client, monkeypatch):
+    from services.common import admission, metrics
+
+    limiter = _limiter(limit=1, queue_size=0)
+    monkeypatch.setitem(admission.limiters, "chat", limiter)
+    limiter.acquire("someone")
+
+    before = metrics.admission_rejected.value(upstream="test", reason="queue_full")
+    res = client.post("/merge/mood", json={"diary": "x"}, headers={"X-User-Id": "7"})
+    assert res.status_code == 429
+    assert int(res.headers["Retry-After"]) >= 1
+    assert metrics.admission_rejected.value(upstream="test", reason="queue_full") == before + 1
+
+    limiter.release(0.0)
+
+
+def test_route_releases_its_slot(client, monkeypatch):
+    import services.merge.routes as merge_routes
+    from services.common import admission
+
+    limiter = _limiter(limit=1)
+    monkeypatch.setitem(admission.limiters, "chat", limiter)
+    monkeypatch.setattr(merge_routes, "generate_mood", lambda *a, **k: "주인은 즐거워 보였다.")
+
+    body = {"diary": "x", "style_prompt": {}, "style_examples": []}
+    for _ in range(3):
+        assert client.post("/merge/mood", json=body).status_code == 200
+    assert limiter.in_use == 0
@@ -0,0 +1,115 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("a2wsgi")
+from starlette.testclient import TestClient
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def _payload():
+    return {
+        "memos": [{"content": "점심은 친구와 먹었다.", "order": 2}, {"content": "아침으로 빵을 먹었다.", "order": 1}],
+        "style_prompt": {"tone": "담백함"},
+        "style_examples": ["오늘도 그냥 그런 하루였다."],
+        "entry_date": "2025-10-20",
+    }
+
+
+@pytest.fixture
+def async_client():
+    from ai.asgi import app
+    with TestClient(app) as client:
+        yield client
+
+
+def test_merge_stream_runs_on_async_route(async_client, monkeypatch):
+    import services.merge.async_routes as merge_async
+
+    async def fake_merge_stream(memos, style_prompt, style_examples, usage=None):
+        assert memos == ["아침으로 빵을 먹었다.", "점심은 친구와 먹었다."]
+        for piece in ["오늘은 ", "빵을 먹었다."]:
+            yield _chunk(piece)
+        usage.update({"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15})
+
+    async def fake_analyze(diary, usage=None):
+        return {"emoji": "🍞", "keywords": ["빵"], "emotion_score": 0.4}
+
+    async def fake_mood(diary, style_prompt, style_examples, usage=None):
+        assert diary == "오늘은 빵을 먹었다."
+        return "주인은 배불러 보였다."
+
+    monkeypatch.setattr(merge_async, "amerge_stream", fake_merge_stream)
+    monkeypatch.setattr(merge_async.analysis_service, "aanalyze", fake_analyze)
+    monkeypatch.setattr(merge_async, "agenerate_mood", fake_mood)
+
+    res = async_client.post("/merge/stream", json=_payload())
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+
+    events = [json.loads(line) for line in res.text.splitlines()]
+    assert [e["delta"] for e in events[:2]] == ["오늘은 ", "빵을 먹었다."]
+    assert sorted(e["type"] for e in events[2:4]) == ["analysis", "mood"]
+    assert events[-1]["type"] == "done"
+    assert events[-1]["usage"]["total"] == {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+def test_merge_error_keeps_sync_status_code(async_client, monkeypatch):
+    import services.merge.async_routes as merge_async
+    from services.common import metrics
+
+    before = metrics.http_requests.value(route="/merge/", method="POST", status=401)
+    res = async_client.post("/merge/", json={"memos": []})
+    assert res.status_code == 401
+    assert "error" in res.json()
+    assert metrics.http_requests.value(route="/merge/", method="POST", status=401) == before + 1
+
+
+def test_analysis_diary_runs_on_async_route(async_client, monkeypatch):
+    import services.analysis.async_routes as analysis_async
+
+    async def fake_analyze(diary, usage=None, use_cache=True):
+        assert use_cache is False
+        return {"emoji": "☕", "keywords": ["카페"], "emotion_score": 0.5, "integrated_analysis": "좋은 하루"}
+
+    monkeypatch.setattr(analysis_async.analyzer, "aanalyze", fake_analyze)
+    res = async_client.post("/analysis/diary", json={"diary": "카페에 갔다."}, headers={"X-Cache-Bypass": "1"})
+    assert res.status_code == 200
+    assert res.json()["icon"] == "☕"
+
+
+def test_analysis_week_past_deadline_is_504(async_client, monkeypatch):
+    import services.analysis.async_routes as analysis_async
+    from services.common import deadline
+
+    async def too_late(diaries, use_cache=True):
+        raise deadline.DeadlineExceeded("summarize_week")
+
+    monkeypatch.setattr(analysis_async.summary_service, "asummarize_week", too_late)
+    res = async_client.post("/analysis/week", json={"diaries": []})
+    assert res.status_code == 504
+    assert "error" in res.json()
+
+
+def test_other_routes_fall_back_to_flask(async_client):
+    assert async_client.get("/").json()["status"] == "AI Server Operational"
+    assert "response_cache" in async_client.get("/stats").json()
+    # wrong method on an async path is Flask's 405, not a crash
+    assert async_client.get("/merge/stream").status_code == 405
+
+
+def test_multipart_extract_style_falls_back_to_flask(async_client):
+    from ai.asgi import match_route
+
+    scope = {"type": "http", "method": "POST", "path": "/extract/style",
+             "headers": [(b"content-type", b"multipart/form-data; boundary=x")]}
+    assert match_route(scope)[0] is None
+    scope["headers"] = [(b"content-type", b"application/json")]
+    assert match_route(scope)[0].path == "/extract/style"
+
+    res = async_client.post("/extract/style", data={"diaries": json.dumps(["하나"])})
+    assert res.status_code == 400
@@ -0,0 +1,83 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def test_clients_are_shared():
+    from ai.services.common import clients
+
+    assert clients.get_openai_client() is clients.get_openai_client()
+    assert clients.get_chat_model("gpt-4.1-nano", 0.5) is clients.get_chat_model("gpt-4.1-nano", 0.5)
+    assert clients.get_chat_model("gpt-4.1-nano", 0.5) is not clients.get_chat_model("gpt-4.1-nano", 0.7)
+    # every OpenAI client rides on the one pooled http client
+    assert clients.get_openai_client()._client is clients.get_http_client()
+
+
+def test_shared_client_created_once_across_threads(monkeypatch):
+    from ai.services.common import clients
+
+    monkeypatch.setattr(clients, "_clients", {})
+    created = []
+    seen = []
+
+    def factory():
+        created.append(object())
+        return created[-1]
+
+    threads = [threading.Thread(target=lambda: seen.append(clients._shared("x", factory))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+    assert all(s is created[0] for s in seen)
+
+
+def test_pool_reuses_keepalive_connections():
+    from ai.services.common import clients
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        http = clients.get_http_client()
+        before = clients.pool_stats()["requests"]
+        for _ in range(3):
+            assert http.get(f"http://127.0.0.1:{server.server_port}/").text == "ok"
+        stats = clients.pool_stats()
+        assert stats["requests"] == before + 3
+        assert stats["idle_connections"] >= 1
+        assert stats["active_connections"] == 0
+    finally:
+        server.shutdown()
+
+
+def test_transport_falls_back_to_timeouts_without_the_httpcore_hook(monkeypatch, caplog):
+    import httpx
+    from types import SimpleNamespace
+    from ai.services.common import clients
+
+    # the pinned httpx/httpcore have the hook
+    transport = clients._abortable_transport(httpx.Limits())
+    assert isinstance(transport._pool._network_backend, clients._AbortableBackend)
+
+    class Reorganized(httpx.HTTPTransport):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._pool = SimpleNamespace()
+
+    monkeypatch.setattr(clients.httpx, "HTTPTransport", Reorganized)
+    with caplog.at_level("WARNING"):
+        transport = clients._abortable_transport(httpx.Limits())
+    assert isinstance(transport, Reorganized)
+    assert "losing hedges" in caplog.text
@@ -0,0 +1,241 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+
+@pytest.fixture
+def deadline(monkeypatch):
+    from services.common import deadline
+    monkeypatch.setattr(deadline, "latency", deadline.LatencyTracker())
+    monkeypatch.setattr(deadline, "HEDGE_DEFAULT_DELAY", 0.05)
+    monkeypatch.setattr(deadline, "RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(deadline, "hedge_budget", deadline.HedgeBudget(ratio=0.05, burst=5))
+    deadline.set_budget(None)
+    yield deadline
+    deadline.set_budget(None)
+
+
+def _timeout_error():
+    return openai.APITimeoutError(request=httpx.Request("POST", "http://upstream/v1/chat/completions"))
+
+
+def test_slow_call_is_hedged_and_duplicate_wins(deadline):
+    from services.common import metrics
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        time.sleep(0.5 if len(calls) == 1 else 0.01)
+        return len(calls)
+
+    hedges = metrics.upstream_hedges.value(operation="t_hedge")
+    start = time.perf_counter()
+    assert deadline.call("t_hedge", fn) == 2
+    assert time.perf_counter() - start < 0.3
+    assert metrics.upstream_hedges.value(operation="t_hedge") == hedges + 1
+    assert metrics.upstream_hedge_wins.value(operation="t_hedge") >= 1
+
+
+def test_fast_call_is_not_hedged(deadline):
+    calls = []
+    assert deadline.call("t_fast", lambda timeout: calls.append(timeout) or "ok") == "ok"
+    assert len(calls) == 1
+
+
+def test_unhedged_calls_run_in_the_callers_thread(deadline):
+    deadline.set_budget(2000)
+    threads = []
+    deadline.call("t_inline", lambda timeout: threads.append(threading.current_thread()), hedge=False)
+    assert threads == [threading.current_thread()]
+
+
+def test_time_queued_for_the_pool_does_not_trigger_a_hedge(deadline, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from services.common import metrics
+    monkeypatch.setattr(deadline, "_executor", ThreadPoolExecutor(max_workers=1))
+    busy = deadline._executor.submit(time.sleep, 0.2)
+    calls = []
+
+    hedges = metrics.upstream_hedges.value(operation="t_queued")
+    assert deadline.call("t_queued", lambda timeout: calls.append(timeout) or "ok") == "ok"
+    assert busy.done()
+    assert len(calls) == 1
+    assert metrics.upstream_hedges.value(operation="t_queued") == hedges
+
+
+def test_hedges_are_capped_by_the_budget(deadline, monkeypatch):
+    from services.common import metrics
+    monkeypatch.setattr(deadline, "hedge_budget", deadline.HedgeBudget(ratio=0.0, burst=1))
+
+    def fn(timeout):
+        time.sleep(0.1)
+        return "ok"
+
+    hedges = metrics.upstream_hedges.value(operation="t_budget_cap")
+    skipped = metrics.upstream_hedges_skipped.value(operation="t_budget_cap")
+    for _ in range(3):
+        assert deadline.call("t_budget_cap", fn) == "ok"
+    assert metrics.upstream_hedges.value(operation="t_budget_cap") == hedges + 1
+    assert metrics.upstream_hedges_skipped.value(operation="t_budget_cap") == skipped + 2
+
+
+def test_sync_loser_http_request_is_aborted(deadline):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from services.common import clients
+
+    class SlowFirst(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(2 if self.path == "/1" else 0.01)
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowFirst)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    http = httpx.Client(transport=clients._abortable_transport(httpx.Limits()))
+    calls, failed_at = [], []
+
+    def fn(timeout):
+        calls.append(timeout)
+        try:
+            return http.get(f"{url}/{len(calls)}", timeout=timeout).text + str(len(calls))
+        except httpx.HTTPError:
+            failed_at.append(time.perf_counter())
+            raise
+
+    try:
+        start = time.perf_counter()
+        assert deadline.call("t_abort", fn) == "ok2"
+        returned_at = time.perf_counter()
+        time.sleep(0.2)
+        # the primary's request was cut off when the duplicate won, not left running for 2 s
+        assert failed_at and failed_at[0] - returned_at < 0.2
+        assert returned_at - start < 0.5
+    finally:
+        server.shutdown()
+        http.close()
+
+
+def test_transient_errors_are_retried(deadline):
+    attempts = []
+
+    def fn(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise _timeout_error()
+        return "ok"
+
+    assert deadline.call("t_retry", fn, hedge=False) == "ok"
+    assert len(attempts) == 3
+
+
+def test_no_retry_when_backoff_does_not_fit_the_deadline(deadline, monkeypatch):
+    monkeypatch.setattr(deadline, "RETRY_BASE_DELAY", 10)
+    monkeypatch.setattr(deadline.random, "uniform", lambda a, b: b)
+    deadline.set_budget(500)
+    attempts = []
+
+    def fn(timeout):
+        attempts.append(timeout)
+        raise _timeout_error()
+
+    with pytest.raises(openai.APITimeoutError):
+        deadline.call("t_budget", fn, hedge=False)
+    assert len(attempts) == 1
+    assert attempts[0] <= 0.5
+
+
+def _slow_upstream(timeout):
+    # like the HTTP clients: the attempt gives up after its timeout
+    time.sleep(min(timeout, 1))
+    raise _timeout_error()
+
+
+def test_deadline_caps_the_wait(deadline):
+    deadline.set_budget(150)
+    start = time.perf_counter()
+    with pytest.raises(deadline.DeadlineExceeded):
+        deadline.call("t_deadline", _slow_upstream)
+    assert time.perf_counter() - start < 0.5
+
+    # hedged attempts run in the pool, so the caller stops at the deadline even if fn does not
+    deadline.set_budget(300)
+    start = time.perf_counter()
+    with pytest.raises(deadline.DeadlineExceeded):
+        deadline.call("t_deadline", lambda timeout: time.sleep(1))
+    assert time.perf_counter() - start < 0.5
+
+    deadline.set_budget(0)
+    with pytest.raises(deadline.DeadlineExceeded):
+        deadline.call("t_deadline", lambda timeout: "too late")
+
+
+def test_async_hedge_cancels_the_loser(deadline):
+    cancelled = []
+    calls = []
+
+    async def fn(timeout):
+        calls.append(timeout)
+        try:
+            await asyncio.sleep(0.5 if len(calls) == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(len(calls))
+            raise
+        return len(calls)
+
+    async def main():
+        result = await deadline.acall("t_ahedge", fn)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == 2
+    assert cancelled
+
+
+def test_pipeline_stages_see_the_request_context():
+    from services.common.pipeline import Pipeline
+    var = contextvars.ContextVar("test_var", default=None)
+    var.set("request-1")
+
+    results, _ = Pipeline().add("a", lambda: (var.get(), threading.current_thread().name)).run()
+    assert results["a"][0] == "request-1"
+    assert results["a"][1] != threading.current_thread().name
+
+
+def test_executor_work_sees_the_request_deadline(deadline):
+    from concurrent.futures import ThreadPoolExecutor
+    from services.common.pipeline import map_in_context, submit
+    executor = ThreadPoolExecutor(max_workers=2)
+    deadline.set_budget(500)
+
+    assert all(0 < r <= 0.5 for r in map_in_context(executor, lambda _: deadline.remaining(), range(4)))
+    assert 0 < submit(executor, deadline.remaining).result() <= 0.5
+    # a plain submit runs without it
+    assert executor.submit(deadline.remaining).result() is None
+
+
+def test_route_reads_deadline_header(client, monkeypatch):
+    import services.merge.routes as merge_routes
+    from services.common import deadline
+    seen = []
+
+    def fake_mood(*args, **kwargs):
+        seen.append(deadline.remaining())
+        return "주인은 바빠 보였다."
+
+    monkeypatch.setattr(merge_routes, "generate_mood", fake_mood)
+    body = {"diary": "x", "style_prompt": {}, "style_examples": []}
+    assert client.post("/merge/mood", json=body, headers={"X-Request-Deadline-Ms": "2000"}).status_code == 200
+    assert client.post("/merge/mood", json=body).status_code == 200
+    assert 1.0 < seen[0] <= 2.0
+    assert seen[1] is None
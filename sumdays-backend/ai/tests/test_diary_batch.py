@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+
+from ai.app import app
+import services.analysis.diary_service as diary_service
+from services.common import deadline
+from services.common.response_cache import ResponseCache, MemoryBackend
+
+
+class _FakeCompletions:
+    """ Answers a batch call for every id except those whose diary contains "skip" """
+    def __init__(self):
+        self.calls = []
+        self.remaining = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, response_format=None, **kwargs):
+        with self._lock:
+            self.calls.append(messages[-1]["content"])
+            self.remaining.append(deadline.remaining())
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self._lock:
+            self.in_flight -= 1
+
+        if response_format["type"] == "json_schema":
+            items = json.loads(messages[-1]["content"])
+            if any("fail" in item["diary"] for item in items):
+                raise RuntimeError("upstream error")
+            content = {"results": [
+                {"id": item["id"], "keywords": [item["diary"][:2]], "emoji": "🙂", "emotion_score": 0.5}
+                for item in items if "skip" not in item["diary"]
+            ]}
+        else:
+            content = {"keywords": ["single"], "emoji": "😐", "emotion_score": 0.0}
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(content)))], usage=None
+        )
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    completions = _FakeCompletions()
+    monkeypatch.setattr(diary_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(diary_service, "response_cache", ResponseCache(MemoryBackend(), ttl=60))
+    monkeypatch.setattr(diary_service, "BATCH_PACK_SIZE", 2)
+    monkeypatch.setattr(diary_service, "BATCH_MAX_CONCURRENCY", 3)
+    return completions
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def test_batch_packs_diaries_and_runs_packs_concurrently(fake, client):
+    diaries = [{"id": i, "diary": f"일기 {i}번"} for i in range(6)]
+    res = client.post("/analysis/diary/batch", json={"diaries": diaries})
+
+    assert res.status_code == 200
+    results = res.get_json()["results"]
+    assert [r["id"] for r in results] == list(range(6))
+    assert all(r["icon"] == "🙂" and r["analysis"]["emotion_score"] == 0.5 for r in results)
+    assert len(fake.calls) == 3
+    assert fake.max_in_flight > 1
+
+
+def test_batch_reports_errors_per_item_and_falls_back(fake, client):
+    diaries = [
+        {"id": "a", "diary": "평범한 하루"},
+        {"id": "b", "diary": "skip 된 일기"},
+        {"id": "c", "diary": "fail 하는 일기"},
+        {"id": "d", "diary": "   "},
+    ]
+    res = client.post("/analysis/diary/batch", json={"diaries": diaries})
+
+    assert res.status_code == 200
+    results = {r["id"]: r for r in res.get_json()["results"]}
+    assert results["a"]["icon"] == "🙂"
+    # left out of the batch answer -> answered by a single analyze call
+    assert results["b"]["analysis"]["keywords"] == ["single"]
+    assert results["c"]["error"] == "upstream error"
+    assert "error" in results["d"]
+
+
+def test_malformed_entry_fails_only_itself(fake, client):
+    res = client.post("/analysis/diary/batch", json={"diaries": [{"id": 1, "diary": "평범한 하루"}, "일기", None]})
+
+    assert res.status_code == 200
+    results = res.get_json()["results"]
+    assert results[0]["icon"] == "🙂"
+    assert results[1]["id"] is None and "error" in results[1]
+    assert results[2]["id"] is None and "error" in results[2]
+
+
+def test_repeated_diary_is_analyzed_once(fake, client):
+    diaries = [{"id": 1, "diary": "같은 일기"}, {"id": 2, "diary": "다른 일기"}, {"id": 3, "diary": "같은  일기 "}]
+    res = client.post("/analysis/diary/batch", json={"diaries": diaries}, headers={"X-Cache-Bypass": "1"})
+
+    results = res.get_json()["results"]
+    assert [r["id"] for r in results] == [1, 2, 3]
+    assert results[0]["analysis"] == results[2]["analysis"]
+    sent = [item["diary"] for call in fake.calls for item in json.loads(call)]
+    assert len(sent) == 2 and set(sent) == {"같은 일기", "다른 일기"}
+
+
+def test_packs_in_flight_are_capped_per_request(fake, client, monkeypatch):
+    monkeypatch.setattr(diary_service, "BATCH_MAX_CONCURRENCY", 2)
+    diaries = [{"id": i, "diary": f"일기 {i}번"} for i in range(10)]
+    assert client.post("/analysis/diary/batch", json={"diaries": diaries}).status_code == 200
+    assert len(fake.calls) == 5
+    assert fake.max_in_flight == 2
+
+
+def test_batch_reuses_cached_analyses(fake, client):
+    diaries = [{"id": 1, "diary": "캐시될 일기"}]
+    client.post("/analysis/diary/batch", json={"diaries": diaries})
+    client.post("/analysis/diary/batch", json={"diaries": diaries})
+    assert len(fake.calls) == 1
+
+    client.post("/analysis/diary/batch", json={"diaries": diaries}, headers={"X-Cache-Bypass": "1"})
+    assert len(fake.calls) == 2
+
+
+def test_batch_requires_diaries(client):
+    res = client.post("/analysis/diary/batch", json={"diaries": []})
+    assert res.status_code == 400
+
+
+def test_batch_packs_run_within_the_request_deadline(fake):
+    deadline.set_budget(500)
+    try:
+        diary_service.DiaryAnalyzer().analyze_batch(["일기 1", "일기 2", "일기 3"])
+    finally:
+        deadline.set_budget(None)
+    assert len(fake.remaining) == 2
+    assert all(r is not None and 0 < r <= 0.5 for r in fake.remaining)
+
+
+def test_batch_past_its_deadline_is_504(fake, client):
+    try:
+        res = client.post("/analysis/diary/batch", json={"diaries": [{"id": 1, "diary": "늦은 일기"}]},
+                          headers={"X-Request-Deadline-Ms": "1"})
+    finally:
+        # the test client runs the request in this thread
+        deadline.set_budget(None)
+    assert res.status_code == 504
+    assert fake.calls == []
@@ -0,0 +1,93 @@
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    from services.analysis import diary_render
+    # deterministic and offline: the utf-8 byte estimate instead of tiktoken
+    monkeypatch.setattr(diary_render, "_encoding", False)
+
+
+def _week():
+    return [
+        {"date": "2025-10-13", "diary": "  오늘은   지각했다.\n팀장님께 혼났다.  ", "emoji": "😞", "emotion_score": -0.8},
+        {"date": "2025-10-14", "diary": "평범한 하루였다. 음악을 들으며 생각을 정리했다.", "emoji": "☕", "emotion_score": 0},
+        {"date": "2025-10-15", "diary": "평범한 하루였다. 동료 덕분에 마감을 지켰다.", "emoji": "🤝", "emotion_score": 0.5},
+    ]
+
+
+def test_one_compact_line_per_day():
+    from services.analysis.diary_render import render_diaries
+
+    lines = render_diaries(_week()).splitlines()
+    assert lines[0] == "2025-10-13 | -0.8 | 오늘은 지각했다. 팀장님께 혼났다."
+    assert lines[1] == "2025-10-14 | +0.0 | 평범한 하루였다. 음악을 들으며 생각을 정리했다."
+    # the repeated sentence is sent once
+    assert lines[2] == "2025-10-15 | +0.5 | 동료 덕분에 마감을 지켰다."
+    assert "😞" not in render_diaries(_week())
+
+
+def test_missing_fields_and_empty_diaries():
+    from services.analysis.diary_render import render_diaries
+
+    text = render_diaries([{"diary": "비가 왔다."}, {"date": "2025-10-14", "diary": "   "}])
+    assert text == "? | ? | 비가 왔다.\n2025-10-14 | ? |"
+
+
+def test_fully_repeated_day_keeps_its_date_and_score():
+    from services.analysis.diary_render import render_diaries
+
+    week = [
+        {"date": "2025-10-13", "diary": "평범한 하루였다.", "emotion_score": 0.1},
+        {"date": "2025-10-14", "diary": "평범한 하루였다.", "emotion_score": -0.6},
+    ]
+    assert render_diaries(week).splitlines() == ["2025-10-13 | +0.1 | 평범한 하루였다.", "2025-10-14 | -0.6 |"]
+    assert render_diaries(week, token_budget=1).splitlines()[1] == "2025-10-14 | -0.6 |"
+
+
+def test_budget_drops_least_informative_sentences_first():
+    from services.analysis.diary_render import count_tokens, render_diaries
+
+    week = [
+        {"date": "2025-10-13", "diary": "그냥 그런 하루였다. 발표에서 칭찬을 받아 뿌듯했다.", "emotion_score": 0.6},
+        {"date": "2025-10-14", "diary": "그냥 그런 날이었다. 동생과 다퉈서 속상했다.", "emotion_score": -0.4},
+        {"date": "2025-10-15", "diary": "그냥 그런 하루. 새 운동화를 샀다.", "emotion_score": 0.2},
+    ]
+    full = render_diaries(week)
+    budget = count_tokens(full) - 10
+    trimmed = render_diaries(week, budget)
+
+    assert count_tokens(trimmed) <= budget
+    assert "그냥 그런" not in trimmed
+    assert "발표에서 칭찬을 받아 뿌듯했다." in trimmed
+    assert len(trimmed.splitlines()) == 3
+
+
+def test_budget_keeps_one_sentence_per_day():
+    from services.analysis.diary_render import render_diaries
+
+    lines = render_diaries(_week(), token_budget=1).splitlines()
+    assert len(lines) == 3
+    assert all(line.split(" | ")[2].count(".") == 1 for line in lines)
+
+
+def test_summarize_week_sends_rendered_diaries(monkeypatch):
+    from services.analysis import summary_service as module
+
+    captured = {}
+
+    def render(inputs):
+        captured.update(inputs)
+        return inputs
+
+    def answer(prompt, timeout=None):
+        return module.SummaryWeekResult(
+            title="t", overview="o", emerging_topics=["a"],
+            highlights=[], emotion_cycle="c", advice="a",
+        )
+
+    service = module.SummaryService()
+    monkeypatch.setattr(service, "_week_chain", lambda diaries: (RunnableLambda(render), RunnableLambda(answer)))
+    service.summarize_week(_week())
+    assert captured["diaries"].splitlines()[0] == "2025-10-13 | -0.8 | 오늘은 지각했다. 팀장님께 혼났다."
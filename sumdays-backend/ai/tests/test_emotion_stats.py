@@ -0,0 +1,35 @@
+import pytest
+
+from ai.services.analysis.emotion_stats import week_statistics
+
+
+def test_distribution_mean_and_modal_emoji():
+    stats = week_statistics([
+        {"date": "2025-10-13", "emoji": "😞", "emotion_score": -0.8},
+        {"date": "2025-10-14", "emoji": "🙂", "emotion_score": 0.2},
+        {"date": "2025-10-15", "emoji": "😞", "emotion_score": -0.2},
+        {"date": "2025-10-16", "emoji": "😊", "emotion_score": 0.6},
+        {"date": "2025-10-17", "emoji": "🙂"},
+    ])
+    assert stats["distribution"] == {"positive": 1, "neutral": 2, "negative": 1}
+    assert stats["emotion_score"] == pytest.approx(-0.05)
+    # 😞 and 🙂 tie; the one written first wins
+    assert stats["dominant_emoji"] == "😞"
+
+
+@pytest.mark.parametrize("scores, trend", [
+    ([-0.6, -0.2, 0.1, 0.5], "increasing"),
+    ([0.7, 0.3, 0.0, -0.4], "decreasing"),
+    ([0.3, 0.2, 0.3, 0.2], "stable"),
+    ([0.5], "stable"),
+])
+def test_trend_is_the_slope_over_days(scores, trend):
+    diaries = [{"date": f"2025-10-{13 + 2 * i}", "emotion_score": s} for i, s in enumerate(scores)]
+    assert week_statistics(diaries)["trend"] == trend
+
+
+def test_without_dates_or_emojis():
+    stats = week_statistics([{"emotion_score": -0.5}, {"emotion_score": "?"}, {"emotion_score": -0.5}])
+    assert stats["trend"] == "stable"
+    assert stats["dominant_emoji"] == "😔"
+    assert week_statistics([])["emotion_score"] == 0.0
@@ -121,3 +121,131 @@ def test_extract_style_route_with_images(client):
     )
 
     assert response.status_code in (200, 400)
+
+
+def _counting_encoder(calls):
+    def encode(sentences):
+        calls.append(list(sentences))
+        return np.array([[float(len(s)), 1.0] for s in sentences])
+    return encode
+
+
+def test_embedding_cache_encodes_only_misses():
+    from ai.services.extract.embedding_cache import EmbeddingCache
+    cache = EmbeddingCache("test-model", max_items=10)
+    calls = []
+    encode = _counting_encoder(calls)
+
+    first = cache.embed(["오늘은 좋은 날", "밥을 먹었다", "오늘은 좋은 날"], encode)
+    second = cache.embed(["밥을  먹었다 ", "새 문장"], encode)
+
+    assert calls == [["오늘은 좋은 날", "밥을 먹었다"], ["새 문장"]]
+    assert np.allclose(first[1], second[0])
+    stats = cache.stats()
+    assert stats["misses"] == 3
+    assert stats["hits"] == 2
+
+
+def test_embedding_cache_lru_and_disk_tier(tmp_path):
+    from ai.services.extract.embedding_cache import EmbeddingCache
+    db = str(tmp_path / "emb.sqlite")
+    cache = EmbeddingCache("test-model", max_items=1, disk_path=db, disk_max_items=2)
+    calls = []
+    encode = _counting_encoder(calls)
+
+    cache.embed(["a"], encode)
+    cache.embed(["bb"], encode)
+    assert cache.stats()["memory_items"] == 1
+
+    # evicted from memory, still on disk
+    cache.embed(["a"], encode)
+    assert calls == [["a"], ["bb"]]
+    assert cache.stats()["disk_hits"] == 1
+
+    # a fresh process (new cache object) reuses the disk tier
+    other = EmbeddingCache("test-model", max_items=1, disk_path=db, disk_max_items=2)
+    other.embed(["bb"], encode)
+    assert calls == [["a"], ["bb"]]
+
+    # a different model never shares vectors
+    EmbeddingCache("other-model", disk_path=db).embed(["a"], encode)
+    assert calls[-1] == ["a"]
+
+
+def test_embedding_disk_tier_is_opened_per_process(tmp_path, monkeypatch):
+    import os
+    from ai.services.common import response_cache
+    from ai.services.extract.embedding_cache import EmbeddingCache
+    cache = EmbeddingCache("test-model", disk_path=str(tmp_path / "emb.sqlite"))
+    calls = []
+    cache.embed(["a"], _counting_encoder(calls))
+    inherited = cache._disk._conn
+
+    forked_pid = os.getpid() + 1
+    monkeypatch.setattr(response_cache.os, "getpid", lambda: forked_pid)
+    cache._memory.clear()
+    cache.embed(["a"], _counting_encoder(calls))
+    assert cache._disk._conn is not inherited
+    assert calls == [["a"]]
+
+
+def test_embed_style_inputs_single_encode_matches_two_pass(monkeypatch):
+    import ai.services.extract.extract_service as es
+    from ai.services.extract.embedding_cache import EmbeddingCache
+
+    rng = np.random.default_rng(0)
+    table = {}
+    calls = []
+
+    def fake_encode(sentences):
+        calls.append(list(sentences))
+        return es.l2norm(np.stack([table.setdefault(s, rng.normal(size=8)) for s in sentences]))
+
+    monkeypatch.setattr(es, "_encode", fake_encode)
+    diaries = [
+        "오늘 아침에 밥을 먹었다. 학교에 일찍 도착했다.\n오후에는 과제를 오래 했다.",
+        "점심엔 김밥을 먹었다. 오후에는 도서관에서 공부했다.",
+        "",
+        "밤에는 산책을 나갔다. 바람이 꽤 시원하게 불었다.",
+    ]
+
+    monkeypatch.setattr(es, "embedding_cache", EmbeddingCache("fake"))
+    vector, examples = es.embed_style_inputs(diaries, n=2)
+    assert len(calls) == 1
+
+    # reference: the per-diary path with its own cold cache
+    monkeypatch.setattr(es, "embedding_cache", EmbeddingCache("fake"))
+    ref_vecs = np.stack([es.diary_embedding(d) for d in diaries if d.strip()])
+    ref_vector = es.l2norm(ref_vecs.mean(axis=0, keepdims=True))[0]
+    assert np.allclose(vector, ref_vector, atol=1e-5)
+    assert examples == es.extract_style_examples(diaries, ref_vector, n=2)
+
+
+def test_segment_mean():
+    from ai.services.extract.extract_service import segment_mean
+    E = np.arange(12, dtype=np.float32).reshape(6, 2)
+    out = segment_mean(E, [1, 2, 3])
+    assert np.allclose(out, [E[0], E[1:3].mean(axis=0), E[3:].mean(axis=0)])
+
+
+def test_extract_style_overlaps_profile_and_embedding(monkeypatch):
+    import time
+    import ai.services.extract.extract_service as es
+
+    def slow_profile(diaries):
+        time.sleep(0.3)
+        return {"tone": "담백함"}
+
+    def slow_embed(diaries, n=4):
+        time.sleep(0.3)
+        return [0.0, 1.0], ["예시 문장입니다"]
+
+    monkeypatch.setattr(es, "compute_style_profile_text", slow_profile)
+    monkeypatch.setattr(es, "embed_style_inputs", slow_embed)
+
+    start = time.perf_counter()
+    result = es.extract_style(["일기"] * 5)
+    elapsed = time.perf_counter() - start
+
+    assert result == {"style_vector": [0.0, 1.0], "style_examples": ["예시 문장입니다"], "style_prompt": {"tone": "담백함"}}
+    assert elapsed < 0.5
@@ -0,0 +1,96 @@
+import io
+import json
+import statistics
+import time
+
+import httpx
+import openai
+import pytest
+from pydantic import BaseModel, Field
+
+from ai.benchmarks.fake_upstream import serve_in_thread, FakeConfig, sample_delay
+from ai.services.common.clients import _vision_rest_client
+from ai.services.image.image_service import ImageService
+
+
+@pytest.fixture(scope="module")
+def fake():
+    config = FakeConfig(latency=0.01, jitter=0, ttft=0.05, tokens_per_sec=2000, ocr_latency=0.01, stt_latency=0.01)
+    server, base_url = serve_in_thread(config)
+    yield config, base_url
+    server.shutdown()
+
+
+@pytest.fixture
+def openai_client(fake):
+    return openai.OpenAI(api_key="sk-fake", base_url=f"{fake[1]}/v1", max_retries=0)
+
+
+def test_chat_json_schema_and_json_object(openai_client):
+    from ai.services.analysis.diary_service import BATCH_RESPONSE_FORMAT
+    res = openai_client.chat.completions.create(
+        model="gpt-4.1-nano", messages=[{"role": "user", "content": "[]"}], response_format=BATCH_RESPONSE_FORMAT
+    )
+    item = json.loads(res.choices[0].message.content)["results"][0]
+    assert set(item) == {"id", "keywords", "emoji", "emotion_score"}
+    assert res.usage.total_tokens > 0
+
+    res = openai_client.chat.completions.create(
+        model="gpt-4.1-nano", response_format={"type": "json_object"},
+        messages=[{"role": "developer", "content": '- "keywords": list\n- "emotion_score": float'}],
+    )
+    assert json.loads(res.choices[0].message.content) == {"keywords": ["산책", "친구"], "emotion_score": 0.4}
+
+
+def test_stream_ttft_and_usage(fake, openai_client):
+    start = time.perf_counter()
+    stream = openai_client.chat.completions.create(
+        model="gpt-4.1-nano", stream=True, max_tokens=50, stream_options={"include_usage": True},
+        messages=[{"role": "user", "content": "메모"}],
+    )
+    chunks = list(stream)
+    assert chunks[0].choices and time.perf_counter() - start >= fake[0].ttft
+    assert "".join(c.choices[0].delta.content or "" for c in chunks if c.choices)
+    assert not chunks[-1].choices and chunks[-1].usage.completion_tokens > 0
+
+
+def test_structured_output_through_langchain(fake):
+    from langchain_openai import ChatOpenAI
+
+    class Result(BaseModel):
+        date: str = Field(description="date")
+        keywords: list[str] = Field(description="keywords")
+
+    llm = ChatOpenAI(model="gpt-4.1-nano", api_key="sk-fake", base_url=f"{fake[1]}/v1", max_retries=0)
+    result = llm.with_structured_output(Result).invoke("일기")
+    assert result.date == "2025-10-25" and len(result.keywords) == 2
+
+
+def test_error_injection(fake, openai_client):
+    config = fake[0]
+    config.update({"error_rate": 1.0, "error_status": 429})
+    try:
+        with pytest.raises(openai.RateLimitError):
+            openai_client.chat.completions.create(model="m", messages=[{"role": "user", "content": "x"}])
+    finally:
+        config.update({"error_rate": 0.0})
+    stats = httpx.get(f"{fake[1]}/_fake/stats").json()
+    assert stats["errors"] >= 1
+
+
+def test_transcription_and_vision(fake, openai_client):
+    buffer = io.BytesIO(b"RIFF" + b"\0" * 64000)
+    buffer.name = "memo.wav"
+    result = openai_client.audio.transcriptions.create(model="whisper-1", file=buffer, response_format="verbose_json")
+    assert result.text and result.segments[0].no_speech_prob < 0.75
+
+    service = ImageService(ocr_client=_vision_rest_client(fake[1]))
+    texts = service.extract_text_from_image([io.BytesIO(b"page-1"), io.BytesIO(b"page-22")])
+    assert [t.text.endswith(f"({n} bytes)") for t, n in zip(texts, (6, 7))] == [True, True]
+
+
+def test_lognormal_latency_keeps_mean_with_a_tail():
+    samples = [sample_delay(0.2, 0.1, "lognormal") for _ in range(20000)]
+    assert statistics.mean(samples) == pytest.approx(0.2, rel=0.05)
+    assert max(samples) > 0.5
+    assert sample_delay(0.2, 0.1, "fixed") == 0.2
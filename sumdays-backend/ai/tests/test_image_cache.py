@@ -0,0 +1,140 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+from langchain_core.runnables import RunnableLambda
+
+from ai.services.common.response_cache import MemoryBackend, SQLiteBackend
+from ai.services.image import image_cache
+from ai.services.image.image_service import ImageService
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(image_cache.image_cache, "backend", MemoryBackend())
+    monkeypatch.setattr(image_cache, "near_duplicates", image_cache.NearDuplicateIndex(100))
+
+
+class CountingVision:
+    def __init__(self):
+        self.calls = 0
+
+    def document_text_detection(self, image):
+        self.calls += 1
+        return SimpleNamespace(error=SimpleNamespace(message=""),
+                               full_text_annotation=SimpleNamespace(text=f"{len(image.content)} bytes"))
+
+
+def service_with(vision: CountingVision, refined: list) -> ImageService:
+    service = ImageService(ocr_client=vision)
+
+    def fake_refine(inputs):
+        refined.append(inputs["ocr_extracted_diary"])
+        return SimpleNamespace(model_dump=lambda: {"date": "XXXX-10-06", "refined_text": inputs["ocr_extracted_diary"]})
+
+    service.refine_chain = RunnableLambda(fake_refine)
+    return service
+
+
+def photo(quality: int = 90) -> bytes:
+    image = Image.new("RGB", (640, 480))
+    image.putdata([(x % 256, y % 256, (x * y) % 256) for y in range(480) for x in range(640)])
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def test_repeat_upload_skips_vision_and_refinement():
+    pages = [b"page one", b"page two"]
+    vision, refined = CountingVision(), []
+    # /image/diary and /extract/style have their own ImageService; the cache is shared
+    first = service_with(vision, refined).detect_texts_from_diaries([io.BytesIO(p) for p in pages])
+    again = service_with(vision, refined).detect_texts_from_diaries([io.BytesIO(p) for p in pages])
+
+    assert again == first
+    assert vision.calls == 2 and len(refined) == 2
+
+    service_with(vision, refined).detect_texts_from_diaries([io.BytesIO(p) for p in pages], use_cache=False)
+    assert vision.calls == 4 and len(refined) == 4
+
+
+def test_refinement_is_shared_by_images_with_the_same_text():
+    vision, refined = CountingVision(), []
+    service = service_with(vision, refined)
+
+    service.detect_texts_from_diaries([io.BytesIO(b"aaaa")])
+    service.detect_texts_from_diaries([io.BytesIO(b"bbbb")])  # another image, same OCR text ("4 bytes")
+
+    assert vision.calls == 2
+    assert refined == ["4 bytes"]
+
+
+def test_description_is_cached_by_content():
+    calls = []
+    service = ImageService(ocr_client=CountingVision())
+    service.image_model = SimpleNamespace(invoke=lambda messages, config: calls.append(1) or SimpleNamespace(content="a walk"))
+
+    assert service.describe_image(io.BytesIO(photo())) == "a walk"
+    assert service.describe_image(io.BytesIO(photo())) == "a walk"
+    assert len(calls) == 1
+
+
+def test_near_duplicate_description_is_matched_only_when_enabled(monkeypatch):
+    original, recompressed = photo(90), photo(60)
+    assert original != recompressed
+    calls = []
+    service = ImageService(ocr_client=CountingVision())
+    service.image_model = SimpleNamespace(invoke=lambda messages, config: calls.append(1) or SimpleNamespace(content="a walk"))
+
+    service.describe_image(io.BytesIO(original))
+    service.describe_image(io.BytesIO(recompressed))
+    assert len(calls) == 2
+
+    monkeypatch.setattr(image_cache.image_cache, "backend", MemoryBackend())
+    monkeypatch.setattr(image_cache, "NEAR_DUPLICATE_DISTANCE", 4)
+    calls.clear()
+    service.describe_image(io.BytesIO(original))
+    assert service.describe_image(io.BytesIO(recompressed)) == "a walk"
+
+    assert len(calls) == 1
+    assert image_cache.near_duplicates.hits == 1
+
+
+def test_ocr_text_is_never_matched_by_near_duplicate(monkeypatch):
+    # another user's re-encoded page must not be answered with their diary text
+    monkeypatch.setattr(image_cache, "NEAR_DUPLICATE_DISTANCE", 64)
+    vision = CountingVision()
+    service = service_with(vision, [])
+    service.extract_text_from_image([io.BytesIO(photo(90))])
+    text = service.extract_text_from_image([io.BytesIO(photo(60))])[0].text
+
+    assert vision.calls == 2
+    assert text == f"{len(photo(60))} bytes"
+    assert image_cache.near_duplicates.hits == 0
+
+
+def test_sqlite_backend_keeps_results_across_restarts(tmp_path, monkeypatch):
+    path = str(tmp_path / "image_cache.sqlite")
+    vision, refined = CountingVision(), []
+
+    monkeypatch.setattr(image_cache.image_cache, "backend", SQLiteBackend(path))
+    service_with(vision, refined).detect_texts_from_diaries([io.BytesIO(b"page")])
+    monkeypatch.setattr(image_cache.image_cache, "backend", SQLiteBackend(path))
+    service_with(vision, refined).detect_texts_from_diaries([io.BytesIO(b"page")])
+
+    assert vision.calls == 1 and len(refined) == 1
+
+
+def test_backend_errors_name_the_image_cache_settings(monkeypatch):
+    import sys
+    from ai.services.common.response_cache import AI_DIR, backend_from_env
+
+    monkeypatch.setenv("IMAGE_CACHE_BACKEND", "sqlite")
+    monkeypatch.delenv("IMAGE_CACHE_PATH", raising=False)
+    assert backend_from_env("IMAGE_CACHE")._db.path == f"{AI_DIR}/image_cache.sqlite"
+
+    monkeypatch.setenv("IMAGE_CACHE_BACKEND", "redis")
+    monkeypatch.setitem(sys.modules, "redis", None)
+    with pytest.raises(RuntimeError, match="IMAGE_CACHE_BACKEND=redis"):
+        backend_from_env("IMAGE_CACHE")
@@ -0,0 +1,81 @@
+import base64
+import io
+import os
+from types import SimpleNamespace
+
+from PIL import Image
+
+from services.image import preprocess
+
+SAMPLE_IMG = os.path.join("ai", "tests", "images", "sample.jpg")
+
+
+def encode(image: Image.Image, fmt: str, **params) -> bytes:
+    out = io.BytesIO()
+    image.save(out, fmt, **params)
+    return out.getvalue()
+
+
+def test_large_photo_is_shrunk_and_made_upright():
+    photo = Image.new("RGB", (4000, 3000), (200, 120, 40))
+    exif = Image.Exif()
+    exif[preprocess.ORIENTATION_TAG] = 6  # stored sideways, shown rotated 90°
+    data = encode(photo, "JPEG", quality=95, exif=exif)
+
+    prepared = preprocess.prepare(io.BytesIO(data), 1024)
+
+    assert prepared.mime == "image/jpeg"
+    assert prepared.size == (768, 1024)
+    assert len(prepared.data) < len(data)
+    with Image.open(io.BytesIO(prepared.data)) as image:
+        assert image.size == (768, 1024)
+        assert image.getexif().get(preprocess.ORIENTATION_TAG, 1) == 1
+
+
+def test_small_upright_image_is_sent_as_uploaded_with_its_own_type():
+    data = encode(Image.new("RGB", (300, 200), "white"), "PNG")
+
+    prepared = preprocess.prepare(data, 512)
+
+    assert prepared.data == data
+    assert prepared.mime == "image/png"
+    assert prepared.data_uri().startswith("data:image/png;base64,")
+
+
+def test_transparency_is_flattened_onto_white():
+    data = encode(Image.new("RGBA", (2000, 1000), (0, 0, 0, 0)), "PNG")
+
+    prepared = preprocess.prepare(data, 500)
+
+    assert prepared.mime == "image/jpeg"
+    with Image.open(io.BytesIO(prepared.data)) as image:
+        assert image.size == (500, 250)
+        assert image.convert("L").getextrema()[0] > 240
+
+
+def test_undecodable_upload_is_sent_as_uploaded():
+    heic = b"\x00\x00\x00\x18ftypheic" + b"\x00" * 32
+
+    prepared = preprocess.prepare(io.BytesIO(heic), 512)
+
+    assert prepared.data == heic
+    assert prepared.mime == "image/heic"
+    assert preprocess.prepare(b"page0", 512).data == b"page0"
+
+
+def test_describe_sends_a_small_low_detail_image():
+    from ai.services.image.image_service import ImageService
+
+    sent = []
+    service = ImageService(ocr_client=object())
+    service.image_model = SimpleNamespace(invoke=lambda messages, config: sent.append(messages) or SimpleNamespace(content=" a walk "))
+
+    with open(SAMPLE_IMG, "rb") as f:
+        assert service.describe_image(io.BytesIO(f.read())) == "a walk"
+
+    image_url = sent[0][0].content[1]["image_url"]
+    assert image_url["detail"] == service.describe_detail == "low"
+    assert image_url["url"].startswith("data:image/jpeg;base64,")
+    data = base64.b64decode(image_url["url"].split(",", 1)[1])
+    with Image.open(io.BytesIO(data)) as image:
+        assert max(image.size) <= service.describe_long_edge
@@ -87,3 +87,79 @@ def test_image_diary_no_files(client):
 
     assert res.status_code == 400
     assert "No image files uploaded" in data["error"]
+
+
+@pytest.fixture
+def fresh_image_cache(monkeypatch):
+    """ Stub pages repeat across tests; start each one from an empty image cache """
+    from ai.services.common.response_cache import MemoryBackend
+    from ai.services.image import image_cache
+    monkeypatch.setattr(image_cache.image_cache, "backend", MemoryBackend())
+
+
+class _StubVisionClient:
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+
+    def document_text_detection(self, image):
+        import time
+        from types import SimpleNamespace
+        content = image.content.decode()
+        # later pages answer first, so ordering is really exercised
+        time.sleep(0.05 * (3 - int(content[-1])))
+        message = "bad image" if content in self.fail_on else ""
+        return SimpleNamespace(error=SimpleNamespace(message=message),
+                               full_text_annotation=SimpleNamespace(text=f"text of {content}"))
+
+
+def test_extract_text_from_image_keeps_order_and_reports_each_error(fresh_image_cache):
+    from ai.services.image.image_service import ImageService, OCRError
+
+    service = ImageService(ocr_client=_StubVisionClient(fail_on={"page1"}))
+    files = [io.BytesIO(f"page{i}".encode()) for i in range(3)]
+    results = service.extract_text_from_image(files, return_exceptions=True)
+
+    assert results[0].text == "text of page0"
+    assert isinstance(results[1], Exception)
+    assert results[2].text == "text of page2"
+
+    files = [io.BytesIO(f"page{i}".encode()) for i in range(3)]
+    with pytest.raises(OCRError) as excinfo:
+        service.extract_text_from_image(files)
+    assert list(excinfo.value.errors) == [1]
+    assert "image 1" in str(excinfo.value)
+
+
+def test_detect_texts_from_diaries_refines_pages_concurrently_in_order(fresh_image_cache):
+    import time
+    from ai.services.image.image_service import ImageService
+    from langchain_core.runnables import RunnableLambda
+    from types import SimpleNamespace
+
+    service = ImageService(ocr_client=_StubVisionClient(fail_on={"page0"}))
+
+    def fake_refine(inputs):
+        text = inputs["ocr_extracted_diary"]
+        time.sleep(0.2)
+        return SimpleNamespace(model_dump=lambda: {"date": "XXXX-10-06", "refined_text": text})
+
+    service.refine_chain = RunnableLambda(fake_refine)
+
+    start = time.perf_counter()
+    result = service.detect_texts_from_diaries([io.BytesIO(f"page{i}".encode()) for i in range(3)])["result"]
+    assert time.perf_counter() - start < 0.5
+
+    assert result[0]["refined_text"] == "" and "bad image" in result[0]["error"]
+    assert [r["refined_text"] for r in result[1:]] == ["text of page1", "text of page2"]
+
+
+def test_vision_client_is_created_on_first_use(monkeypatch):
+    from ai.services.image import image_service
+    created = []
+    monkeypatch.setattr(image_service, "get_vision_client", lambda: created.append(1) or "vision")
+
+    # built at import, which gunicorn's preload_app does in the master before forking
+    service = image_service.ImageService()
+    assert created == []
+    assert service.ocr_client == "vision" and service.ocr_client == "vision"
+    assert created == [1]
@@ -0,0 +1,74 @@
+import json
+import time
+from types import SimpleNamespace
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def _payload():
+    return {
+        "memos": [{"content": "점심은 친구와 먹었다.", "order": 2}, {"content": "아침으로 빵을 먹었다.", "order": 1}],
+        "style_prompt": {"tone": "담백함"},
+        "style_examples": ["오늘도 그냥 그런 하루였다."],
+        "entry_date": "2025-10-20",
+    }
+
+
+def test_merge_stream_emits_deltas_then_trailing_events(client, monkeypatch):
+    import services.merge.routes as merge_routes
+
+    def fake_merge_stream(memos, style_prompt, style_examples, usage=None):
+        assert memos == ["아침으로 빵을 먹었다.", "점심은 친구와 먹었다."]
+        for piece in ["오늘은 ", "빵을 ", "먹었다."]:
+            yield _chunk(piece)
+        usage.update({"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15})
+
+    def fake_analyze(diary, usage=None):
+        time.sleep(0.1)
+        usage.update({"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5})
+        return {"emoji": "🍞", "keywords": ["빵"], "emotion_score": 0.4}
+
+    def fake_mood(diary, style_prompt, style_examples, usage=None):
+        assert diary == "오늘은 빵을 먹었다."
+        usage.update({"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2})
+        return "주인은 배불러 보였다."
+
+    monkeypatch.setattr(merge_routes, "merge_stream", fake_merge_stream)
+    monkeypatch.setattr(merge_routes.analysis_service, "analyze", fake_analyze)
+    monkeypatch.setattr(merge_routes, "generate_mood", fake_mood)
+
+    res = client.post("/merge/stream", data=json.dumps(_payload()), content_type="application/json")
+    assert res.status_code == 200
+    assert res.mimetype == "application/x-ndjson"
+
+    events = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+    assert [e["delta"] for e in events[:3]] == ["오늘은 ", "빵을 ", "먹었다."]
+    # mood finishes first, so it is sent first
+    assert [e["type"] for e in events[3:]] == ["mood", "analysis", "done"]
+    assert events[4]["icon"] == "🍞"
+    done = events[-1]
+    assert done["entry_date"] == "2025-10-20"
+    assert done["usage"]["total"] == {"prompt_tokens": 14, "completion_tokens": 8, "total_tokens": 22}
+
+
+def test_merge_stream_reports_stage_failure_in_band(client, monkeypatch):
+    import services.merge.routes as merge_routes
+
+    def fake_merge_stream(memos, style_prompt, style_examples, usage=None):
+        yield _chunk("오늘은")
+        raise RuntimeError("upstream closed")
+
+    monkeypatch.setattr(merge_routes, "merge_stream", fake_merge_stream)
+
+    res = client.post("/merge/stream", data=json.dumps(_payload()), content_type="application/json")
+    events = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+    assert events[0] == {"type": "diary", "delta": "오늘은"}
+    assert events[-1] == {"type": "error", "error": "upstream closed"}
+
+
+def test_merge_stream_bad_request(client):
+    res = client.post("/merge/stream", data=json.dumps({"style_prompt": {}}), content_type="application/json")
+    assert res.status_code == 400
+    assert "error" in res.get_json()
@@ -0,0 +1,94 @@
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+# the app imports services.* (not ai.services.*), so read the same registry it writes to
+from services.common import metrics
+from services.common.metrics import Counter, Histogram, Registry, upstream_timer
+
+
+def test_render_text_format():
+    registry = Registry()
+    requests = registry.register(Counter("demo_total", "Demo counter", ("route",)))
+    latency = registry.register(Histogram("demo_seconds", "Demo latency", ("route",), buckets=(0.1, 1)))
+    requests.inc(route='/a"b')
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+
+    text = registry.render()
+    assert '# TYPE demo_total counter' in text
+    assert 'demo_total{route="/a\\"b"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{route="/a"} 2' in text
+
+    with pytest.raises(ValueError):
+        requests.inc(other="x")
+
+
+def test_route_metrics_and_errors(client):
+    before = metrics.http_requests.value(route="/analysis/diary", method="POST", status="400")
+    client.post("/analysis/diary", json={})
+    assert metrics.http_requests.value(route="/analysis/diary", method="POST", status="400") == before + 1
+    assert metrics.http_errors.value(route="/analysis/diary", error="ValueError") >= 1
+    assert metrics.http_in_flight.value(route="/analysis/diary") == 0
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.content_type.startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{route="/analysis/diary",method="POST"}' in res.get_data(as_text=True)
+
+
+def test_upstream_timer_counts_errors():
+    operation = f"op-{uuid.uuid4().hex[:6]}"
+    with upstream_timer("vision", operation):
+        time.sleep(0.01)
+    with pytest.raises(RuntimeError):
+        with upstream_timer("vision", operation):
+            raise RuntimeError("boom")
+
+    assert metrics.upstream_duration.count(upstream="vision", operation=operation) == 2
+    assert metrics.upstream_errors.value(upstream="vision", operation=operation, error="RuntimeError") == 1
+
+
+def test_merge_stream_records_ttft_and_tokens(monkeypatch):
+    import services.merge.merge_service as merge_service
+
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+    def fake_create(**params):
+        assert params["stream_options"] == {"include_usage": True}
+        def stream():
+            time.sleep(0.05)
+            yield chunk("오늘은 ")
+            yield chunk("좋았다.")
+            yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=7, completion_tokens=3))
+        return stream()
+
+    monkeypatch.setattr(merge_service.client.chat.completions, "create", fake_create)
+    monkeypatch.setenv("GPT_MODEL", "metrics-test-model")
+    ttft_before = metrics.upstream_ttft.count(upstream="openai_chat", operation="merge_stream")
+
+    assert merge_service.merge_diary(["메모"], {}, []) == "오늘은 좋았다."
+    assert metrics.upstream_ttft.count(upstream="openai_chat", operation="merge_stream") == ttft_before + 1
+    assert metrics.llm_tokens.value(model="metrics-test-model", type="prompt") == 7
+    assert metrics.llm_tokens.value(model="metrics-test-model", type="completion") == 3
+
+
+def test_langchain_callback_records_latency_and_tokens():
+    from langchain_core.outputs import LLMResult
+    from services.common.clients import ChatMetricsCallback
+
+    callback = ChatMetricsCallback("callback-test-model")
+    run_id = uuid.uuid4()
+    callback.on_chat_model_start({}, [[]], run_id=run_id, metadata={"operation": "callback_test"})
+    callback.on_llm_end(
+        LLMResult(generations=[], llm_output={"token_usage": {"prompt_tokens": 11, "completion_tokens": 4}}), run_id=run_id
+    )
+
+    assert metrics.upstream_duration.count(upstream="openai_chat", operation="callback_test") == 1
+    assert metrics.llm_tokens.value(model="callback-test-model", type="prompt") == 11
@@ -0,0 +1,89 @@
+import threading
+
+
+def test_embedding_model_loads_once(monkeypatch):
+    from ai.services.common import model_registry as registry
+
+    calls = []
+
+    def fake_load(name):
+        calls.append(name)
+        return object()
+
+    monkeypatch.setattr(registry, "_models", {})
+    monkeypatch.setattr(registry, "_load_sentence_transformer", fake_load)
+
+    assert not registry.is_ready()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get_embedding_model())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert registry.is_ready()
+
+
+def test_ready_endpoint_loads_the_models_in_the_background(client, monkeypatch):
+    from services.common import model_registry as registry
+
+    loading = threading.Event()
+    calls = []
+
+    def slow_load(name):
+        calls.append(name)
+        loading.wait(2)
+        return object()
+
+    monkeypatch.setattr(registry, "_models", {})
+    monkeypatch.setattr(registry, "_load_sentence_transformer", slow_load)
+    # not preloaded (python app.py, uvicorn): the probe itself starts the load
+    res = client.get("/ready")
+    assert res.status_code == 503
+    assert res.get_json()["ready"] is False
+    assert client.get("/ready").status_code == 503
+
+    loading.set()
+    registry._warming.join(2)
+    res = client.get("/ready")
+    assert res.status_code == 200
+    assert res.get_json()["ready"] is True
+    assert calls == [registry.EMBEDDING_MODEL_NAME]
+
+
+def test_failed_warm_up_is_retried(monkeypatch):
+    from ai.services.common import model_registry as registry
+
+    calls = []
+
+    def flaky_load(name):
+        calls.append(name)
+        if len(calls) == 1:
+            raise OSError("download failed")
+        return object()
+
+    monkeypatch.setattr(registry, "_models", {})
+    monkeypatch.setattr(registry, "_load_sentence_transformer", flaky_load)
+    registry.start_warm_up()
+    registry._warming.join(2)
+    assert not registry.is_ready()
+
+    registry.start_warm_up()
+    registry._warming.join(2)
+    assert registry.is_ready() and len(calls) == 2
+
+
+def test_health_check_does_not_load_model(client, monkeypatch):
+    from services.common import model_registry as registry
+
+    def fail_load(name):
+        raise AssertionError("liveness check must not load the model")
+
+    monkeypatch.setattr(registry, "_models", {})
+    monkeypatch.setattr(registry, "_load_sentence_transformer", fail_load)
+
+    res = client.get("/")
+    assert res.status_code == 200
@@ -0,0 +1,81 @@
+import json
+import time
+import pytest
+
+from ai.services.common.pipeline import Pipeline
+
+
+def test_pipeline_runs_independent_stages_in_parallel():
+    def slow(value):
+        def fn(**deps):
+            time.sleep(0.2)
+            return value + sum(deps.values())
+        return fn
+
+    pipeline = Pipeline()
+    pipeline.add("a", slow(1))
+    pipeline.add("b", slow(10), deps=["a"])
+    pipeline.add("c", slow(100), deps=["a"])
+    pipeline.add("d", slow(1000), deps=["b", "c"])
+
+    start = time.perf_counter()
+    results, timings = pipeline.run()
+    elapsed = time.perf_counter() - start
+
+    assert results == {"a": 1, "b": 11, "c": 101, "d": 1112}
+    assert elapsed < 0.75  # three levels of 0.2s, not four stages in series
+    assert abs(timings["b"]["start"] - timings["c"]["start"]) < 0.1
+    assert timings["d"]["start"] >= timings["b"]["start"] + timings["b"]["seconds"] - 0.01
+
+
+def test_pipeline_rejects_unknown_dependency_and_propagates_errors():
+    with pytest.raises(ValueError):
+        Pipeline().add("b", lambda a: a, deps=["a"])
+
+    def boom():
+        raise RuntimeError("upstream failed")
+
+    pipeline = Pipeline().add("a", boom).add("b", lambda a: a, deps=["a"])
+    with pytest.raises(RuntimeError, match="upstream failed"):
+        pipeline.run()
+
+
+@pytest.mark.parametrize("speculative", [False, True])
+def test_merge_route_runs_analysis_and_mood_concurrently(client, monkeypatch, speculative):
+    import services.merge.routes as merge_routes
+
+    seen = {}
+
+    def fake_merge(memos, style_prompt, style_examples):
+        time.sleep(0.2)
+        return "합쳐진 일기"
+
+    def fake_analyze(diary):
+        time.sleep(0.2)
+        return {"emoji": "🙂", "keywords": ["빵"], "emotion_score": 0.5}
+
+    def fake_mood(diary, style_prompt, style_examples):
+        time.sleep(0.2)
+        seen["mood_input"] = diary
+        return "주인은 평온해 보였다."
+
+    monkeypatch.setattr(merge_routes, "merge_diary", fake_merge)
+    monkeypatch.setattr(merge_routes.analysis_service, "analyze", fake_analyze)
+    monkeypatch.setattr(merge_routes, "generate_mood", fake_mood)
+
+    payload = {
+        "memos": [{"content": "둘째", "order": 2}, {"content": "첫째", "order": 1}],
+        "style_prompt": {}, "style_examples": [],
+        "speculative_mood": speculative,
+    }
+    start = time.perf_counter()
+    res = client.post("/merge/", data=json.dumps(payload), content_type="application/json")
+    elapsed = time.perf_counter() - start
+
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["diary"] == "합쳐진 일기"
+    assert data["mood"] == "주인은 평온해 보였다."
+    assert data["icon"] == "🙂"
+    assert elapsed < 0.55  # merge -> (analysis | mood), not three calls in series
+    assert seen["mood_input"] == ("첫째\n\n둘째" if speculative else "합쳐진 일기")
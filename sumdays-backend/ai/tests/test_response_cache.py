@@ -0,0 +1,111 @@
+import json
+import time
+import pytest
+
+from ai.services.common.response_cache import ResponseCache, MemoryBackend, SQLiteBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(max_items=2)
+    return SQLiteBackend(str(tmp_path / "cache.sqlite"), max_items=2)
+
+
+def test_key_normalizes_input_and_separates_versions():
+    k = ResponseCache.make_key
+    assert k("analyze", "m", "1", "오늘은  좋은 날 ") == k("analyze", "m", "1", "오늘은 좋은 날")
+    assert k("analyze", "m", "1", "오늘") != k("analyze", "m", "2", "오늘")
+    assert k("analyze", "m", "1", "오늘") != k("analyze", "other", "1", "오늘")
+    assert k("mood", "m", "1", "오늘", {"a": 1, "b": 2}) == k("mood", "m", "1", "오늘", {"b": 2, "a": 1})
+
+
+def test_get_or_compute_hits_bypass_and_lru(backend):
+    cache = ResponseCache(backend, ttl=60)
+    calls = []
+
+    def compute(value):
+        def fn():
+            calls.append(value)
+            return {"value": value}
+        return fn
+
+    assert cache.get_or_compute("a", compute(1)) == {"value": 1}
+    assert cache.get_or_compute("a", compute(2)) == {"value": 1}
+    assert cache.get_or_compute("a", compute(3), use_cache=False) == {"value": 3}
+    assert cache.get_or_compute("a", compute(4)) == {"value": 3}
+    assert calls == [1, 3]
+
+    cache.get_or_compute("b", compute(5))
+    cache.get_or_compute("a", compute(6))  # touch a, so b is the LRU entry
+    cache.get_or_compute("c", compute(7))
+    assert cache.get_or_compute("b", compute(8)) == {"value": 8}
+
+    stats = cache.stats()
+    assert stats["bypasses"] == 1
+    assert stats["hits"] == 3
+
+
+def test_ttl_expiry(backend):
+    cache = ResponseCache(backend, ttl=0.05)
+    cache.get_or_compute("a", lambda: "old")
+    time.sleep(0.1)
+    assert cache.get_or_compute("a", lambda: "new") == "new"
+
+
+def test_sqlite_connection_is_opened_per_process(tmp_path, monkeypatch):
+    import os
+    from ai.services.common import response_cache
+
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite"))
+    backend.set("a", "1", 60)
+    inherited = backend._conn
+    # as in a worker forked from the preloading gunicorn master
+    forked_pid = os.getpid() + 1
+    monkeypatch.setattr(response_cache.os, "getpid", lambda: forked_pid)
+    assert backend.get("a") == "1"
+    assert backend._conn is not inherited
+
+
+def test_sqlite_default_path_does_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    import os
+    from ai.services.common.response_cache import AI_DIR, backend_from_env
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("RESPONSE_CACHE_BACKEND", "sqlite")
+    monkeypatch.delenv("RESPONSE_CACHE_PATH", raising=False)
+    backend = backend_from_env()
+    assert backend._db.path == os.path.join(AI_DIR, "response_cache.sqlite")
+    assert os.path.isabs(backend._db.path)
+
+
+def test_hit_is_sub_millisecond():
+    cache = ResponseCache(MemoryBackend(), ttl=60)
+    key = cache.make_key("analyze", "m", "1", "오늘은 친구와 카페에서 이야기를 나눴다.")
+    cache.get_or_compute(key, lambda: {"keywords": ["카페"], "emoji": "☕", "emotion_score": 0.6})
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        cache.get_or_compute(key, lambda: None)
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+
+def test_analysis_route_uses_cache_and_bypass_header(client, monkeypatch):
+    import services.analysis.routes as analysis_routes
+    from services.common.response_cache import response_cache
+
+    monkeypatch.setattr(response_cache, "backend", MemoryBackend())
+    calls = []
+
+    def fake_analyze(diary, usage=None):
+        calls.append(diary)
+        return {"keywords": ["카페"], "emoji": "☕", "emotion_score": 0.6}
+
+    monkeypatch.setattr(analysis_routes.analyzer, "_analyze", fake_analyze)
+    body = json.dumps({"diary": "오늘은 카페에 갔다."})
+
+    for headers in ({}, {}, {"X-Cache-Bypass": "1"}):
+        res = client.post("/analysis/diary", data=body, content_type="application/json", headers=headers)
+        assert res.status_code == 200
+        assert res.get_json()["icon"] == "☕"
+    assert len(calls) == 2
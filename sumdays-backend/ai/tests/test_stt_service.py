@@ -7,6 +7,7 @@ def create_mock_response(text, no_speech_prob=0.0):
     mock_res.text = text
     
     segment = MagicMock()
+    segment.text = text
     segment.no_speech_prob = no_speech_prob
     mock_res.segments = [segment]
     
@@ -80,4 +81,148 @@ def test_stt_memo_exception(client):
         res_json = res.get_json()
 
         assert res.status_code == 400
-        assert "OpenAI API Failure" in res_json["error"]
\ No newline at end of file
+        assert "OpenAI API Failure" in res_json["error"]
+
+def make_wav(seconds, rate=44100, channels=2, lead=1.0, pauses=()):
+    """ tone with silent lead-in/tail; pauses are (start, end) seconds of silence inside it """
+    import wave
+    import numpy as np
+    t = np.arange(int(seconds * rate)) / rate
+    voiced = (t > lead) & (t < seconds - lead)
+    for start, end in pauses:
+        voiced &= (t < start) | (t > end)
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * voiced
+    out = io.BytesIO()
+    with wave.open(out, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes((np.repeat(signal[:, None], channels, axis=1) * 32767).astype("<i2").tobytes())
+    return out.getvalue()
+
+
+def test_prepare_downmixes_resamples_and_trims():
+    from ai.services.stt import audio
+
+    data = make_wav(6)
+    chunks = audio.prepare(data, "memo.wav")
+
+    assert len(chunks) == 1
+    assert chunks[0].name.startswith("memo_0.")
+    # 4 s of tone plus the VAD padding on each side
+    assert 4.0 <= chunks[0].seconds <= 4.0 + 2 * audio.VAD_PADDING_SECONDS + 0.1
+    assert len(chunks[0].data) < len(data) / 5
+    if chunks[0].name.endswith(".wav"):
+        samples, rate = audio.decode_wav(chunks[0].data)
+        assert rate == audio.TARGET_RATE and samples.shape[1] == 1
+
+
+def test_prepare_passes_other_formats_through():
+    from ai.services.stt import audio
+
+    chunks = audio.prepare(b"ID3 not really an mp3", "memo.m4a")
+    assert [(c.name, c.data) for c in chunks] == [("memo.m4a", b"ID3 not really an mp3")]
+    assert audio.prepare(make_wav(2, lead=1.0), "quiet.wav") == []
+
+
+def test_long_memo_is_chunked_at_pauses_and_stitched_in_order(client, monkeypatch):
+    from services.stt import audio, routes
+
+    monkeypatch.setattr(audio, "CHUNK_SEARCH_SECONDS", 2)
+    monkeypatch.setattr(routes.stt_service, "chunk_seconds", 5)
+    data = make_wav(13, rate=16000, channels=1, lead=0.5, pauses=[(4.2, 4.8), (8.4, 9.0)])
+    names = []
+
+    def create(*args, file=None, **kwargs):
+        names.append(file[0])
+        idx = int(file[0].rsplit("_", 1)[1].split(".")[0])
+        return create_mock_response(f"조각{idx}", no_speech_prob=0.1)
+
+    with patch(LIBRARY_PATCH_PATH, side_effect=create):
+        res = client.post("/stt/memo", data={"audio": (io.BytesIO(data), "long.wav")},
+                          content_type="multipart/form-data")
+
+    assert res.status_code == 200
+    assert res.get_json()["transcribed_text"] == "조각0 조각1 조각2"
+    assert sorted(names) == [f"long_{i}.{names[0].rsplit('.', 1)[1]}" for i in range(3)]
+
+
+def test_filters_apply_per_whisper_segment(client):
+    response = MagicMock()
+    response.text = " 산책을 했다. MBC 뉴스 구독 부탁드립니다. ... 하늘이 맑았다."
+    response.segments = [
+        MagicMock(text=" 산책을 했다.", no_speech_prob=0.1),
+        MagicMock(text=" MBC 뉴스 구독 부탁드립니다.", no_speech_prob=0.2),
+        MagicMock(text=" ...", no_speech_prob=0.9),
+        MagicMock(text=" 하늘이 맑았다.", no_speech_prob=0.1),
+    ]
+
+    with patch(LIBRARY_PATCH_PATH, return_value=response):
+        res = client.post("/stt/memo", data={"audio": (io.BytesIO(b"memo"), "memo.m4a")},
+                          content_type="multipart/form-data")
+
+    assert res.get_json()["transcribed_text"] == "산책을 했다. 하늘이 맑았다."
+
+
+def test_stream_emits_segments_as_chunks_finish(client, monkeypatch):
+    import json
+    import time
+    from services.stt import audio, routes
+
+    monkeypatch.setattr(audio, "CHUNK_SEARCH_SECONDS", 2)
+    monkeypatch.setattr(routes.stt_service, "stream_chunk_seconds", 5)
+    data = make_wav(13, rate=16000, channels=1, lead=0.5, pauses=[(4.2, 4.8), (8.4, 9.0)])
+
+    def create(*args, file=None, **kwargs):
+        idx = int(file[0].rsplit("_", 1)[1].split(".")[0])
+        # the first chunk is the slowest one, and the last one is only a hallucination
+        time.sleep(0.2 if idx == 0 else 0.0)
+        return create_mock_response("구독 부탁드려요" if idx == 2 else f"조각{idx}", no_speech_prob=0.1)
+
+    with patch(LIBRARY_PATCH_PATH, side_effect=create):
+        res = client.post("/stt/memo/stream", data={"audio": (io.BytesIO(data), "long.wav")},
+                          content_type="multipart/form-data")
+        events = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+
+    assert res.status_code == 200
+    assert res.mimetype == "application/x-ndjson"
+    assert events == [
+        {"type": "segment", "index": 1, "total": 3, "text": "조각1"},
+        {"type": "segment", "index": 0, "total": 3, "text": "조각0"},
+        {"type": "done", "transcribed_text": "조각0 조각1"},
+    ]
+
+
+def test_stream_reports_a_failing_chunk_in_band(client):
+    import json
+
+    with patch(LIBRARY_PATCH_PATH, side_effect=Exception("OpenAI API Failure")):
+        res = client.post("/stt/memo/stream", data={"audio": (io.BytesIO(b"memo"), "memo.m4a")},
+                          content_type="multipart/form-data")
+        events = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+
+    assert res.status_code == 200
+    assert events == [{"type": "error", "error": "OpenAI API Failure"}]
+    assert client.post("/stt/memo/stream", data={}, content_type="multipart/form-data").status_code == 400
+
+
+def test_stream_passes_compressed_memos_through_after_the_request_ends(client):
+    import json
+    import time
+
+    memo = b"\x00\x00\x00\x20ftypM4A " + b"m" * (2 * 1024 * 1024)
+    received = []
+
+    def create(*args, file=None, **kwargs):
+        # the response is already streaming, so the request (and its upload) is closed by now
+        time.sleep(0.3)
+        received.append(file[1].read())
+        return create_mock_response("메모", no_speech_prob=0.1)
+
+    with patch(LIBRARY_PATCH_PATH, side_effect=create):
+        res = client.post("/stt/memo/stream", data={"audio": (io.BytesIO(memo), "memo.m4a")},
+                          content_type="multipart/form-data")
+        events = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+
+    assert events[-1] == {"type": "done", "transcribed_text": "메모"}
+    assert received == [memo]
@@ -0,0 +1,147 @@
+import json
+import uuid
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from ai.app import app
+from services.analysis import routes
+from services.analysis.summary_service import (
+    SummaryService, SummaryWeekResult, SummaryMonthResult, Highlight, group_by_week,
+)
+
+
+class FakeModel:
+    """ Chat model stand-in: answers structured-output calls and records each prompt """
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.prompts = {"week": [], "month": []}
+        self.timeouts = []
+        # week summaries differ between models, so their month prompts do not share cache entries
+        self.tag = uuid.uuid4().hex[:8]
+
+    def with_structured_output(self, schema):
+        def answer(prompt, timeout=None):
+            self.timeouts.append(timeout)
+            text = prompt.to_string()
+            if schema is SummaryMonthResult:
+                self.prompts["month"].append(text)
+                return SummaryMonthResult(
+                    title="한 달", overview="무난한 한 달이었다.", dominant_emoji="🙂",
+                    emerging_topics=["일", "휴식"], emotion_cycle="긴장 → 회복", advice="푹 쉬어보자.",
+                )
+            self.prompts["week"].append(text)
+            return SummaryWeekResult(
+                title=f"한 주 {self.tag}", overview="평범한 한 주였다.", emerging_topics=["일"],
+                highlights=[Highlight(date="2025-10-01", summary="산책")],
+                emotion_cycle="평온", advice="잘 하고 있다.",
+            )
+        return RunnableLambda(answer)
+
+
+@pytest.fixture
+def service():
+    service = SummaryService()
+    service.model = FakeModel()
+    return service
+
+def month_diaries():
+    # unique text per test run, so the shared response cache starts cold
+    tag = uuid.uuid4().hex[:8]
+    days = ["2025-10-06", "2025-10-08", "2025-10-14", "2025-10-15", "2025-10-21", "2025-10-23"]
+    return [{"date": day, "diary": f"{day} {tag} 일기를 썼다.", "emoji": "📚", "emotion_score": 0.2} for day in days]
+
+
+def test_group_by_week_starts_on_monday():
+    weeks = group_by_week([{"date": "2025-10-13"}, {"date": "2025-10-12"}, {"date": "2025-10-19"}])
+    assert [str(monday) for monday in weeks] == ["2025-10-06", "2025-10-13"]
+    assert [d["date"] for d in weeks[next(iter(weeks))]] == ["2025-10-12"]
+    with pytest.raises(ValueError):
+        group_by_week([{"diary": "날짜 없음"}])
+
+def test_month_is_reduced_from_week_summaries(service):
+    result = service.summarize_month(month_diaries())
+
+    assert [w["week_range"] for w in result["weeks"]] == [
+        "2025-10-06~2025-10-08", "2025-10-14~2025-10-15", "2025-10-21~2025-10-23",
+    ]
+    assert result["weeks"][0]["average_emotion"] == 0.2
+    assert result["weeks"][0]["dominant_emoji"] == "📚"
+    assert result["month"]["title"] == "한 달"
+    assert len(service.model.prompts["week"]) == 3
+    # the month prompt sees the week summaries, not the diaries
+    month_prompt = service.model.prompts["month"][0]
+    assert "2025-10-14~2025-10-15" in month_prompt and "일기를 썼다" not in month_prompt
+
+def test_month_within_one_week_is_refused_before_any_model_call(service):
+    diaries = [d for d in month_diaries() if d["date"] < "2025-10-13"]
+    with pytest.raises(ValueError):
+        service.summarize_month(diaries)
+    assert service.model.prompts["week"] == []
+
+def test_editing_one_diary_recomputes_only_its_week(service):
+    diaries = month_diaries()
+    service.summarize_month(diaries)
+    service.summarize_month(diaries)
+    assert len(service.model.prompts["week"]) == 3
+    assert len(service.model.prompts["month"]) == 1
+
+    diaries[2] = {**diaries[2], "diary": diaries[2]["diary"] + " 저녁에는 비가 왔다."}
+    service.summarize_month(diaries)
+    assert len(service.model.prompts["week"]) == 4
+    assert "비가 왔다" in service.model.prompts["week"][-1]
+    # the edited week has the same summary, so the month step is served from the cache too
+    assert len(service.model.prompts["month"]) == 1
+
+    service.summarize_month(diaries, use_cache=False)
+    assert len(service.model.prompts["week"]) == 7
+
+def test_each_attempt_timeout_reaches_the_model(service):
+    from services.common import deadline
+    deadline.set_budget(5000)
+    try:
+        service.summarize_month(month_diaries())
+    finally:
+        deadline.set_budget(None)
+    assert len(service.model.timeouts) == 4
+    assert all(timeout is not None and timeout <= 5 for timeout in service.model.timeouts)
+
+def test_summary_model_leaves_retries_to_the_deadline():
+    assert SummaryService().model.max_retries == 0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app.config["TESTING"] = True
+    monkeypatch.setattr(routes.summary_service, "model", FakeModel())
+    return app.test_client()
+
+def test_month_route_from_diaries_and_from_weeks(client):
+    res = client.post("/analysis/month", data=json.dumps({"diaries": month_diaries()}),
+                      content_type="application/json")
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["summary"]["title"] == "한 달"
+    assert data["insights"]["emotion_cycle"] == "긴장 → 회복"
+    assert len(data["weeks"]) == 3
+
+    res = client.post("/analysis/month", data=json.dumps({"weeks": data["weeks"][:2]}),
+                      content_type="application/json")
+    assert res.status_code == 200
+    assert res.get_json()["weeks"] == data["weeks"][:2]
+
+    res = client.post("/analysis/month", data=json.dumps({"weeks": data["weeks"][:1]}),
+                      content_type="application/json")
+    assert res.status_code == 400
+    assert "error" in res.get_json()
+
+def test_month_route_reports_a_missed_deadline_as_504(client, monkeypatch):
+    from services.common import deadline
+
+    def too_late(*args, **kwargs):
+        raise deadline.DeadlineExceeded("summarize_month")
+
+    monkeypatch.setattr(routes.summary_service, "summarize_month", too_late)
+    res = client.post("/analysis/month", data=json.dumps({"diaries": month_diaries()}),
+                      content_type="application/json")
+    assert res.status_code == 504
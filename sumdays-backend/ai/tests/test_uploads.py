@@ -0,0 +1,59 @@
+import io
+import json
+import pytest
+from unittest.mock import patch
+
+from ai.app import app
+from services.common import uploads
+from services.image import routes as image_routes
+
+
+@pytest.fixture
+def not_called():
+    """ Fails the test if the upload reaches the image service """
+    with patch.object(image_routes.image_service, "detect_texts_from_diaries") as diaries, \
+         patch.object(image_routes.image_service, "analyze") as analyze:
+        yield
+        assert not diaries.called and not analyze.called
+
+
+def test_too_many_files_is_refused_before_the_view(client, not_called, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_FILES", 2)
+    files = [(io.BytesIO(b"page"), f"page{i}.jpg") for i in range(3)]
+    res = client.post("/image/diary", data={"image": files}, content_type="multipart/form-data")
+
+    assert res.status_code == 413
+    assert "At most 2 files" in res.get_json()["error"]
+
+
+def test_too_large_file_is_refused(client, not_called, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_FILE_BYTES", 1024)
+    data = {"type": "describe", "image": (io.BytesIO(b"x" * 2048), "big.jpg")}
+    res = client.post("/image/memo", data=data, content_type="multipart/form-data")
+
+    assert res.status_code == 413
+    assert "big.jpg" in res.get_json()["error"]
+
+
+def test_too_large_request_is_refused(client, not_called, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_REQUEST_BYTES", 4096)
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 4096)
+    data = {"image": [(io.BytesIO(b"x" * 3000), "a.jpg"), (io.BytesIO(b"x" * 3000), "b.jpg")]}
+    res = client.post("/image/diary", data=data, content_type="multipart/form-data")
+    assert res.status_code == 413
+
+    # JSON bodies too, instead of the view's generic 400
+    res = client.post("/analysis/week", data=json.dumps({"diaries": ["x" * 5000]}), content_type="application/json")
+    assert res.status_code == 413
+    assert "error" in res.get_json()
+
+
+def test_large_files_are_spooled_to_disk(monkeypatch):
+    monkeypatch.setattr(uploads, "SPOOL_BYTES", 1024)
+    data = {"small": (io.BytesIO(b"x" * 100), "small.jpg"), "large": (io.BytesIO(b"x" * 4096), "large.jpg")}
+    with app.test_request_context("/image/diary", method="POST", data=data, content_type="multipart/form-data"):
+        from flask import request
+        assert not request.files["small"].stream._rolled
+        assert request.files["large"].stream._rolled
+        assert uploads.file_size(request.files["large"]) == 4096
+        assert request.files["large"].read() == b"x" * 4096
@@ -1,4 +1,5 @@
 const axios = require("axios");
+const { aiRequestConfig, sendAiBackoff } = require("../../utils/aiHeaders");
 const PYTHON_SERVER_URL = process.env.PYTHON_AI_URL;
 const weekSummaryModel = require('../../db/models/weekSummaryModel');
 
@@ -24,12 +25,8 @@ const analyzeController = {
                 });
             }
 
-            // calculate average score and distribution
-            const average_score = calculateAverageScore(diaries);
-            const distribution = calculateEmotionDistribution_week(diaries);
-
-            // get flask response
-            const response = await axios.post(`${PYTHON_SERVER_URL}/analysis/week`, { diaries });
+            // get flask response (emotion score, distribution, trend and emoji are computed there)
+            const response = await axios.post(`${PYTHON_SERVER_URL}/analysis/week`, { diaries }, aiRequestConfig(req));
             
             if (!response.data) {
                 return res.status(500).json({
@@ -40,8 +37,6 @@ const analyzeController = {
             }
 
             // final response
-            response.data.emotion_analysis.emotion_score = average_score
-            response.data.emotion_analysis.distribution = distribution
             const result = response.data;
                 
             if (userId) {
@@ -63,6 +58,7 @@ const analyzeController = {
             });
         } catch (err) {
             console.error("[analyzeController.summarizeWeek] Error:", err.message);
+            if (sendAiBackoff(err, res)) return;
             return res.status(500).json({
                 success: false,
                 error: err.message,
@@ -74,65 +70,69 @@ const analyzeController = {
     /* POST http://localhost:3000/api/ai/summarize-month
     POSTMAN raw json
     {
-    "user_id": 1234,
-    "period": {
-        "range_type": "month",
-        "start_date": "2025-10-01",
-        "end_date": "2025-10-31"
-        }
+        "diaries": [{"date": "2025-10-01", "diary": "", "emoji": "", "emotion_score": 0.2},{}]
     }
-    // */
-    // summarizeMonth: async (req, res) => {
-    //     try {
-    //         const { user_id, period } = req.body;
+    The AI server summarizes each week (cached, so only an edited week is redone) and then the month.
+    */
+    summarizeMonth: async (req, res) => {
+        try {
+            const { diaries } = req.body;
 
-    //         if (!period || period.range_type !== "month") {
-    //             return res.status(400).json({
-    //                 success: false,
-    //                 message: "Not a proper input."
-    //             })
-    //         }
-            
-    //         // TODO: get data(weeks) from db(mock for now)
-    //         const weeks = await getUserWeeksMock(user_id, period);
-    //         if (!weeks || weeks.length < MIN_WEEKSUMMARY_NUM) {
-    //             return res.status(404).json({
-    //                 success: false,
-    //                 message: "There must be at least 2 week summaries to make monthly summary"
-    //             });
-    //         }
+            if (!diaries || diaries.length < MIN_DIARY_NUM) {
+                return res.status(404).json({
+                    success: false,
+                    message: "There must be at least 3 diaries to make monthly summary"
+                });
+            }
 
-    //         // calculate average score and distribution
-    //         const average_score = calculateAverageScore(weeks);
-    //         const distribution = calculateEmotionDistribution_month(weeks);
+            // the AI server reduces the month from week summaries (Monday to Sunday)
+            if (countWeeks(diaries) < MIN_WEEKSUMMARY_NUM) {
+                return res.status(400).json({
+                    success: false,
+                    message: "Diaries must span at least 2 weeks to make monthly summary"
+                });
+            }
 
-    //         // get flask response
-    //         const response = await axios.post(`${PYTHON_SERVER_URL}/analysis/month`, { weeks });
+            // calculate average score and distribution
+            const average_score = calculateAverageScore(diaries);
+            const distribution = calculateEmotionDistribution_week(diaries);
+
+            // get flask response
+            const response = await axios.post(`${PYTHON_SERVER_URL}/analysis/month`, { diaries }, aiRequestConfig(req));
             
-    //         if (!response.data) {
-    //             return res.status(500).json({
-    //                 success: false,
-    //                 message: "Invalid response from AI server.",
-    //                 raw: response.data,
-    //             });
-    //         }
+            if (!response.data) {
+                return res.status(500).json({
+                    success: false,
+                    message: "Invalid response from AI server.",
+                    raw: response.data,
+                });
+            }
 
-    //         // final response
-    //         response.data.summary.emotion_score = average_score
-    //         response.data.summary.emotion_statistics = distribution
+            // final response
+            response.data.summary.emotion_score = average_score
+            response.data.summary.emotion_statistics = distribution
 
-    //         return res.status(200).json({
-    //             success: true,
-    //             result: response.data,
-    //         });
-    //     } catch (err) {
-    //         console.error("[analyzeController.summarizeMonth] Error:", err.message);
-    //         return res.status(500).json({
-    //             success: false,
-    //             error: err.message,
-    //         });
-    //     }
-    // },
+            return res.status(200).json({
+                success: true,
+                result: response.data,
+            });
+        } catch (err) {
+            console.error("[analyzeController.summarizeMonth] Error:", err.message);
+            if (sendAiBackoff(err, res)) return;
+            // a request the AI server rejected (missing dates, ...) is the client's error, not ours
+            const status = err.response?.status;
+            if (status >= 400 && status < 500) {
+                return res.status(status).json({
+                    success: false,
+                    error: err.response.data?.error || err.message,
+                });
+            }
+            return res.status(500).json({
+                success: false,
+                error: err.message,
+            });
+        }
+    },
 
     // Controller method for daily diary analysis (Example: POST /api/ai/analyze)
     /* POST http://localhost:3000/api/ai/analyze
@@ -160,7 +160,7 @@ const analyzeController = {
             //     });
             // }
 
-            const response = await axios.post(`${PYTHON_SERVER_URL}/analysis/diary`, { diary });
+            const response = await axios.post(`${PYTHON_SERVER_URL}/analysis/diary`, { diary }, aiRequestConfig(req));
             
             if (!response.data) {
                 return res.status(500).json({
@@ -176,6 +176,50 @@ const analyzeController = {
             });
         } catch (err) {
             console.error("[analyzeController.analyze] Error:", err.message);
+            if (sendAiBackoff(err, res)) return;
+            return res.status(500).json({
+                success: false,
+                error: err.message,
+            });
+        }
+    },
+
+    // Controller method for analyzing several diaries at once (Example: POST /api/ai/analyze/batch)
+    /* POST http://localhost:3000/api/ai/analyze/batch
+    POSTMAN raw json
+    {
+    "diaries": [{"id": 11, "diary": "오늘은 산책하면서 생각이 많았던 하루였다."}, {"id": 12, "diary": "..."}]
+    }
+    results come back per diary: {"id", "icon", "analysis"} or {"id", "error"}
+    */
+    analyzeBatch: async (req, res) => {
+        try {
+            const { diaries } = req.body;
+
+            if (!Array.isArray(diaries) || diaries.length === 0) {
+                return res.status(400).json({
+                    success: false,
+                    message: "No diaries input."
+                })
+            }
+
+            const response = await axios.post(`${PYTHON_SERVER_URL}/analysis/diary/batch`, { diaries }, aiRequestConfig(req));
+
+            if (!response.data || !Array.isArray(response.data.results)) {
+                return res.status(500).json({
+                    success: false,
+                    message: "Invalid response from AI server.",
+                    raw: response.data,
+                });
+            }
+
+            return res.status(200).json({
+                success: true,
+                result: response.data.results,
+            });
+        } catch (err) {
+            console.error("[analyzeController.analyzeBatch] Error:", err.message);
+            if (sendAiBackoff(err, res)) return;
             return res.status(500).json({
                 success: false,
                 error: err.message,
@@ -195,7 +239,7 @@ function calculateAverageScore(data) {
 }
 
 /**
- * calculate emotion score distribution for week 
+ * calculate emotion score distribution for week (and month, from its diaries)
  */
 function calculateEmotionDistribution_week(diaries) {
     const dist = { positive: 0, neutral: 0, negative: 0 };
@@ -207,6 +251,21 @@ function calculateEmotionDistribution_week(diaries) {
     return dist;
 }
 
+/**
+ * count the calendar weeks (Monday to Sunday) the diaries fall in, as the AI server groups them;
+ * a diary without a valid YYYY-MM-DD date is left to the AI server to reject
+ */
+function countWeeks(diaries) {
+    const mondays = new Set();
+    diaries.forEach(d => {
+        const day = new Date(`${String(d.date).slice(0, 10)}T00:00:00Z`);
+        if (isNaN(day)) return;
+        day.setUTCDate(day.getUTCDate() - (day.getUTCDay() + 6) % 7);
+        mondays.add(day.toISOString().slice(0, 10));
+    });
+    return mondays.size;
+}
+
 /**
  * calculate emotion score distribution for month 
  */
@@ -1,6 +1,7 @@
 const axios = require("axios");
 const FormData = require("form-data");
 const fs = require("fs");
+const { aiRequestConfig, sendAiBackoff } = require("../../utils/aiHeaders");
 const PYTHON_SERVER_URL = process.env.PYTHON_AI_URL;
 
 const extractController = {
@@ -31,11 +32,9 @@ const extractController = {
                 }
             }
 
-            const response = await axios.post(`${PYTHON_SERVER_URL}/extract/style`, formData, {
-                headers: {
-                    ...formData.getHeaders(),
-                },
-            });
+            const response = await axios.post(`${PYTHON_SERVER_URL}/extract/style`, formData, aiRequestConfig(req, {
+                headers: formData.getHeaders(),
+            }));
 
             if (req.files) {
                 for (const file of req.files) {
@@ -54,6 +53,7 @@ const extractController = {
 
         } catch (err) {
             console.error("[extractController.extractStyle] Error:", err.message);
+            if (sendAiBackoff(err, res)) return;
             return res.status(500).json({
                 success: false,
                 error: err.message,
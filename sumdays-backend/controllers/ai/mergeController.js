@@ -1,4 +1,5 @@
 const axios = require("axios");
+const { aiRequestConfig, sendAiBackoff } = require("../../utils/aiHeaders");
 const PYTHON_SERVER_URL = process.env.PYTHON_AI_URL;
 
 const mergeController = {
@@ -10,7 +11,7 @@ const mergeController = {
      */
     merge: async (req, res) => {
         try {
-            const { memos, style_prompt, style_examples, end_flag, length_level } = req.body;
+            const { memos, style_prompt, style_examples, end_flag, length_level, stream } = req.body;
 
             if (!memos || !Array.isArray(memos) || memos.length < 2) {
                 return res.status(401).json({
@@ -32,7 +33,7 @@ const mergeController = {
                 const response = await axios.post(
                     `${PYTHON_SERVER_URL}/merge/paragraph`, 
                     { memos, style_prompt, style_examples, length_level },
-                    {responseType: "stream"}
+                    aiRequestConfig(req, { responseType: "stream" })
                 );
 
                 if (!response.data || !response.data.pipe) {
@@ -45,10 +46,29 @@ const mergeController = {
                 res.setHeader("Content-Type", "text/plain; charset=utf-8");
                 response.data.pipe(res);
                 return;
+            } else if (stream) {
+                // NDJSON events: diary deltas, then analysis / mood, then done (with token usage)
+                const response = await axios.post(
+                    `${PYTHON_SERVER_URL}/merge/stream`,
+                    { memos, style_prompt, style_examples },
+                    aiRequestConfig(req, { responseType: "stream" })
+                );
+
+                if (!response.data || !response.data.pipe) {
+                    return res.status(500).json({
+                        success: false,
+                        message: "Invalid stream from AI server"
+                    });
+                }
+
+                res.setHeader("Content-Type", "application/x-ndjson; charset=utf-8");
+                response.data.pipe(res);
+                return;
             } else {
                 const response = await axios.post(
                     `${PYTHON_SERVER_URL}/merge/`, 
-                    { memos, style_prompt, style_examples }
+                    { memos, style_prompt, style_examples },
+                    aiRequestConfig(req)
                 );
 
                 if (!response.data) {
@@ -67,6 +87,7 @@ const mergeController = {
             
         } catch (err) {
             console.error("[mergeController.merge] Error:", err.message);
+            if (sendAiBackoff(err, res)) return;
             return res.status(400).json({
                 success: false,
                 error: err.message || err,
@@ -86,12 +107,14 @@ const mergeController = {
 
             const response = await axios.post(
                 `${PYTHON_SERVER_URL}/merge/mood`,
-                { diary, style_prompt, style_examples }
+                { diary, style_prompt, style_examples },
+                aiRequestConfig(req)
             );
 
             return res.status(200).json({ success: true, result: response.data });
         } catch (err) {
             console.error("[mergeController.mood] Error:", err.message);
+            if (sendAiBackoff(err, res)) return;
             return res.status(400).json({ success: false, error: err.message || err });
         }
     },
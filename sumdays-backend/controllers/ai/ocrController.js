@@ -1,6 +1,7 @@
 const axios = require("axios");
 const FormData = require("form-data");
 const fs = require("fs");
+const { aiRequestConfig, sendAiBackoff } = require("../../utils/aiHeaders");
 const PYTHON_SERVER_URL = process.env.PYTHON_AI_URL;
 
 const ocrController = {
@@ -25,11 +26,9 @@ const ocrController = {
             formData.append("image", fs.createReadStream(req.file.path));
             formData.append("type", analysisType);
 
-            const response = await axios.post(`${PYTHON_SERVER_URL}/image/memo`, formData, {
-                headers: {
-                    ...formData.getHeaders(),
-                },
-            });
+            const response = await axios.post(`${PYTHON_SERVER_URL}/image/memo`, formData, aiRequestConfig(req, {
+                headers: formData.getHeaders(),
+            }));
 
             fs.unlink(req.file.path, (err) => {
                 if (err) console.error("Temp file deletion error:", err);
@@ -42,6 +41,7 @@ const ocrController = {
             });
         } catch (error) {
             console.error("[imageController.memo] Error:", error.message);
+            if (sendAiBackoff(error, res)) return;
             res.status(500).json({
                 error: error.message,
             });
@@ -65,11 +65,9 @@ const ocrController = {
                 formData.append("image", fs.createReadStream(imageFile.path));
             }
 
-            const response = await axios.post(`${PYTHON_SERVER_URL}/image/diary`, formData, {
-                headers: {
-                    ...formData.getHeaders(),
-                },
-            });
+            const response = await axios.post(`${PYTHON_SERVER_URL}/image/diary`, formData, aiRequestConfig(req, {
+                headers: formData.getHeaders(),
+            }));
 
             for (const file of req.files) {
                 fs.unlink(file.path, (err) => {
@@ -83,6 +81,7 @@ const ocrController = {
             });
         } catch (error) {
             console.error("[imageController.diary] Error:", error.message);
+            if (sendAiBackoff(error, res)) return;
             res.status(500).json({
                 error: error.message,
             });
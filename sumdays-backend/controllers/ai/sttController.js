@@ -1,12 +1,15 @@
 const axios = require("axios");
 const FormData = require("form-data");
 const fs = require("fs");
+const { aiRequestConfig, sendAiBackoff } = require("../../utils/aiHeaders");
 const PYTHON_SERVER_URL = process.env.PYTHON_AI_URL;
 
 const sttController = {
     // Controller method for STT on a memo (Example: POST /api/ai/stt/memo)
     /* POST http://localhost:3000/api/ai/stt/memo
     POSTMAN form-data
+    audio file | {test}.wav
+    stream text | true (optional, NDJSON events: segment ... then done with transcribed_text)
     */
     memo: async (req, res) => {
         try {
@@ -15,24 +18,38 @@ const sttController = {
             }
 
             const formData = new FormData();
-            formData.append("audio", fs.createReadStream(req.file.path));
-
-            const response = await axios.post(`${PYTHON_SERVER_URL}/stt/memo`, formData, {
-                headers: {
-                    ...formData.getHeaders(),
-                },
-            });
-
-            fs.unlink(req.file.path, (err) => {
+            // the original name keeps the extension the AI server (and Whisper) use to tell the format
+            formData.append("audio", fs.createReadStream(req.file.path), { filename: req.file.originalname });
+            const removeTempFile = () => fs.unlink(req.file.path, (err) => {
                 if (err) console.error("Temp file deletion error:", err);
             });
 
+            if (req.body.stream === "true") {
+                // partial transcripts as each audio chunk is done
+                const response = await axios.post(`${PYTHON_SERVER_URL}/stt/memo/stream`, formData, aiRequestConfig(req, {
+                    responseType: "stream",
+                    headers: formData.getHeaders(),
+                }));
+                removeTempFile();
+
+                res.setHeader("Content-Type", "application/x-ndjson; charset=utf-8");
+                response.data.pipe(res);
+                return;
+            }
+
+            const response = await axios.post(`${PYTHON_SERVER_URL}/stt/memo`, formData, aiRequestConfig(req, {
+                headers: formData.getHeaders(),
+            }));
+
+            removeTempFile();
+
             res.status(200).json({
                 success: true,
                 transcribed_text: response.data.transcribed_text,
             });
         } catch (error) {
             console.error("[sttController.merge] Error:", error.message);
+            if (sendAiBackoff(error, res)) return;
             res.status(500).json({
                 success: false,
                 error: error.message,
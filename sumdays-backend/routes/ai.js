@@ -14,8 +14,9 @@ router.post('/merge', mergeController.merge); // merge memos
 router.post('/mood', mergeController.mood);   // generate pet-perspective mood for completed diary
 
 router.post('/analyze', analyzeController.analyze); // analyze a diary: summary, emotion-score, emoji, feedback
+router.post('/analyze/batch', analyzeController.analyzeBatch); // analyze several diaries, results per diary
 router.post('/summarize-week', analyzeController.summarizeWeek); // summarize week
-// router.post('/summarize-month', analyzeController.summarizeMonth); // summarize month
+router.post('/summarize-month', analyzeController.summarizeMonth); // summarize month
 
 router.post('/ocr/memo', upload.single('image'), ocrController.memo); // image memo to text
 router.post('/ocr/diary', upload.array('image'), ocrController.diary); // image diary to text(must extract date)
@@ -0,0 +1,41 @@
+// headers for requests to the Python AI server
+// X-User-Id lets the AI server queue users fairly when an upstream (OpenAI, Vision, ...) is saturated
+// X-Request-Deadline-Ms is the time budget of the request; the AI server hedges and retries
+// upstream calls only while it lasts, and gives up instead of answering after we stopped waiting
+// (aiRequestConfig sets the same budget as the axios timeout, so we do stop waiting)
+const AI_DEADLINE_MS = Number(process.env.AI_DEADLINE_MS || 60000);
+
+const aiHeaders = (req, headers = {}, deadlineMs = AI_DEADLINE_MS) => {
+    const result = { ...headers, "X-Request-Deadline-Ms": String(deadlineMs) };
+    const userId = req.user?.userId;
+    if (userId !== undefined && userId !== null) {
+        result["X-User-Id"] = String(userId);
+    }
+    return result;
+};
+
+// axios config for a request to the AI server: its headers plus a timeout equal to the deadline
+// (in Node axios times out a silent socket, so a stream may run longer while it keeps sending)
+const aiRequestConfig = (req, config = {}, deadlineMs = AI_DEADLINE_MS) => ({
+    ...config,
+    headers: aiHeaders(req, config.headers, deadlineMs),
+    timeout: deadlineMs,
+});
+
+// the AI server sheds load with 429 / 503 and Retry-After; pass them on so the client backs off
+// returns true when the response was sent
+const sendAiBackoff = (err, res) => {
+    const status = err.response?.status;
+    if (status !== 429 && status !== 503) {
+        return false;
+    }
+    const retryAfter = err.response.headers?.["retry-after"];
+    if (retryAfter !== undefined) {
+        res.setHeader("Retry-After", retryAfter);
+    }
+    const error = typeof err.response.data?.error === "string" ? err.response.data.error : err.message;
+    res.status(status).json({ success: false, error });
+    return true;
+};
+
+module.exports = { aiHeaders, aiRequestConfig, sendAiBackoff, AI_DEADLINE_MS };